@@ -1,86 +1,98 @@
 from flask import Flask
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from datetime import timedelta
 from dotenv import load_dotenv
-from models import db, init_db
-from controllers import AuthController, LaborRateController, ReceiptController, SummaryController, DatabaseController
+from database import configure_database
+from write_behind import write_behind
+from password_hashing import password_hasher
+from rate_limit import login_limiter
+from instrumentation import init_instrumentation
+from maintenance import maintenance
+from rendering import renderer
+from table_browser import row_counts
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///iron_steel_business.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-this')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-
-# Initialize extensions
-db.init_app(app)
-init_db(app)
-jwt = JWTManager(app)
-CORS(app)  # Enable CORS for all routes
-
-# API Routes
-@app.route('/api/login', methods=['POST'])
-def login():
-    return AuthController.login()
-
-@app.route('/api/update-password', methods=['POST'])
-def update_password():
-    return AuthController.update_password()
-
-@app.route('/api/labor-rate', methods=['GET'])
-def get_labor_rate():
-    return LaborRateController.get_labor_rate()
-
-@app.route('/api/labor-rate', methods=['PUT'])
-def update_labor_rate():
-    return LaborRateController.update_labor_rate()
-
-@app.route('/api/receipts', methods=['GET'])
-def get_receipts():
-    return ReceiptController.get_receipts()
-
-@app.route('/api/receipts', methods=['POST'])
-def create_receipt():
-    return ReceiptController.create_receipt()
-
-@app.route('/api/receipts/<int:receipt_id>', methods=['DELETE'])
-def delete_receipt(receipt_id):
-    return ReceiptController.delete_receipt(receipt_id)
-
-@app.route('/api/summary', methods=['GET'])
-def get_summary():
-    return SummaryController.get_summary()
-
-@app.route('/api/monthly-summary', methods=['GET'])
-def get_monthly_summary():
-    return SummaryController.get_monthly_summary()
-
-@app.route('/api/export', methods=['GET'])
-def export_data():
-    return SummaryController.export_data()
-
-# Database Management Routes (Admin only)
-@app.route('/api/admin/database-stats', methods=['GET'])
-def get_database_stats():
-    return DatabaseController.get_database_stats()
-
-@app.route('/api/admin/table-data', methods=['GET'])
-def get_table_data():
-    return DatabaseController.get_table_data()
-
-# Health check endpoint
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    return {'status': 'ok', 'message': 'Iron & Steel Business API is running'}
+def create_app(config=None):
+    """Application factory.
+
+    Only wires up configuration, extensions, routes and CLI commands: the
+    schema and default data are created once by `flask init-db`, not by every
+    worker. Safe to call in a gunicorn --preload master; database connections
+    opened there are not shared with the forked workers.
+    """
+    app = Flask(__name__)
+    
+    # Configuration
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-this')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    app.config['LABOR_RATE_VERSION_FILE'] = os.path.join(app.instance_path, 'labor_rate.version')
+    app.config['DATA_VERSION_FILE'] = os.path.join(app.instance_path, 'data.version')
+    app.config['RESPONSE_CACHE_ENABLED'] = os.getenv('RESPONSE_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    app.config['RESPONSE_CACHE_SIZE'] = int(os.getenv('RESPONSE_CACHE_SIZE', 256))
+    app.config['RECEIPT_WRITE_BEHIND'] = os.getenv('RECEIPT_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+    app.config['WRITE_BEHIND_BATCH_SIZE'] = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 200))
+    app.config['WRITE_BEHIND_MAX_DELAY_MS'] = int(os.getenv('WRITE_BEHIND_MAX_DELAY_MS', 50))
+    app.config['WRITE_BEHIND_JOURNAL_DIR'] = os.getenv('WRITE_BEHIND_JOURNAL_DIR', app.instance_path)
+    app.config['WRITE_BEHIND_FSYNC'] = os.getenv('WRITE_BEHIND_FSYNC', '1').lower() in ('1', 'true', 'yes')
+
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE', 8))
+    app.config['LOGIN_ATTEMPTS_PER_USER_PER_MINUTE'] = int(os.getenv('LOGIN_ATTEMPTS_PER_USER_PER_MINUTE', 20))
+    app.config['LOGIN_ATTEMPTS_PER_USER_AND_IP_PER_MINUTE'] = int(os.getenv('LOGIN_ATTEMPTS_PER_USER_AND_IP_PER_MINUTE', 5))
+    app.config['LOGIN_ATTEMPTS_PER_IP_PER_MINUTE'] = int(os.getenv('LOGIN_ATTEMPTS_PER_IP_PER_MINUTE', 30))
+    app.config['SLOW_REQUEST_MS'] = int(os.getenv('SLOW_REQUEST_MS', 1000))
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config['ARCHIVE_DIR'] = os.getenv('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+    app.config['ARCHIVE_KEEP_MONTHS'] = int(os.getenv('ARCHIVE_KEEP_MONTHS', 12))
+    app.config['BACKUP_DIR'] = os.getenv('BACKUP_DIR', os.path.join(app.instance_path, 'backups'))
+    app.config['BACKUP_RETENTION'] = int(os.getenv('BACKUP_RETENTION', 7))
+    app.config['BACKUP_PAGES_PER_STEP'] = int(os.getenv('BACKUP_PAGES_PER_STEP', 256))
+    app.config['BACKUP_STEP_SLEEP_MS'] = int(os.getenv('BACKUP_STEP_SLEEP_MS', 10))
+    app.config['MAINTENANCE_INTERVAL_HOURS'] = float(os.getenv('MAINTENANCE_INTERVAL_HOURS', 0))
+    app.config['VACUUM_FREE_RATIO'] = float(os.getenv('VACUUM_FREE_RATIO', 0.2))
+    app.config['RENDER_WORKERS'] = int(os.getenv('RENDER_WORKERS', 2))
+    app.config['RENDER_CACHE_SIZE'] = int(os.getenv('RENDER_CACHE_SIZE', 5000))
+    app.config['TABLE_COUNT_RECOUNT_SECONDS'] = int(os.getenv('TABLE_COUNT_RECOUNT_SECONDS', 300))
+
+    # Behind Render's proxy the client address arrives in X-Forwarded-For
+    if int(os.getenv('TRUSTED_PROXY_COUNT', 0)):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.getenv('TRUSTED_PROXY_COUNT')))
+    
+    if config:
+        app.config.update(config)
+    
+    # Initialize extensions
+    configure_database(app)
+    init_instrumentation(app)
+    write_behind.init_app(app)
+    password_hasher.init_app(app)
+    login_limiter.init_app(app)
+    maintenance.init_app(app)
+    renderer.init_app(app)
+    row_counts.init_app(app)
+    JWTManager(app)
+    CORS(app)  # Enable CORS for all routes
+    
+    # Routes and commands pull in the controllers, so import them only when an app is built
+    from routes import api
+    from commands import register_commands
+    app.register_blueprint(api)
+    register_commands(app)
+    return app
 
 if __name__ == '__main__':
+    app = create_app()
+    from models import init_db
+    init_db(app)
+    
     # Only show startup message in development
     if os.getenv('FLASK_ENV') == 'development':
         print("🚀 Starting Iron & Steel Business API Server...")
@@ -90,4 +102,4 @@ if __name__ == '__main__':
         app.run(debug=True, host='0.0.0.0', port=5000)
     else:
         # Production mode - no debug output
-        app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000))) 
\ No newline at end of file
+        app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,242 @@
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import create_engine, func, insert, select
+from models import db, Receipt, ReceiptItem, ArchivedPeriod
+import search
+
+# Read-only engines for archive databases, keyed by file path
+_engines = {}
+_engines_lock = threading.Lock()
+
+def _forget_engines_after_fork():
+    global _engines_lock
+    _engines_lock = threading.Lock()
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_engines_after_fork)
+
+def archive_available():
+    """Archival moves rows between SQLite files, so it is only offered on SQLite"""
+    return db.engine.dialect.name == 'sqlite'
+
+def _archive_path(file_name):
+    return os.path.join(current_app.config['ARCHIVE_DIR'], file_name)
+
+def _engine(period):
+    path = _archive_path(period.file_name)
+    with _engines_lock:
+        engine = _engines.get(path)
+        if engine is None:
+            engine = _engines[path] = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true')
+    return engine
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+def month_bounds(period):
+    """First and last day of a YYYY-MM period"""
+    year, month = (int(part) for part in period.split('-'))
+    first_date = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return first_date, next_month - timedelta(days=1)
+
+def closed_periods(keep_months):
+    """Months with receipts in the live database, older than the current month and the keep_months before it"""
+    today = date.today()
+    month_index = today.year * 12 + today.month - 1 - keep_months
+    cutoff = date(month_index // 12, month_index % 12 + 1, 1)
+    month = func.strftime('%Y-%m', Receipt.date)
+    rows = db.session.execute(select(month).where(Receipt.date < cutoff).group_by(month).order_by(month))
+    return [row[0] for row in rows]
+
+def archive_period(period):
+    """Move one closed month of receipts and their items into its own archive database.
+
+    The archive is written and verified first; the rows are then removed from
+    the live database together with recording the period, in one transaction.
+    An interrupted run leaves at worst an unlisted archive file, which is never
+    read and is overwritten by the next run. Daily aggregates are kept, so the
+    summaries still cover archived months.
+    """
+    if not archive_available():
+        raise ValueError('Archival requires SQLite')
+    first_date, last_date = month_bounds(period)
+    if last_date >= date.today().replace(day=1):
+        raise ValueError(f'{period} is not a closed month')
+    if db.session.get(ArchivedPeriod, period):
+        raise ValueError(f'{period} is already archived')
+
+    file_name = f'receipts-{period}.db'
+    path = _archive_path(file_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for leftover in (path, path + '-journal'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    # Same tables and indexes as the live database, plus its own search index
+    searchable = search.search_available()
+    archive_engine = create_engine(f'sqlite:///{path}')
+    try:
+        db.metadata.create_all(archive_engine, tables=[Receipt.__table__, ReceiptItem.__table__])
+        if searchable:
+            with archive_engine.begin() as connection:
+                connection.exec_driver_sql(search.SEARCH_TABLE_DDL)
+    finally:
+        archive_engine.dispose()
+
+    receipt_columns = ', '.join(column.name for column in Receipt.__table__.columns)
+    item_columns = ', '.join(column.name for column in ReceiptItem.__table__.columns)
+    bounds = (first_date.isoformat(), last_date.isoformat())
+
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('ATTACH DATABASE ? AS archive', (path,))
+        connection.commit()
+        try:
+            # Copy and verify; this transaction only writes to the archive file
+            connection.exec_driver_sql(
+                f'INSERT INTO archive.receipt ({receipt_columns}) '
+                f'SELECT {receipt_columns} FROM main.receipt WHERE date BETWEEN ? AND ?', bounds
+            )
+            connection.exec_driver_sql(
+                f'INSERT INTO archive.receipt_item ({item_columns}) '
+                f'SELECT {item_columns} FROM main.receipt_item WHERE receipt_id IN (SELECT id FROM archive.receipt)'
+            )
+            if searchable:
+                connection.exec_driver_sql(
+                    'INSERT INTO archive.receipt_search (rowid, customer_name, notes, item_names, dimensions) '
+                    'SELECT rowid, customer_name, notes, item_names, dimensions FROM main.receipt_search '
+                    'WHERE rowid IN (SELECT id FROM archive.receipt)'
+                )
+            receipt_count, total_weight, total_labor_cost = connection.exec_driver_sql(
+                'SELECT count(*), coalesce(sum(total_weight), 0.0), coalesce(sum(total_labor_cost), 0.0) FROM archive.receipt'
+            ).one()
+            item_count = connection.exec_driver_sql('SELECT count(*) FROM archive.receipt_item').scalar()
+            live_count = connection.exec_driver_sql(
+                'SELECT count(*) FROM main.receipt WHERE date BETWEEN ? AND ?', bounds
+            ).scalar()
+            if receipt_count != live_count:
+                raise RuntimeError(f'Archive of {period} holds {receipt_count} receipts, expected {live_count}')
+            connection.commit()
+
+            # Swap the rows out of the live database
+            archived_ids = '(SELECT id FROM archive.receipt)'
+            if searchable:
+                connection.exec_driver_sql(f'DELETE FROM main.receipt_search WHERE rowid IN {archived_ids}')
+            connection.exec_driver_sql(f'DELETE FROM main.receipt_item WHERE receipt_id IN {archived_ids}')
+            connection.exec_driver_sql(f'DELETE FROM main.receipt WHERE id IN {archived_ids}')
+            connection.execute(insert(ArchivedPeriod).values(
+                period=period,
+                first_date=first_date,
+                last_date=last_date,
+                file_name=file_name,
+                receipt_count=receipt_count,
+                item_count=item_count,
+                total_weight=total_weight,
+                total_labor_cost=total_labor_cost,
+                searchable=searchable,
+                archived_at=datetime.utcnow()
+            ))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.exec_driver_sql('DETACH DATABASE archive')
+            connection.commit()
+
+    return {
+        'period': period,
+        'file_name': file_name,
+        'receipts': receipt_count,
+        'items': item_count,
+        'total_weight': total_weight,
+        'total_labor_cost': total_labor_cost
+    }
+
+def vacuum_live_database():
+    """Give the pages freed by archiving back to the filesystem"""
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('VACUUM')
+
+def periods_between(start_date=None, end_date=None):
+    """Archived periods overlapping an inclusive date range, newest first"""
+    if not archive_available():
+        return []
+    query = select(ArchivedPeriod).order_by(ArchivedPeriod.first_date.desc())
+    if start_date is not None:
+        query = query.where(ArchivedPeriod.last_date >= _as_date(start_date))
+    if end_date is not None:
+        query = query.where(ArchivedPeriod.first_date <= _as_date(end_date))
+    return db.session.execute(query).scalars().all()
+
+def sources_between(start_date=None, end_date=None):
+    """Databases holding receipts dated in a range: None for the live database, then archived periods newest first"""
+    return [None] + periods_between(start_date, end_date)
+
+@contextmanager
+def connect(source):
+    """Something to execute() statements on for a source from sources_between"""
+    if source is None:
+        yield db.session
+    else:
+        with _engine(source).connect() as connection:
+            yield connection
+
+def archived_period_of(receipt_id):
+    """The archived period holding a receipt id, or None"""
+    for period in periods_between():
+        with connect(period) as connection:
+            if connection.execute(select(Receipt.id).where(Receipt.id == receipt_id)).first() is not None:
+                return period
+    return None
+
+def full_text_available(source):
+    """Whether the source carries the FTS5 receipt search index"""
+    return search.search_available() if source is None else source.searchable
+
+def fetch_page(build_query, size, sort_key, descending, start_date=None, end_date=None, date_of=None):
+    """Run a keyset page query on the live database and every archive the range reaches.
+
+    build_query(full_text) returns the already filtered, ordered and limited
+    statement for one source; rows are merged on sort_key and cut to size.
+    For pages ordered by date, date_of(row) gives the row's ISO date, and
+    archives whose months lie wholly past the last row of a full page are not
+    opened. Returns the rows and their items grouped by receipt id, loaded
+    with one IN query per contributing source.
+    """
+    from serializers import load_item_rows
+
+    sources = sources_between(start_date, end_date)
+    if not descending:
+        sources = [None] + sources[:0:-1]
+
+    tagged = []  # (row, index of its source)
+    for index, source in enumerate(sources):
+        if date_of is not None and source is not None and len(tagged) >= size:
+            boundary = date_of(tagged[size - 1][0])
+            if descending and boundary > source.last_date.isoformat():
+                break
+            if not descending and boundary < source.first_date.isoformat():
+                break
+        with connect(source) as connection:
+            rows = connection.execute(build_query(full_text_available(source))).all()
+        tagged.extend((row, index) for row in rows)
+        if len(sources) > 1:
+            tagged.sort(key=lambda entry: sort_key(entry[0]), reverse=descending)
+            del tagged[size:]
+
+    items_by_receipt = {}
+    for index, source in enumerate(sources):
+        receipt_ids = [row[0] for row, source_index in tagged if source_index == index]
+        if receipt_ids:
+            with connect(source) as connection:
+                items_by_receipt.update(load_item_rows(receipt_ids, connection))
+    return [row for row, _ in tagged], items_by_receipt
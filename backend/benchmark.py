@@ -0,0 +1,366 @@
+"""Load-test and benchmark every API route against a synthetic dataset.
+
+Usage:
+    python benchmark.py --receipts 100000 --requests 50 --concurrency 8 --output run.json
+    python benchmark.py --receipts 100000 --compare run.json
+
+The dataset is seeded into a temporary SQLite database through the models.py
+schema, then every route in routes.py except the maintenance job triggers is
+driven through the Flask test client, first from a single thread and then
+from several threads at once. Latency percentiles, throughput, peak RSS and
+SQL statement counts are reported per route as JSON.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as time_cls, timedelta
+
+CUSTOMERS = [
+    'Ramesh Traders', 'Suresh Steel', 'Mahesh Iron Works', 'Gupta Fabricators', 'Sharma & Sons',
+    'Verma Construction', 'Singh Hardware', 'Patel Engineering', 'Yadav Builders', 'Khan Metals'
+]
+ITEMS = ['TMT Bar', 'Angle', 'Channel', 'Sheet', 'Pipe', 'Flat', 'Round Bar', 'Beam', 'Wire', 'Scrap']
+DIMENSIONS = ['8x8 feet', '10 units', '2.5 meters', '12mm', '16mm', '6 feet', '', '']
+NOTES = ['', '', '', 'urgent', 'paid in cash', 'deliver tomorrow', 'credit 30 days']
+
+# Receipts inserted per executemany batch while seeding
+SEED_BATCH_SIZE = 5000
+
+_local = threading.local()
+_sql_counters = {}
+_sql_lock = threading.Lock()
+
+def _prepare_environment(work_dir, args):
+    """Point the app at a throwaway database before it is created"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(work_dir, 'benchmark.db')
+    os.environ['RESPONSE_CACHE_ENABLED'] = '1' if args.with_cache else '0'
+    os.environ['RECEIPT_WRITE_BEHIND'] = '1' if args.write_behind else '0'
+    os.environ['WRITE_BEHIND_JOURNAL_DIR'] = work_dir
+    # The benchmark logs in repeatedly from one address
+    os.environ['LOGIN_ATTEMPTS_PER_USER_PER_MINUTE'] = '1000000'
+    os.environ['LOGIN_ATTEMPTS_PER_IP_PER_MINUTE'] = '1000000'
+
+def _load_app(work_dir):
+    from app import create_app
+    from models import init_db
+    # Keep version files, journals and archives out of the real instance folder
+    app = create_app({
+        'DATA_VERSION_FILE': os.path.join(work_dir, 'data.version'),
+        'LABOR_RATE_VERSION_FILE': os.path.join(work_dir, 'labor_rate.version'),
+        'ARCHIVE_DIR': os.path.join(work_dir, 'archive'),
+        'BACKUP_DIR': os.path.join(work_dir, 'backups')
+    })
+    init_db(app)
+    return app
+
+def seed(app, receipt_count, days, seed_value):
+    """Insert receipt_count receipts with 1-5 items each, spread over the last `days` days"""
+    from sqlalchemy import insert, text
+    from models import db, Receipt, ReceiptItem, LaborRate, rebuild_daily_aggregates
+    import search
+
+    rng = random.Random(seed_value)
+    today = date.today()
+    started = time.monotonic()
+    item_count = 0
+
+    with app.app_context():
+        rate = LaborRate.query.first().rate_per_kg
+        next_id = 1
+        for batch_start in range(0, receipt_count, SEED_BATCH_SIZE):
+            batch = min(SEED_BATCH_SIZE, receipt_count - batch_start)
+            receipt_rows = []
+            item_rows = []
+            for _ in range(batch):
+                day = today - timedelta(days=rng.randrange(days))
+                moment = time_cls(rng.randrange(8, 20), rng.randrange(60), rng.randrange(60), rng.randrange(1000000))
+                items = []
+                for _ in range(rng.randint(1, 5)):
+                    weight = round(rng.uniform(5, 2000), 2)
+                    items.append({
+                        'receipt_id': next_id,
+                        'item_name': rng.choice(ITEMS),
+                        'weight_kg': weight,
+                        'dimension': rng.choice(DIMENSIONS),
+                        'labor_cost': weight * rate
+                    })
+                total_weight = sum(item['weight_kg'] for item in items)
+                receipt_rows.append({
+                    'id': next_id,
+                    'customer_name': rng.choice(CUSTOMERS),
+                    'notes': rng.choice(NOTES),
+                    'date': day,
+                    'time': moment,
+                    'total_weight': total_weight,
+                    'total_labor_cost': total_weight * rate,
+                    'created_at': datetime.combine(day, moment)
+                })
+                item_rows.extend(items)
+                next_id += 1
+            db.session.execute(insert(Receipt), receipt_rows)
+            db.session.execute(insert(ReceiptItem), item_rows)
+            db.session.commit()
+            item_count += len(item_rows)
+
+        rebuild_daily_aggregates()
+        if search.search_available():
+            search.rebuild_search_index()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+    return {
+        'receipts': receipt_count,
+        'items': item_count,
+        'days': days,
+        'seed_seconds': round(time.monotonic() - started, 2)
+    }
+
+def _install_sql_counter(app):
+    """Count SQL statements and their time per route via engine events"""
+    from sqlalchemy import event
+    from models import db
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('benchmark_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['benchmark_started'].pop()
+        route = getattr(_local, 'route', None)
+        if route is None:
+            return
+        with _sql_lock:
+            counter = _sql_counters.setdefault(route, [0, 0.0])
+            counter[0] += 1
+            counter[1] += elapsed
+
+def _routes(today, delete_ids):
+    """Request builders for every route in routes.py, keyed by a stable name.
+
+    The POSTs that start a background maintenance job (backup, integrity
+    check, vacuum, reprice) are left out: they answer 202 at once, or 409
+    while a job runs, and the job's own duration is in its status. Each
+    builder takes the iteration number and returns (method, url, json body).
+    """
+    month_start = today.replace(day=1).isoformat()
+    last_7 = (today - timedelta(days=7)).isoformat()
+    last_30 = (today - timedelta(days=30)).isoformat()
+    today_s = today.isoformat()
+    customer = CUSTOMERS[0].split()[0]
+
+    def create_body(i):
+        return {
+            'customer_name': f'Benchmark {i}',
+            'notes': 'benchmark',
+            'items': [{'item_name': 'TMT Bar', 'weight_kg': 100 + i, 'dimension': '12mm'}]
+        }
+
+    return {
+        'health': lambda i: ('GET', '/api/health', None),
+        'login': lambda i: ('POST', '/api/login', {'username': 'admin', 'password': 'admin123'}),
+        'update_password': lambda i: ('POST', '/api/update-password', {
+            'current_password': 'admin123', 'new_password': 'admin123', 'confirm_password': 'admin123'
+        }),
+        'get_labor_rate': lambda i: ('GET', '/api/labor-rate', None),
+        'labor_rate_at': lambda i: ('GET', f'/api/labor-rate?at={last_30}T12:00:00', None),
+        'labor_rate_history': lambda i: ('GET', '/api/labor-rate/history', None),
+        'update_labor_rate': lambda i: ('PUT', '/api/labor-rate', {'rate_per_kg': 10.0}),
+        'receipts_by_date': lambda i: ('GET', '/api/receipts', None),
+        'receipts_by_labor_cost': lambda i: ('GET', '/api/receipts?sort_by=labor_cost&sort_order=desc', None),
+        'receipts_date_range': lambda i: ('GET', f'/api/receipts?start_date={last_30}&end_date={today_s}', None),
+        'receipts_customer_filter': lambda i: ('GET', f'/api/receipts?customer={customer}', None),
+        'search_receipts': lambda i: ('GET', f'/api/receipts/search?q={customer}', None),
+        'receipt_changes': lambda i: ('GET', '/api/receipts/changes?since=0', None),
+        'create_receipt': lambda i: ('POST', '/api/receipts', create_body(i)),
+        'create_receipts_bulk': lambda i: ('POST', '/api/receipts/bulk', {
+            'receipts': [create_body(i * 10 + offset) for offset in range(10)]
+        }),
+        # Deletes take the newest ids, so renders use the oldest
+        'render_receipt_pdf': lambda i: ('GET', f'/api/receipts/{i + 1}/render?format=pdf', None),
+        'render_receipt_html': lambda i: ('GET', f'/api/receipts/{i + 1}/render?format=html', None),
+        'render_7_days_pdf': lambda i: ('GET', f'/api/receipts/render?format=pdf&start_date={last_7}&end_date={today_s}', None),
+        'render_7_days_html': lambda i: ('GET', f'/api/receipts/render?format=html&start_date={last_7}&end_date={today_s}', None),
+        'delete_receipt': lambda i: ('DELETE', f'/api/receipts/{next(delete_ids)}', None),
+        'summary': lambda i: ('GET', '/api/summary', None),
+        'monthly_summary': lambda i: ('GET', f'/api/monthly-summary?year={today.year}&month={today.month}', None),
+        'range_summary': lambda i: ('GET', f'/api/range-summary?start_date={month_start}&end_date={today_s}', None),
+        'report_by_week': lambda i: ('GET', f'/api/reports?group_by=week&start_date={last_30}&end_date={today_s}&percentiles=50,90,99', None),
+        'report_top_customers': lambda i: ('GET', f'/api/reports?group_by=customer&start_date={last_30}&end_date={today_s}&top=10', None),
+        'report_by_item': lambda i: ('GET', f'/api/reports?group_by=item_name&start_date={last_30}&end_date={today_s}&metric=weight', None),
+        'export_json_30_days': lambda i: ('GET', f'/api/export?start_date={last_30}&end_date={today_s}', None),
+        'export_ndjson_30_days': lambda i: ('GET', f'/api/export?format=ndjson&start_date={last_30}&end_date={today_s}', None),
+        'export_csv_30_days': lambda i: ('GET', f'/api/export?format=csv&start_date={last_30}&end_date={today_s}', None),
+        'database_stats': lambda i: ('GET', '/api/admin/database-stats', None),
+        'table_data': lambda i: ('GET', '/api/admin/table-data?table=receipt', None),
+        'query_plans': lambda i: ('GET', '/api/admin/query-plans', None),
+        'write_behind_status': lambda i: ('GET', '/api/admin/write-behind', None),
+        'auth_metrics': lambda i: ('GET', '/api/admin/auth-metrics', None),
+        'archives': lambda i: ('GET', '/api/admin/archives', None),
+        'metrics': lambda i: ('GET', '/api/metrics', None),
+    }
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _run_route(app, token, name, builder, requests, concurrency):
+    """Issue `requests` calls of one route from `concurrency` threads and summarize them"""
+    counter = itertools.count()
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies = []
+    errors = []
+    response_bytes = [0]
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        _local.route = name
+        for _ in range(count):
+            i = next(counter)
+            method, url, body = builder(i)
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=body, headers=headers)
+            size = len(response.get_data())
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                response_bytes[0] += size
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+        _local.route = None
+
+    with _sql_lock:
+        _sql_counters.pop(name, None)
+
+    share, extra = divmod(requests, concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker, share + (1 if index < extra else 0)) for index in range(concurrency)]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    with _sql_lock:
+        statements, sql_seconds = _sql_counters.get(name, (0, 0.0))
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'throughput_rps': round(requests / wall, 2) if wall else 0.0,
+        'avg_response_bytes': response_bytes[0] // requests if requests else 0,
+        'sql_statements_per_request': round(statements / requests, 2) if requests else 0.0,
+        'sql_ms_per_request': round(sql_seconds * 1000 / requests, 3) if requests else 0.0,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix='iron-steel-benchmark-')
+    try:
+        _prepare_environment(work_dir, args)
+        app = _load_app(work_dir)
+        dataset = seed(app, args.receipts, args.days, args.seed)
+        _install_sql_counter(app)
+
+        token = app.test_client().post('/api/login', json={'username': 'admin', 'password': 'admin123'}).get_json()['access_token']
+
+        # Deletes walk down from the newest seeded receipt so every call hits a real row
+        delete_ids = itertools.count(args.receipts, -1)
+        routes = _routes(date.today(), delete_ids)
+        if args.routes:
+            wanted = set(args.routes.split(','))
+            routes = {name: builder for name, builder in routes.items() if name in wanted}
+
+        results = {}
+        for name, builder in routes.items():
+            results[name] = {'single': _run_route(app, token, name, builder, args.requests, 1)}
+            if args.concurrency > 1:
+                results[name]['concurrent'] = _run_route(app, token, name, builder, args.requests, args.concurrency)
+            print(f"{name:28s} p50 {results[name]['single']['p50_ms']:9.2f} ms  "
+                  f"p95 {results[name]['single']['p95_ms']:9.2f} ms", file=sys.stderr)
+
+        return {
+            'meta': dict(
+                dataset,
+                requests_per_route=args.requests,
+                concurrency=args.concurrency,
+                response_cache=args.with_cache,
+                write_behind=args.write_behind,
+                python=platform.python_version(),
+                sqlite=sqlite3.sqlite_version,
+                platform=platform.platform(),
+                started_at=datetime.now().isoformat()
+            ),
+            'routes': results
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def compare(baseline, current):
+    """Print p50/p95 and throughput changes per route against a previous run"""
+    print(f"{'route':28s} {'mode':10s} {'p50 ms':>18s} {'p95 ms':>18s} {'rps':>18s}")
+    for name, modes in current['routes'].items():
+        for mode, stats in modes.items():
+            before = baseline.get('routes', {}).get(name, {}).get(mode)
+            if not before:
+                continue
+            print(f"{name:28s} {mode:10s} "
+                  f"{before['p50_ms']:8.2f} -> {stats['p50_ms']:7.2f} "
+                  f"{before['p95_ms']:8.2f} -> {stats['p95_ms']:7.2f} "
+                  f"{before['throughput_rps']:8.1f} -> {stats['throughput_rps']:7.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--receipts', type=int, default=10000, help='synthetic receipts to seed (e.g. 10000, 100000, 1000000)')
+    parser.add_argument('--days', type=int, default=365, help='days of history the receipts are spread over')
+    parser.add_argument('--requests', type=int, default=50, help='requests per route and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='threads for the concurrent pass (1 disables it)')
+    parser.add_argument('--routes', help='comma-separated route names to run (default: all)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the dataset')
+    parser.add_argument('--with-cache', action='store_true', help='leave the response cache enabled')
+    parser.add_argument('--write-behind', action='store_true', help='enable write-behind receipt creation')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='previous JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(json.load(baseline), report)
+
+if __name__ == '__main__':
+    main()
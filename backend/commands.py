@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+# Heavy modules are imported inside each command so the CLI starts quickly
+# and running one command does not load everything the others need.
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the schema, indexes and search index, and seed the default user and rate.
+
+    Safe to run on every deploy; workers no longer do this when they start.
+    """
+    from models import init_db
+    init_db(current_app._get_current_object())
+    print("Database initialized successfully!")
+
+@click.command('rebuild-aggregates')
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='First day to rebuild')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Last day to rebuild')
+@with_appcontext
+def rebuild_aggregates(start_date, end_date):
+    """Recompute the daily aggregate table from receipts"""
+    from models import rebuild_daily_aggregates
+    from versioning import data_version
+    days = rebuild_daily_aggregates(
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None
+    )
+    data_version.bump()
+    print(f"Daily aggregates rebuilt for {days} days")
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Repopulate the full-text receipt search index"""
+    from search import search_available, rebuild_search_index
+    from versioning import data_version
+    if not search_available():
+        print("Search index not available (requires SQLite with FTS5)")
+        raise SystemExit(1)
+    count = rebuild_search_index()
+    data_version.bump()
+    print(f"Search index rebuilt for {count} receipts")
+
+@click.command('prune-changes')
+@click.option('--days', type=int, default=30, show_default=True, help='Keep changes from the last N days')
+@with_appcontext
+def prune_changes_command(days):
+    """Trim the delta-sync change feed; clients older than the cutoff reload in full"""
+    from models import prune_receipt_changes
+    count = prune_receipt_changes(datetime.utcnow() - timedelta(days=days))
+    print(f"Pruned {count} receipt changes")
+
+@click.command('archive')
+@click.option('--period', default=None, help='Archive one month (YYYY-MM) instead of every closed month')
+@click.option('--keep-months', type=int, default=None, help='Months before the current one to keep live')
+@click.option('--vacuum', is_flag=True, help='Compact the live database afterwards')
+@with_appcontext
+def archive_command(period, keep_months, vacuum):
+    """Move closed months of receipts into per-month archive databases"""
+    import archive
+    from versioning import data_version
+    if not archive.archive_available():
+        print("Archival requires SQLite")
+        raise SystemExit(1)
+    if keep_months is None:
+        keep_months = current_app.config['ARCHIVE_KEEP_MONTHS']
+    periods = [period] if period else archive.closed_periods(keep_months)
+    for name in periods:
+        try:
+            result = archive.archive_period(name)
+        except ValueError as e:
+            print(f"{name}: {e}")
+            raise SystemExit(1)
+        data_version.bump()
+        print(f"{name}: archived {result['receipts']} receipts and {result['items']} items to {result['file_name']}")
+    if not periods:
+        print("Nothing to archive")
+    elif vacuum:
+        archive.vacuum_live_database()
+        print("Live database compacted")
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Print the query plan of each hot query and exit non-zero on full scans"""
+    from query_plans import check_query_plans
+    reports = check_query_plans()
+    for report in reports:
+        status = 'FULL SCAN' if report['full_scan'] else 'ok'
+        print(f"{report['query']}: {status}")
+        for step in report['plan']:
+            print(f"    {step}")
+    if any(report['full_scan'] for report in reports):
+        raise SystemExit(1)
+
+@click.command('backup')
+@with_appcontext
+def backup_command():
+    """Write a compressed, verified snapshot of the database to BACKUP_DIR"""
+    from maintenance import maintenance, MaintenanceBusy
+    try:
+        result = maintenance.run('backup')
+    except (MaintenanceBusy, ValueError) as e:
+        print(e)
+        raise SystemExit(1)
+    print(f"Wrote {result['snapshot']} ({result['snapshot_bytes']} bytes from {result['database_bytes']})")
+    for name in result['pruned']:
+        print(f"Removed {name}")
+
+@click.command('restore-backup')
+@click.argument('snapshot', type=click.Path(exists=True, dir_okay=False))
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation')
+@with_appcontext
+def restore_backup_command(snapshot, yes):
+    """Replace the database's content with a snapshot written by `flask backup`"""
+    from maintenance import maintenance, MaintenanceBusy
+    if not yes:
+        click.confirm(f'Replace every receipt and setting with the content of {snapshot}?', abort=True)
+    try:
+        maintenance.restore(snapshot)
+    except (MaintenanceBusy, ValueError) as e:
+        print(e)
+        raise SystemExit(1)
+    print(f"Restored {snapshot}")
+
+@click.command('integrity-check')
+@with_appcontext
+def integrity_check_command():
+    """Run PRAGMA quick_check table by table and exit non-zero on problems"""
+    from maintenance import maintenance, MaintenanceBusy
+    try:
+        result = maintenance.run('integrity_check')
+    except (MaintenanceBusy, ValueError) as e:
+        print(e)
+        raise SystemExit(1)
+    for problem in result['problems']:
+        print(problem)
+    print(f"Checked {result['tables']} tables: {'ok' if result['ok'] else 'PROBLEMS FOUND'}")
+    if not result['ok']:
+        raise SystemExit(1)
+
+@click.command('vacuum')
+@click.option('--force', is_flag=True, help='Vacuum even below VACUUM_FREE_RATIO')
+@with_appcontext
+def vacuum_command(force):
+    """Return free pages to the filesystem, a few at a time once in incremental mode"""
+    from maintenance import maintenance, MaintenanceBusy
+    try:
+        result = maintenance.run('vacuum', force=force)
+    except (MaintenanceBusy, ValueError) as e:
+        print(e)
+        raise SystemExit(1)
+    if result['skipped']:
+        print(f"{result['free_pages']} of {result['page_count']} pages free; below the threshold, nothing to do")
+    else:
+        print(f"{result['mode'].capitalize()} vacuum freed {result['freed_pages']} pages")
+
+@click.command('reprice')
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), required=True, help='First day to reprice')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), required=True, help='Last day to reprice')
+@with_appcontext
+def reprice_command(start_date, end_date):
+    """Recompute item labor costs and receipt totals from the labor rate history"""
+    from maintenance import maintenance, MaintenanceBusy
+    try:
+        result = maintenance.run('reprice', start_date=start_date.date(), end_date=end_date.date())
+    except MaintenanceBusy as e:
+        print(e)
+        raise SystemExit(1)
+    print(f"Repriced {result['repriced']} of {result['receipts']} receipts; daily aggregates rebuilt for {result['days']} days")
+
+def register_commands(app):
+    for command in (
+        init_db_command, rebuild_aggregates, rebuild_search_index_command,
+        prune_changes_command, archive_command, check_query_plans_command,
+        backup_command, restore_backup_command, integrity_check_command, vacuum_command,
+        reprice_command
+    ):
+        app.cli.add_command(command)
@@ -1,10 +1,132 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from models import db, User, LaborRate, Receipt, ReceiptItem
-from datetime import datetime, timedelta
-import bcrypt
+from sqlalchemy import case, func, insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from models import (
+    db, User, LaborRate, LaborRateHistory, Receipt, ReceiptItem, DailyAggregate, IdempotencyKey, ReceiptChange,
+    reserve_receipt_ids
+)
+from query_plans import check_query_plans
+import search
+import reports
+import archive
+from rate_cache import labor_rate_cache
+from database import sqlite_database_path
+from write_behind import write_behind
+from maintenance import maintenance, MaintenanceBusy
+from rendering import renderer, FORMATS as RENDER_FORMATS
+from table_browser import browse, row_counts
+from response_cache import cached_response
+from versioning import data_version
+from serializers import (
+    json_response, dumps, fmt_date, fmt_time, fmt_time_full, load_item_rows, receipt_list_payload, export_payload,
+    render_records, RECEIPT_LIST_COLUMNS, EXPORT_COLUMNS
+)
+from password_hashing import password_hasher, PasswordPoolBusy
+from rate_limit import login_limiter
+from datetime import datetime, timedelta, date as date_cls, time as time_cls
+import base64
+import csv
+import io
+import json
+import math
 import os
 
+# Receipt listing page size limits
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Changes returned per delta-sync request
+MAX_CHANGES_PER_REQUEST = 500
+
+# Largest batch accepted by the bulk receipt endpoint
+MAX_BULK_RECEIPTS = 1000
+
+# Receipts fetched per round-trip when streaming an export
+EXPORT_CHUNK_SIZE = 500
+
+# Most receipts rendered into one batch document
+MAX_RENDER_BATCH = 5000
+
+EXPORT_CSV_COLUMNS = [
+    'receipt_id', 'date', 'time', 'customer_name', 'notes', 'total_weight', 'total_labor_cost',
+    'item_name', 'weight_kg', 'dimension', 'labor_cost'
+]
+
+def _encode_cursor(sort_by, values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = json.dumps({'s': sort_by, 'k': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _apply_customer_filter(query, customer, full_text=None):
+    """Filter receipts by free-text search, using the FTS index when available"""
+    if full_text is None:
+        full_text = search.search_available()
+    if full_text:
+        match_query = search.build_match_query(customer)
+        if match_query is None:
+            return query
+        return query.filter(Receipt.id.in_(search.matching_ids_clause(match_query)))
+    return query.filter(Receipt.customer_name.ilike(f'%{customer}%'))
+
+def _validate_receipt_payload(data):
+    """Check a receipt payload the way create_receipt does, returning an error message or None"""
+    if not isinstance(data, dict):
+        return 'Receipt must be an object'
+    items = data.get('items')
+    if not items or not isinstance(items, list):
+        return 'At least one item required'
+    for item in items:
+        if not isinstance(item, dict) or not item.get('item_name') or not item.get('weight_kg'):
+            return 'Item name and weight required for all items'
+        if isinstance(item['item_name'], (dict, list)) or isinstance(item.get('dimension'), (dict, list)):
+            return 'Item name and dimension must be text'
+        try:
+            weight = float(item['weight_kg'])
+        except (TypeError, ValueError):
+            return 'Weight must be a number'
+        if weight <= 0:
+            return 'Weight must be positive'
+    key = data.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not key or len(key) > 100):
+        return 'idempotency_key must be a non-empty string of at most 100 characters'
+    return None
+
+def _normalize_item(item):
+    """A validated item with text fields as strings and the weight as a float, as stored and indexed"""
+    dimension = item.get('dimension')
+    return {
+        'item_name': str(item['item_name']),
+        'weight_kg': float(item['weight_kg']),
+        'dimension': '' if dimension is None else str(dimension)
+    }
+
+def _parse_local_datetime(text):
+    """Parse an ISO date or datetime as naive local time, converting one with a UTC offset or Z"""
+    if not isinstance(text, str):
+        raise ValueError('Not a string')
+    # fromisoformat only accepts a Z suffix from Python 3.11
+    if text.endswith(('Z', 'z')):
+        text = text[:-1] + '+00:00'
+    instant = datetime.fromisoformat(text)
+    if instant.tzinfo is not None:
+        instant = instant.astimezone().replace(tzinfo=None)
+    return instant
+
+def _decode_cursor(cursor, sort_by):
+    """Decode a cursor produced by _encode_cursor, raising ValueError if it is invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload['k']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+    if payload.get('s') != sort_by:
+        raise ValueError('Cursor does not match sort order')
+    if sort_by == 'labor_cost':
+        return float(values[0]), int(values[1])
+    return date_cls.fromisoformat(values[0]), time_cls.fromisoformat(values[1]), int(values[2])
+
 class AuthController:
     @staticmethod
     def login():
@@ -16,15 +138,25 @@ class AuthController:
         if not username or not password:
             return jsonify({'error': 'Username and password required'}), 400
         
+        retry_after = login_limiter.check(username, request.remote_addr)
+        if retry_after:
+            return AuthController._too_many_attempts(retry_after)
+        
         user = User.query.filter_by(username=username).first()
         
-        if user and bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
+        try:
+            valid = user is not None and password_hasher.check(password, user.password_hash)
+        except PasswordPoolBusy:
+            return AuthController._busy()
+        
+        if valid:
             access_token = create_access_token(identity=username)
             return jsonify({
                 'access_token': access_token,
                 'username': username
             })
         else:
+            login_limiter.failed(username, request.remote_addr)
             return jsonify({'error': 'Invalid credentials'}), 401
 
     @staticmethod
@@ -44,109 +176,316 @@ class AuthController:
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
 
         username = get_jwt_identity()
+        retry_after = login_limiter.check(username, request.remote_addr)
+        if retry_after:
+            return AuthController._too_many_attempts(retry_after)
+        
         user = User.query.filter_by(username=username).first()
-        if not user or not bcrypt.checkpw(current_password.encode('utf-8'), user.password_hash.encode('utf-8')):
-            return jsonify({'error': 'Current password is incorrect'}), 401
-
-        user.password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        try:
+            if not user or not password_hasher.check(current_password, user.password_hash):
+                login_limiter.failed(username, request.remote_addr)
+                return jsonify({'error': 'Current password is incorrect'}), 401
+            user.password_hash = password_hasher.hash(new_password)
+        except PasswordPoolBusy:
+            return AuthController._busy()
+        
         db.session.commit()
         return jsonify({'message': 'Password updated successfully'})
 
+    @staticmethod
+    @jwt_required()
+    def get_auth_metrics():
+        """Report password hashing latency and rejected attempts for this worker"""
+        return jsonify({
+            'password_hashing': password_hasher.metrics(),
+            'rate_limiting': login_limiter.metrics()
+        }), 200
+
+    @staticmethod
+    def _too_many_attempts(retry_after):
+        response = jsonify({'error': 'Too many attempts, please try again later'})
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response, 429
+
+    @staticmethod
+    def _busy():
+        response = jsonify({'error': 'Server busy, please try again'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
 class LaborRateController:
     @staticmethod
     @jwt_required()
     def get_labor_rate():
-        """Get current labor rate"""
-        rate = LaborRate.query.first()
-        return jsonify({'rate_per_kg': rate.rate_per_kg if rate else 0.0})
+        """Get current labor rate, or the rate in effect at ?at=<ISO local datetime>"""
+        at = request.args.get('at')
+        if at:
+            try:
+                instant = _parse_local_datetime(at)
+            except ValueError:
+                return jsonify({'error': 'at must be an ISO date or datetime, e.g. 2024-05-01T09:30:00'}), 400
+            rate = labor_rate_cache.rate_at(instant)
+            return jsonify({'rate_per_kg': rate if rate is not None else 0.0, 'at': instant.isoformat()})
+        rate = labor_rate_cache.get()
+        return jsonify({'rate_per_kg': rate if rate is not None else 0.0})
+
+    @staticmethod
+    @jwt_required()
+    def get_labor_rate_history():
+        """Every rate with the local time it took effect, newest first"""
+        periods = labor_rate_cache.periods()
+        return jsonify({'history': [
+            {'rate_per_kg': rate, 'effective_from': effective_from.isoformat()}
+            for effective_from, rate in reversed(periods)
+        ]})
 
     @staticmethod
     @jwt_required()
     def update_labor_rate():
-        """Update labor rate"""
+        """Update labor rate.
+
+        The new rate is added to the rate history, effective now or from an
+        optional past effective_from. Existing receipts keep their costs until
+        they are repriced with POST /api/labor-rate/reprice.
+        """
         data = request.get_json()
         new_rate = data.get('rate_per_kg')
         
         if new_rate is None or new_rate < 0:
             return jsonify({'error': 'Valid rate required'}), 400
         
-        rate = LaborRate.query.first()
-        if rate:
-            rate.rate_per_kg = new_rate
-        else:
-            rate = LaborRate(rate_per_kg=new_rate)
-            db.session.add(rate)
+        now = datetime.now()
+        effective_from = now
+        if data.get('effective_from'):
+            try:
+                effective_from = _parse_local_datetime(data['effective_from'])
+            except ValueError:
+                return jsonify({
+                    'error': 'effective_from must be an ISO date or datetime, e.g. 2024-05-01T09:30:00'
+                }), 400
+            if effective_from > now:
+                return jsonify({'error': 'effective_from cannot be in the future'}), 400
+        
+        db.session.add(LaborRateHistory(rate_per_kg=new_rate, effective_from=effective_from))
+        
+        # The single-row rate follows whichever entry is newest
+        latest = db.session.scalar(select(func.max(LaborRateHistory.effective_from)))
+        if latest is None or effective_from >= latest:
+            rate = LaborRate.query.first()
+            if rate:
+                rate.rate_per_kg = new_rate
+            else:
+                db.session.add(LaborRate(rate_per_kg=new_rate))
         
         db.session.commit()
-        return jsonify({'message': 'Labor rate updated', 'rate_per_kg': new_rate})
+        labor_rate_cache.invalidate()
+        data_version.bump()
+        return jsonify({
+            'message': 'Labor rate updated',
+            'rate_per_kg': new_rate,
+            'effective_from': effective_from.isoformat()
+        })
+
+    @staticmethod
+    @jwt_required()
+    def reprice_receipts():
+        """Start recomputing item labor costs and receipt totals in a date range from the rate history"""
+        data = request.get_json() or {}
+        try:
+            start_date = date_cls.fromisoformat(data.get('start_date') or '')
+            end_date = date_cls.fromisoformat(data.get('end_date') or '')
+        except (TypeError, ValueError):
+            return jsonify({'error': 'start_date and end_date are required in YYYY-MM-DD format'}), 400
+        if start_date > end_date:
+            return jsonify({'error': 'start_date must not be after end_date'}), 400
+        
+        try:
+            maintenance.start('reprice', start_date=start_date, end_date=end_date)
+        except MaintenanceBusy as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify({
+            'job': 'reprice',
+            'state': 'running',
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }), 202
 
 class ReceiptController:
     @staticmethod
     @jwt_required()
+    @cached_response
     def get_receipts():
-        """Get receipts with optional date range filter, customer filter, and sorting"""
+        """Get a page of receipts with optional date range filter, customer filter, and sorting.
+
+        Pages are keyset-paginated on (date, time, id) or (total_labor_cost, id);
+        pass the returned next_cursor back as ?cursor= to fetch the following page.
+        sync_seq is the change feed position to pass to get_changes afterwards.
+        """
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         date = request.args.get('date')  # Keep for backward compatibility
         customer = request.args.get('customer')
         sort_by = request.args.get('sort_by', 'date')  # date, labor_cost
         sort_order = request.args.get('sort_order', 'desc')  # asc, desc
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        if sort_by != 'labor_cost':
+            sort_by = 'date'
+        descending = sort_order != 'asc'
         
-        # Build query
-        query = Receipt.query
+        # Read the change feed position first: a receipt written in between is then
+        # both on this page and replayed by the next delta sync, never missed
+        sync_seq = db.session.execute(select(func.max(ReceiptChange.seq))).scalar() or 0
         
         # Apply date filtering (priority: date range > single date)
+        conditions = []
+        start_dt = end_dt = None
         if start_date and end_date:
             start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(Receipt.date >= start_dt, Receipt.date <= end_dt)
+            conditions.append(Receipt.date.between(start_dt, end_dt))
         elif date:
-            query = query.filter_by(date=datetime.strptime(date, '%Y-%m-%d').date())
-        
-        # Apply customer filter
-        if customer:
-            query = query.filter(Receipt.customer_name.ilike(f'%{customer}%'))
+            start_dt = end_dt = datetime.strptime(date, '%Y-%m-%d').date()
+            conditions.append(Receipt.date == start_dt)
         
-        # Apply sorting
+        # Apply sorting; id is the tie-breaker that makes the keyset unique
         if sort_by == 'labor_cost':
-            if sort_order == 'asc':
-                query = query.order_by(Receipt.total_labor_cost.asc())
-            else:
-                query = query.order_by(Receipt.total_labor_cost.desc())
+            sort_columns = [Receipt.total_labor_cost, Receipt.id]
+            sort_key = lambda row: (row.total_labor_cost, row.id)
         else:  # sort by date
-            if sort_order == 'asc':
-                query = query.order_by(Receipt.date.asc(), Receipt.time.asc())
+            sort_columns = [Receipt.date, Receipt.time, Receipt.id]
+            sort_key = lambda row: (row[3], row[4], row.id)
+        
+        # Resume after the last row of the previous page
+        if cursor:
+            try:
+                last_key = _decode_cursor(cursor, sort_by)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if descending:
+                conditions.append(tuple_(*sort_columns) < tuple_(*last_key))
             else:
-                query = query.order_by(Receipt.date.desc(), Receipt.time.desc())
-        
-        receipts = query.all()
-        
-        result = []
-        for receipt in receipts:
-            receipt_data = {
-                'id': receipt.id,
-                'customer_name': receipt.customer_name,
-                'notes': receipt.notes,
-                'date': receipt.date.strftime('%Y-%m-%d'),
-                'time': receipt.time.strftime('%H:%M:%S'),
-                'total_weight': receipt.total_weight,
-                'total_labor_cost': receipt.total_labor_cost,
-                'created_at': receipt.created_at.isoformat(),
-                'items': []
-            }
+                conditions.append(tuple_(*sort_columns) > tuple_(*last_key))
+        
+        def build_query(full_text):
+            # Plain column tuples; items for the page come from one IN query per database
+            query = select(*RECEIPT_LIST_COLUMNS).where(*conditions)
             
-            for item in receipt.items:
-                receipt_data['items'].append({
-                    'id': item.id,
-                    'item_name': item.item_name,
-                    'weight_kg': item.weight_kg,
-                    'dimension': item.dimension or '',
-                    'labor_cost': item.labor_cost
-                })
+            # Apply customer/item search
+            if customer:
+                query = _apply_customer_filter(query, customer, full_text)
+            
+            if descending:
+                query = query.order_by(*[column.desc() for column in sort_columns])
+            else:
+                query = query.order_by(*[column.asc() for column in sort_columns])
             
-            result.append(receipt_data)
+            # Fetch one extra row to find out whether another page exists
+            return query.limit(limit + 1)
+        
+        # Archived months are merged in when the date range reaches into them
+        rows, items_by_receipt = archive.fetch_page(
+            build_query, limit + 1, sort_key, descending, start_dt, end_dt,
+            date_of=(lambda row: row[3]) if sort_by == 'date' else None
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            if sort_by == 'labor_cost':
+                next_cursor = _encode_cursor(sort_by, [last.total_labor_cost, last.id])
+            else:
+                next_cursor = _encode_cursor(sort_by, [fmt_date(last[3]), fmt_time_full(last[4]), last.id])
+        
+        return json_response({
+            'receipts': receipt_list_payload(rows, items_by_receipt),
+            'next_cursor': next_cursor,
+            'sync_seq': sync_seq
+        })
+
+    @staticmethod
+    @jwt_required()
+    @cached_response
+    def search_receipts():
+        """Full-text search over customer, notes, item names and dimensions, best matches first"""
+        search_text = request.args.get('q', '')
+        limit = request.args.get('limit', 20, type=int)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        if not search.search_available():
+            return jsonify({'error': 'Search index not available'}), 503
+        
+        match_query = search.build_match_query(search_text)
+        if match_query is None:
+            return jsonify({'receipts': []})
         
-        return jsonify(result)
+        receipt_ids = search.ranked_receipt_ids(match_query, limit)
+        rows = db.session.execute(select(*RECEIPT_LIST_COLUMNS).where(Receipt.id.in_(receipt_ids))).all()
+        by_id = {row.id: row for row in rows}
+        
+        return json_response({
+            'receipts': receipt_list_payload([by_id[receipt_id] for receipt_id in receipt_ids if receipt_id in by_id])
+        })
+
+    @staticmethod
+    @jwt_required()
+    @cached_response
+    def get_changes():
+        """Receipts inserted, repriced and deleted since a change feed position.
+
+        Pass the sync_seq of a receipt listing (or the next_since of the
+        previous call) as ?since=. reset=true means the position is no longer
+        covered by the feed, or precedes a restore of the database, and the
+        client must reload its list.
+        """
+        since = request.args.get('since', type=int)
+        if since is None or since < 0:
+            return jsonify({'error': 'since must be a non-negative integer'}), 400
+        
+        oldest, latest, restored = db.session.execute(select(
+            func.min(ReceiptChange.seq), func.max(ReceiptChange.seq),
+            func.max(case((ReceiptChange.operation == 'restore', ReceiptChange.seq)))
+        )).one()
+        latest = latest or 0
+        if since > latest or since < (restored or 0) or (oldest is not None and since < oldest - 1):
+            return jsonify({'reset': True, 'next_since': latest, 'inserted': [], 'deleted': [], 'has_more': False})
+        
+        changes = db.session.execute(
+            select(ReceiptChange.seq, ReceiptChange.receipt_id, ReceiptChange.operation)
+            .where(ReceiptChange.seq > since)
+            .order_by(ReceiptChange.seq)
+            .limit(MAX_CHANGES_PER_REQUEST + 1)
+        ).all()
+        has_more = len(changes) > MAX_CHANGES_PER_REQUEST
+        changes = changes[:MAX_CHANGES_PER_REQUEST]
+        
+        # Only the last operation per receipt matters to the client
+        final_operation = {}
+        for change in changes:
+            final_operation[change.receipt_id] = change.operation
+        deleted = [receipt_id for receipt_id, operation in final_operation.items() if operation == 'delete']
+        # Repriced receipts are sent again in full, like inserts
+        inserted_ids = [receipt_id for receipt_id, operation in final_operation.items() if operation != 'delete']
+        
+        rows = []
+        if inserted_ids:
+            rows = db.session.execute(
+                select(*RECEIPT_LIST_COLUMNS)
+                .where(Receipt.id.in_(inserted_ids))
+                .order_by(Receipt.date.desc(), Receipt.time.desc(), Receipt.id.desc())
+            ).all()
+        
+        return json_response({
+            'reset': False,
+            'next_since': changes[-1].seq if changes else since,
+            'inserted': receipt_list_payload(rows),
+            'deleted': deleted,
+            'has_more': has_more
+        })
 
     @staticmethod
     @jwt_required()
@@ -154,30 +493,42 @@ class ReceiptController:
         """Create new receipt with items - always uses current date"""
         data = request.get_json()
         
-        # Validate required fields
-        if not data.get('items') or len(data['items']) == 0:
-            return jsonify({'error': 'At least one item required'}), 400
+        # Validate required fields and items
+        error = _validate_receipt_payload(data)
+        if error:
+            return jsonify({'error': error}), 400
+        items = [_normalize_item(item) for item in data['items']]
         
         # Get current labor rate
-        labor_rate = LaborRate.query.first()
-        if not labor_rate:
+        rate = labor_rate_cache.get()
+        if rate is None:
             return jsonify({'error': 'Labor rate not configured'}), 400
         
         # Calculate totals
         total_weight = 0
         total_labor_cost = 0
+        for item in items:
+            total_weight += item['weight_kg']
+            total_labor_cost += item['weight_kg'] * rate
         
-        # Validate items
-        for item in data['items']:
-            if not item.get('item_name') or not item.get('weight_kg'):
-                return jsonify({'error': 'Item name and weight required for all items'}), 400
-            
-            weight = float(item['weight_kg'])
-            if weight <= 0:
-                return jsonify({'error': 'Weight must be positive'}), 400
-            
-            total_weight += weight
-            total_labor_cost += weight * labor_rate.rate_per_kg
+        # In write-behind mode the receipt is journaled and committed by the background writer
+        if write_behind.enabled:
+            now = datetime.now()
+            receipt_id = write_behind.enqueue({
+                'customer_name': data.get('customer_name', ''),
+                'notes': data.get('notes', ''),
+                'date': now.date().isoformat(),
+                'time': now.time().isoformat(),
+                'created_at': datetime.utcnow().isoformat(),
+                'total_weight': total_weight,
+                'total_labor_cost': total_labor_cost,
+                'items': [dict(item, labor_cost=item['weight_kg'] * rate) for item in items]
+            })
+            return jsonify({
+                'message': 'Receipt accepted',
+                'receipt_id': receipt_id,
+                'queued': True
+            }), 202
         
         # Create receipt with current date
         receipt = Receipt(
@@ -193,55 +544,248 @@ class ReceiptController:
         db.session.flush()  # Get the receipt ID
         
         # Create receipt items
-        for item_data in data['items']:
+        for item_data in items:
             item = ReceiptItem(
                 receipt_id=receipt.id,
                 item_name=item_data['item_name'],
-                weight_kg=float(item_data['weight_kg']),
-                dimension=item_data.get('dimension', ''),  # Optional dimension field
-                labor_cost=float(item_data['weight_kg']) * labor_rate.rate_per_kg
+                weight_kg=item_data['weight_kg'],
+                dimension=item_data['dimension'],  # Optional dimension field
+                labor_cost=item_data['weight_kg'] * rate
             )
             db.session.add(item)
         
+        DailyAggregate.apply(receipt.date, 1, total_weight, total_labor_cost)
+        ReceiptChange.record([receipt.id], 'insert')
+        search.index_receipt(receipt.id, receipt.customer_name, receipt.notes, items)
         db.session.commit()
+        data_version.bump()
         
         return jsonify({
             'message': 'Receipt created successfully',
             'receipt_id': receipt.id
         }), 201
 
+    @staticmethod
+    @jwt_required()
+    def create_receipts_bulk():
+        """Create a batch of receipts in one transaction.
+
+        Every receipt is validated before anything is written. Receipts whose
+        idempotency_key was already used are reported as duplicates instead of
+        being inserted again.
+        """
+        data = request.get_json()
+        receipts_data = data.get('receipts') if isinstance(data, dict) else None
+        
+        if not receipts_data or not isinstance(receipts_data, list):
+            return jsonify({'error': 'A non-empty receipts array is required'}), 400
+        if len(receipts_data) > MAX_BULK_RECEIPTS:
+            return jsonify({'error': f'At most {MAX_BULK_RECEIPTS} receipts per batch'}), 400
+        
+        # Validate the whole batch up front
+        errors = []
+        for index, receipt_data in enumerate(receipts_data):
+            error = _validate_receipt_payload(receipt_data)
+            if error:
+                errors.append({'index': index, 'error': error})
+        if errors:
+            return jsonify({'error': 'Validation failed', 'errors': errors}), 400
+        
+        rate = labor_rate_cache.get()
+        if rate is None:
+            return jsonify({'error': 'Labor rate not configured'}), 400
+        
+        # Resolve idempotency keys that were already used
+        keys = [receipt_data['idempotency_key'] for receipt_data in receipts_data if receipt_data.get('idempotency_key')]
+        existing = {}
+        if keys:
+            for row in IdempotencyKey.query.filter(IdempotencyKey.key.in_(keys)).all():
+                existing[row.key] = row.receipt_id
+        
+        now = datetime.now()
+        results = [None] * len(receipts_data)
+        pending = []  # (index, receipt payload) to insert
+        batch_keys = {}  # key -> index of the first receipt using it in this batch
+        for index, receipt_data in enumerate(receipts_data):
+            key = receipt_data.get('idempotency_key')
+            if key in existing:
+                results[index] = {'index': index, 'status': 'duplicate', 'receipt_id': existing[key]}
+            elif key and key in batch_keys:
+                results[index] = {'index': index, 'status': 'duplicate', 'duplicate_of': batch_keys[key]}
+            else:
+                if key:
+                    batch_keys[key] = index
+                pending.append((index, receipt_data))
+        
+        if pending:
+            receipt_rows = []
+            for index, receipt_data in pending:
+                total_weight = sum(float(item['weight_kg']) for item in receipt_data['items'])
+                receipt_rows.append({
+                    'customer_name': receipt_data.get('customer_name', ''),
+                    'notes': receipt_data.get('notes', ''),
+                    'date': now.date(),
+                    'time': now.time(),
+                    'total_weight': total_weight,
+                    'total_labor_cost': total_weight * rate,
+                    'created_at': datetime.utcnow()
+                })
+            
+            try:
+                # Ids come from the sequence queued receipts also use, so the insert is a
+                # plain executemany that needs no RETURNING support
+                first_id = reserve_receipt_ids(len(receipt_rows))
+                receipt_ids = list(range(first_id, first_id + len(receipt_rows)))
+                for receipt_id, receipt_row in zip(receipt_ids, receipt_rows):
+                    receipt_row['id'] = receipt_id
+                db.session.execute(insert(Receipt), receipt_rows)
+                
+                item_rows = []
+                key_rows = []
+                search_entries = []
+                for (index, receipt_data), receipt_id, receipt_row in zip(pending, receipt_ids, receipt_rows):
+                    items = [_normalize_item(item) for item in receipt_data['items']]
+                    for item in items:
+                        item_rows.append(dict(item, receipt_id=receipt_id, labor_cost=item['weight_kg'] * rate))
+                    if receipt_data.get('idempotency_key'):
+                        key_rows.append({
+                            'key': receipt_data['idempotency_key'],
+                            'receipt_id': receipt_id,
+                            'created_at': datetime.utcnow()
+                        })
+                    search_entries.append((receipt_id, receipt_row['customer_name'], receipt_row['notes'], items))
+                    results[index] = {'index': index, 'status': 'created', 'receipt_id': receipt_id}
+                
+                db.session.execute(insert(ReceiptItem), item_rows)
+                if key_rows:
+                    db.session.execute(insert(IdempotencyKey), key_rows)
+                DailyAggregate.apply(
+                    now.date(),
+                    len(receipt_rows),
+                    sum(row['total_weight'] for row in receipt_rows),
+                    sum(row['total_labor_cost'] for row in receipt_rows)
+                )
+                ReceiptChange.record(receipt_ids, 'insert')
+                search.index_receipts(search_entries)
+                db.session.commit()
+                data_version.bump()
+            except IntegrityError:
+                # A concurrent batch claimed one of the idempotency keys first
+                db.session.rollback()
+                return jsonify({'error': 'Idempotency key conflict, retry the batch'}), 409
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        return jsonify({
+            'message': f'{created} receipts created',
+            'created': created,
+            'duplicates': len(results) - created,
+            'results': results
+        }), 201 if created else 200
+
+    @staticmethod
+    def _rendered(body, render_format, file_name):
+        mimetype = 'application/pdf' if render_format == 'pdf' else 'text/html'
+        return Response(body, mimetype=mimetype, headers={
+            'Content-Disposition': f'inline; filename={file_name}.{render_format}'
+        })
+
+    @staticmethod
+    @jwt_required()
+    def render_receipt(receipt_id):
+        """Render one receipt as a printable HTML page or PDF (?format=html|pdf)"""
+        try:
+            render_format = request.args.get('format', 'pdf')
+            if render_format not in RENDER_FORMATS:
+                return jsonify({'error': 'Invalid render format'}), 400
+            
+            # Look the receipt up even on a cache hit so deleted receipts are not served
+            for source in archive.sources_between():
+                with archive.connect(source) as connection:
+                    row = connection.execute(select(*EXPORT_COLUMNS).where(Receipt.id == receipt_id)).first()
+                    if row is None:
+                        continue
+                    version = labor_rate_cache.version()
+                    fragment = renderer.cached(receipt_id, render_format, version)
+                    if fragment is None:
+                        records = render_records([row], load_item_rows([receipt_id], connection))
+                        fragment = renderer.render(records, render_format, version)[0]
+                break
+            else:
+                return jsonify({'error': 'Receipt not found'}), 404
+            
+            body = renderer.document([fragment], render_format, title=f'Receipt #{receipt_id}')
+            return ReceiptController._rendered(body, render_format, f'receipt-{receipt_id}')
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @jwt_required()
+    def render_receipts():
+        """Render every receipt in a date range (optionally one customer's) into one HTML page or PDF"""
+        try:
+            render_format = request.args.get('format', 'pdf')
+            if render_format not in RENDER_FORMATS:
+                return jsonify({'error': 'Invalid render format'}), 400
+            start_date = request.args.get('start_date')
+            end_date = request.args.get('end_date')
+            if not start_date or not end_date:
+                return jsonify({'error': 'start_date and end_date are required'}), 400
+            try:
+                sources = archive.sources_between(start_date, end_date)
+            except ValueError:
+                return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+            
+            records = []
+            for rows, items_by_receipt in SummaryController._export_chunks(sources):
+                records.extend(render_records(rows, items_by_receipt))
+                if len(records) > MAX_RENDER_BATCH:
+                    return jsonify({'error': f'More than {MAX_RENDER_BATCH} receipts in range; narrow the dates'}), 400
+            
+            fragments = renderer.render(records, render_format, labor_rate_cache.version())
+            body = renderer.document(fragments, render_format, title=f'Receipts {start_date} to {end_date}')
+            return ReceiptController._rendered(body, render_format, f'receipts-{start_date}-{end_date}')
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
     @staticmethod
     @jwt_required()
     def delete_receipt(receipt_id):
         """Delete receipt by ID"""
-        receipt = Receipt.query.get_or_404(receipt_id)
+        receipt = db.session.get(Receipt, receipt_id)
+        if receipt is None:
+            # Listings include archived months, whose read-only receipts cannot be deleted
+            period = archive.archived_period_of(receipt_id)
+            if period is not None:
+                return jsonify({'error': f'Receipt is archived ({period.period}) and cannot be deleted'}), 409
+            return jsonify({'error': 'Receipt not found'}), 404
+        DailyAggregate.apply(receipt.date, -1, -(receipt.total_weight or 0.0), -(receipt.total_labor_cost or 0.0))
+        ReceiptChange.record([receipt.id], 'delete')
+        search.remove_receipt(receipt.id)
         db.session.delete(receipt)
         db.session.commit()
+        data_version.bump()
         return jsonify({'message': 'Receipt deleted successfully'})
 
 class SummaryController:
     @staticmethod
+    @cached_response
     def get_summary():
         try:
             # Get current date
             today = datetime.now().date()
             
-            # Get today's receipts
-            today_receipts = Receipt.query.filter(Receipt.date == today).all()
-            
-            # Calculate totals
-            total_receipts = len(today_receipts)
-            total_weight = sum(receipt.total_weight for receipt in today_receipts)
-            total_labor_cost = sum(receipt.total_labor_cost for receipt in today_receipts)
+            # Today's totals come from the pre-summed daily aggregate
+            aggregate = db.session.get(DailyAggregate, today)
             
             # Get labor rate
-            labor_rate = LaborRate.query.first()
-            current_rate = labor_rate.rate_per_kg if labor_rate else 0.0
+            current_rate = labor_rate_cache.get()
+            if current_rate is None:
+                current_rate = 0.0
             
             return jsonify({
-                'total_receipts': total_receipts,
-                'total_weight': total_weight,
-                'total_labor_cost': total_labor_cost,
+                'total_receipts': aggregate.receipt_count if aggregate else 0,
+                'total_weight': aggregate.total_weight if aggregate else 0.0,
+                'total_labor_cost': aggregate.total_labor_cost if aggregate else 0.0,
                 'current_labor_rate': current_rate,
                 'date': today.isoformat()
             }), 200
@@ -249,99 +793,250 @@ class SummaryController:
             return jsonify({'error': str(e)}), 500
 
     @staticmethod
+    @cached_response
     def get_monthly_summary():
         try:
-            # Get current month
-            current_month = datetime.now().month
-            current_year = datetime.now().year
+            # Default to the current month
+            now = datetime.now()
+            current_month = request.args.get('month', now.month, type=int)
+            current_year = request.args.get('year', now.year, type=int)
+            if not 1 <= current_month <= 12:
+                return jsonify({'error': 'Invalid month'}), 400
             
-            # Get monthly receipts
-            monthly_receipts = Receipt.query.filter(
-                extract('month', Receipt.date) == current_month,
-                extract('year', Receipt.date) == current_year
-            ).all()
-            
-            # Calculate totals
-            total_receipts = len(monthly_receipts)
-            total_weight = sum(receipt.total_weight for receipt in monthly_receipts)
-            total_labor_cost = sum(receipt.total_labor_cost for receipt in monthly_receipts)
+            start_dt = date_cls(current_year, current_month, 1)
+            if current_month == 12:
+                end_dt = date_cls(current_year + 1, 1, 1) - timedelta(days=1)
+            else:
+                end_dt = date_cls(current_year, current_month + 1, 1) - timedelta(days=1)
             
-            return jsonify({
-                'total_receipts': total_receipts,
-                'total_weight': total_weight,
-                'total_labor_cost': total_labor_cost,
+            summary = SummaryController._summarize_range(start_dt, end_dt)
+            summary.update({
                 'month': current_month,
                 'year': current_year
-            }), 200
+            })
+            return jsonify(summary), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
     @staticmethod
-    def export_data():
+    @cached_response
+    def get_range_summary():
+        """Summarize an arbitrary inclusive date range from the daily aggregates"""
         try:
-            # Get filter parameters
             start_date = request.args.get('start_date')
             end_date = request.args.get('end_date')
-            customer_filter = request.args.get('customer')
+            if not start_date or not end_date:
+                return jsonify({'error': 'start_date and end_date required'}), 400
             
-            # Build query
-            query = Receipt.query
+            start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
+            if start_dt > end_dt:
+                return jsonify({'error': 'start_date must not be after end_date'}), 400
             
-            if start_date and end_date:
-                query = query.filter(Receipt.date.between(start_date, end_date))
-            elif start_date:
-                query = query.filter(Receipt.date >= start_date)
-            elif end_date:
-                query = query.filter(Receipt.date <= end_date)
+            summary = SummaryController._summarize_range(start_dt, end_dt)
+            summary.update({
+                'start_date': start_dt.isoformat(),
+                'end_date': end_dt.isoformat()
+            })
+            return jsonify(summary), 200
+        except ValueError:
+            return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @cached_response
+    def get_report():
+        """Grouped weight and labor cost breakdowns over a date range, computed in the database.
+
+        group_by is one of day, week, month, customer, item_name or dimension;
+        top limits the report to the N largest groups by metric, and
+        percentiles is a comma-separated list such as 50,90,99.
+        """
+        try:
+            start_date = request.args.get('start_date')
+            end_date = request.args.get('end_date')
+            group_by = request.args.get('group_by', 'day')
+            metric = request.args.get('metric', 'labor_cost')
+            top = request.args.get('top', type=int)
+            percentiles_arg = request.args.get('percentiles', '')
             
-            if customer_filter:
-                query = query.filter(Receipt.customer_name.ilike(f'%{customer_filter}%'))
+            if not start_date or not end_date:
+                return jsonify({'error': 'start_date and end_date required'}), 400
+            if group_by not in reports.GROUP_BY_OPTIONS:
+                return jsonify({'error': f"group_by must be one of {', '.join(reports.GROUP_BY_OPTIONS)}"}), 400
+            if metric not in reports.METRICS:
+                return jsonify({'error': f"metric must be one of {', '.join(reports.METRICS)}"}), 400
+            if top is not None and not 1 <= top <= reports.MAX_REPORT_GROUPS:
+                return jsonify({'error': f'top must be between 1 and {reports.MAX_REPORT_GROUPS}'}), 400
+            try:
+                percentiles = sorted({int(value) for value in percentiles_arg.split(',') if value.strip()})
+            except ValueError:
+                return jsonify({'error': 'percentiles must be whole numbers'}), 400
+            if any(not 1 <= percentile <= 100 for percentile in percentiles):
+                return jsonify({'error': 'percentiles must be between 1 and 100'}), 400
             
-            receipts = query.order_by(Receipt.date.desc()).all()
+            start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
+            if start_dt > end_dt:
+                return jsonify({'error': 'start_date must not be after end_date'}), 400
             
-            # Prepare data for export
-            export_data = []
-            for receipt in receipts:
-                receipt_data = {
-                    'id': receipt.id,
-                    'customer_name': receipt.customer_name,
-                    'date': receipt.date.isoformat(),
-                    'time': receipt.time.isoformat(),
-                    'total_weight': receipt.total_weight,
-                    'total_labor_cost': receipt.total_labor_cost,
-                    'notes': receipt.notes,
-                    'items': []
-                }
-                
-                for item in receipt.items:
-                    item_data = {
-                        'item_name': item.item_name,
-                        'weight_kg': item.weight_kg,
-                        'dimension': item.dimension,
-                        'labor_cost': item.labor_cost
-                    }
-                    receipt_data['items'].append(item_data)
-                
-                export_data.append(receipt_data)
+            groups = reports.build_report(group_by, metric, start_dt, end_dt, top, percentiles)
+            return json_response({
+                'group_by': group_by,
+                'metric': metric,
+                'start_date': start_dt.isoformat(),
+                'end_date': end_dt.isoformat(),
+                'top': top,
+                'percentiles': percentiles,
+                'groups': groups
+            })
+        except ValueError:
+            return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    def _summarize_range(start_dt, end_dt):
+        """Total the daily aggregate rows between two dates, with a per-day breakdown"""
+        aggregates = DailyAggregate.query.filter(
+            DailyAggregate.date >= start_dt,
+            DailyAggregate.date <= end_dt,
+            DailyAggregate.receipt_count > 0
+        ).order_by(DailyAggregate.date).all()
+        
+        daily_breakdown = {}
+        for aggregate in aggregates:
+            daily_breakdown[aggregate.date.isoformat()] = {
+                'receipts': aggregate.receipt_count,
+                'weight': aggregate.total_weight,
+                'labor_cost': aggregate.total_labor_cost
+            }
+        
+        return {
+            'total_receipts': sum(aggregate.receipt_count for aggregate in aggregates),
+            'total_weight': sum(aggregate.total_weight for aggregate in aggregates),
+            'total_labor_cost': sum(aggregate.total_labor_cost for aggregate in aggregates),
+            'daily_breakdown': daily_breakdown
+        }
+
+    @staticmethod
+    def export_data():
+        """Export receipts with their items.
+
+        format=json (default) returns a single JSON array; format=ndjson and
+        format=csv stream the rows chunk by chunk in constant memory.
+        """
+        try:
+            export_format = request.args.get('format', 'json')
+            if export_format not in ('json', 'ndjson', 'csv'):
+                return jsonify({'error': 'Invalid export format'}), 400
+            
+            # The live database, then every archived month the date filter reaches, newest first
+            try:
+                sources = archive.sources_between(request.args.get('start_date'), request.args.get('end_date'))
+            except ValueError:
+                return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+            
+            if export_format == 'ndjson':
+                return Response(
+                    stream_with_context(SummaryController._generate_ndjson(sources)),
+                    mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=receipts_export.ndjson'}
+                )
+            if export_format == 'csv':
+                return Response(
+                    stream_with_context(SummaryController._generate_csv(sources)),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=receipts_export.csv'}
+                )
             
-            return jsonify(export_data), 200
+            export_data = []
+            for rows, items_by_receipt in SummaryController._export_chunks(sources):
+                export_data.extend(export_payload(rows, items_by_receipt))
+            return json_response(export_data)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @staticmethod
+    def _export_query(full_text=None):
+        """Build the filtered export query from the request arguments"""
+        # Get filter parameters
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        customer_filter = request.args.get('customer')
+        
+        query = select(*EXPORT_COLUMNS)
+        
+        if start_date and end_date:
+            query = query.filter(Receipt.date.between(start_date, end_date))
+        elif start_date:
+            query = query.filter(Receipt.date >= start_date)
+        elif end_date:
+            query = query.filter(Receipt.date <= end_date)
+        
+        if customer_filter:
+            query = _apply_customer_filter(query, customer_filter, full_text)
+        
+        # Same key as the receipt listing so ix_receipt_date_time_id serves the sort
+        return query.order_by(Receipt.date.desc(), Receipt.time.desc(), Receipt.id.desc())
+
+    @staticmethod
+    def _export_chunks(sources):
+        """Yield (receipt rows, items by receipt id) one chunk of receipts at a time, source by source"""
+        for source in sources:
+            with archive.connect(source) as connection:
+                query = SummaryController._export_query(archive.full_text_available(source))
+                result = connection.execute(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+                for rows in result.partitions():
+                    yield rows, load_item_rows([row[0] for row in rows], connection)
+
+    @staticmethod
+    def _generate_ndjson(sources):
+        """Yield one JSON document per receipt, one chunk of receipts at a time"""
+        for rows, items_by_receipt in SummaryController._export_chunks(sources):
+            yield b'\n'.join(dumps(row) for row in export_payload(rows, items_by_receipt)) + b'\n'
+
+    @staticmethod
+    def _generate_csv(sources):
+        """Yield CSV text with one row per receipt item, one chunk of receipts at a time"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        
+        for rows, items_by_receipt in SummaryController._export_chunks(sources):
+            for receipt_id, customer_name, receipt_date, receipt_time, total_weight, total_labor_cost, notes in rows:
+                receipt_columns = (
+                    receipt_id, fmt_date(receipt_date), fmt_time(receipt_time),
+                    customer_name or '', notes or '', total_weight, total_labor_cost
+                )
+                items = items_by_receipt.get(receipt_id)
+                if items:
+                    writer.writerows(receipt_columns + (item[2], item[3], item[4] or '', item[5]) for item in items)
+                else:
+                    writer.writerow(receipt_columns + ('', '', '', ''))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
 class DatabaseController:
     @staticmethod
+    @cached_response(vary=maintenance.status_token)
     def get_database_stats():
         """Get database statistics for admin monitoring"""
         try:
-            # Count records
-            user_count = User.query.count()
-            receipt_count = Receipt.query.count()
-            item_count = ReceiptItem.query.count()
-            labor_rate_count = LaborRate.query.count()
+            # Cached estimates instead of a COUNT(*) scan per table
+            user_count = row_counts.estimate('user')
+            receipt_count = row_counts.estimate('receipt')
+            item_count = row_counts.estimate('receipt_item')
+            labor_rate_count = row_counts.estimate('labor_rate')
             
             # Get database file info
-            db_path = 'iron_steel_business.db'
-            if os.path.exists(db_path):
+            db_path = sqlite_database_path()
+            if db_path and os.path.exists(db_path):
                 db_size = os.path.getsize(db_path)
                 db_size_mb = round(db_size / (1024 * 1024), 2)
             else:
@@ -365,9 +1060,11 @@ class DatabaseController:
                     'receipts': receipt_count,
                     'items': item_count,
                     'labor_rates': labor_rate_count,
-                    'database_size_mb': db_size_mb
+                    'database_size_mb': db_size_mb,
+                    'counts_estimated': True
                 },
                 'recent_activity': recent_activity,
+                'maintenance': maintenance.status(),
                 'last_updated': datetime.now().isoformat()
             }), 200
         except Exception as e:
@@ -375,33 +1072,78 @@ class DatabaseController:
 
     @staticmethod
     def get_table_data():
-        """Get data from specific tables for admin viewing"""
+        """Browse any admin table a page at a time, streamed as JSON.
+
+        ?table= picks user, receipt, receipt_item, labor_rate or
+        labor_rate_history; see table_browser.browse for projection, filters
+        and the after= cursor.
+        """
         try:
-            table_name = request.args.get('table', 'receipt')
-            
-            if table_name == 'user':
-                data = User.query.all()
-                result = [{'id': u.id, 'username': u.username, 'created_at': u.created_at.isoformat()} for u in data]
-            elif table_name == 'receipt':
-                data = Receipt.query.order_by(Receipt.created_at.desc()).limit(50).all()
-                result = [{
-                    'id': r.id, 
-                    'customer_name': r.customer_name,
-                    'date': r.date.isoformat(),
-                    'total_weight': r.total_weight,
-                    'total_labor_cost': r.total_labor_cost,
-                    'created_at': r.created_at.isoformat()
-                } for r in data]
-            elif table_name == 'labor_rate':
-                data = LaborRate.query.all()
-                result = [{'id': lr.id, 'rate_per_kg': lr.rate_per_kg, 'updated_at': lr.updated_at.isoformat()} for lr in data]
-            else:
-                return jsonify({'error': 'Invalid table name'}), 400
-            
+            chunks = browse(request.args.get('table', 'receipt'), request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return Response(stream_with_context(chunks), mimetype='application/json')
+
+    @staticmethod
+    @jwt_required()
+    def get_query_plans():
+        """Report the query plan of every hot query and flag full table scans"""
+        try:
+            reports = check_query_plans()
+            return jsonify({
+                'queries': reports,
+                'full_scans': [report['query'] for report in reports if report['full_scan']],
+                'checked_at': datetime.now().isoformat()
+            }), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @jwt_required()
+    def get_write_behind_status():
+        """Report queue depth and commit latency of this worker's write-behind queue"""
+        try:
+            return jsonify(write_behind.status()), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @jwt_required()
+    def start_maintenance(job):
+        """Start a backup, integrity check or vacuum in the background; progress shows in the database stats"""
+        try:
+            if sqlite_database_path() is None:
+                return jsonify({'error': 'Maintenance jobs require SQLite'}), 400
+            options = {}
+            if job == 'vacuum':
+                options['force'] = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+            maintenance.start(job, **options)
+            return jsonify({'job': job, 'state': 'running'}), 202
+        except MaintenanceBusy as e:
+            return jsonify({'error': str(e)}), 409
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @jwt_required()
+    def get_archives():
+        """List archived months with the totals moved out of the live database"""
+        try:
+            periods = archive.periods_between()
             return jsonify({
-                'table': table_name,
-                'count': len(result),
-                'data': result
+                'archives': [{
+                    'period': period.period,
+                    'first_date': period.first_date.isoformat(),
+                    'last_date': period.last_date.isoformat(),
+                    'file_name': period.file_name,
+                    'receipts': period.receipt_count,
+                    'items': period.item_count,
+                    'total_weight': period.total_weight,
+                    'total_labor_cost': period.total_labor_cost,
+                    'searchable': period.searchable,
+                    'archived_at': period.archived_at.isoformat() if period.archived_at else None
+                } for period in periods],
+                'archived_receipts': sum(period.receipt_count for period in periods)
             }), 200
         except Exception as e:
-            return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+            return jsonify({'error': str(e)}), 500
@@ -0,0 +1,103 @@
+import os
+import weakref
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models import db
+
+DEFAULT_DATABASE_URI = 'sqlite:///iron_steel_business.db'
+
+# Engines of every configured app, reset in forked children (gunicorn --preload)
+_engines = weakref.WeakSet()
+
+def _reset_pools_after_fork():
+    # Drop inherited pooled connections without closing them: they still belong to the parent
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+def database_uri():
+    """Database URI from DATABASE_URL, defaulting to the bundled SQLite file"""
+    uri = os.getenv('DATABASE_URL') or os.getenv('SQLALCHEMY_DATABASE_URI') or DEFAULT_DATABASE_URI
+    # Heroku/Render style URLs use the scheme SQLAlchemy dropped in 1.4
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def is_memory_sqlite(uri):
+    """Whether the URI names an in-memory SQLite database"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    )
+
+def engine_options(uri):
+    """Pool and driver options suited to the database behind the URI"""
+    if is_memory_sqlite(uri):
+        # A single shared connection (StaticPool), which takes no pool sizing
+        return {'connect_args': {'check_same_thread': False}}
+    if uri.startswith('sqlite'):
+        return {
+            # SQLite allows a single writer; a small pool avoids piling up lock waiters
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            'connect_args': {
+                'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+                'check_same_thread': False
+            }
+        }
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True
+    }
+
+def sqlite_pragmas():
+    """PRAGMA statements applied to every new SQLite connection"""
+    return [
+        f"PRAGMA journal_mode={os.getenv('SQLITE_JOURNAL_MODE', 'WAL')}",
+        f"PRAGMA synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+        f"PRAGMA mmap_size={_env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{_env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024)}",
+        "PRAGMA temp_store=MEMORY"
+    ]
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+def configure_database(app):
+    """Set the database URI and engine options, then bind the SQLAlchemy extension.
+
+    Must run before the first connection is opened so the SQLite pragmas are
+    applied to every pooled connection.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+    db.init_app(app)
+    
+    with app.app_context():
+        _engines.add(db.engine)
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _apply_sqlite_pragmas)
+
+def sqlite_database_path():
+    """Filesystem path of the SQLite database, or None for other databases"""
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    return db.engine.url.database
@@ -0,0 +1,206 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RouteStats:
+    """Counters for one (method, route, status) combination"""
+
+    def __init__(self):
+        self.requests = 0
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.rows_returned = 0
+        self.rows_written = 0
+        self.orm_objects_loaded = 0
+        self.response_bytes = 0
+        self.slow_requests = 0
+
+class MetricsRegistry:
+    """Per-process request metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, key, latency, sql_statements, sql_seconds, rows_returned, rows_written, orm_objects_loaded,
+               response_bytes, slow):
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.requests += 1
+            stats.latency_sum += latency
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats.bucket_counts[index] += 1
+                    break
+            stats.sql_statements += sql_statements
+            stats.sql_seconds += sql_seconds
+            stats.rows_returned += rows_returned
+            stats.rows_written += rows_written
+            stats.orm_objects_loaded += orm_objects_loaded
+            stats.response_bytes += response_bytes
+            stats.slow_requests += slow
+
+    def render(self):
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+            family('app_request_duration_seconds', 'histogram', 'Request latency by route.')
+            for (method, route, status), stats in routes:
+                labels = f'method="{method}",route="{route}",status="{status}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'app_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'app_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.requests}')
+                lines.append(f'app_request_duration_seconds_sum{{{labels}}} {stats.latency_sum:.6f}')
+                lines.append(f'app_request_duration_seconds_count{{{labels}}} {stats.requests}')
+
+            counters = [
+                ('app_sql_statements_total', 'SQL statements executed while serving requests.', 'sql_statements', '{}'),
+                ('app_sql_seconds_total', 'Time spent executing SQL while serving requests.', 'sql_seconds', '{:.6f}'),
+                ('app_sql_rows_returned_total', 'Rows fetched from SQL results while serving requests.',
+                 'rows_returned', '{}'),
+                ('app_sql_rows_written_total', 'Rows inserted, updated or deleted while serving requests.', 'rows_written', '{}'),
+                ('app_orm_objects_loaded_total', 'Rows loaded into ORM objects; column-tuple queries are not counted.',
+                 'orm_objects_loaded', '{}'),
+                ('app_response_bytes_total', 'Response body bytes, excluding streamed responses.', 'response_bytes', '{}'),
+                ('app_slow_requests_total', 'Requests slower than the slow-request threshold.', 'slow_requests', '{}'),
+            ]
+            for name, help_text, attribute, value_format in counters:
+                family(name, 'counter', help_text)
+                for (method, route, status), stats in routes:
+                    value = value_format.format(getattr(stats, attribute))
+                    lines.append(f'{name}{{method="{method}",route="{route}",status="{status}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+def _request_counters():
+    if not has_request_context():
+        return None
+    return g.get('metrics')
+
+class _CountingCursor:
+    """DBAPI cursor proxy that adds the rows fetched through it to a request's counters"""
+
+    def __init__(self, cursor, counters):
+        self._cursor = cursor
+        self._counters = counters
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._counters['rows_returned'] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._counters['rows_returned'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._counters['rows_returned'] += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counters = _request_counters()
+    if counters is not None:
+        counters['sql_started'] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counters = _request_counters()
+    if counters is None:
+        return
+    counters['sql_statements'] += 1
+    counters['sql_seconds'] += time.perf_counter() - counters.pop('sql_started', time.perf_counter())
+    if cursor.description is None:
+        if cursor.rowcount and cursor.rowcount > 0:
+            counters['rows_written'] += cursor.rowcount
+    elif context is not None and not isinstance(context.cursor, _CountingCursor):
+        # SELECTs report a rowcount of -1 on SQLite, so rows are counted as the
+        # result fetches them from the cursor SQLAlchemy reads after this event
+        context.cursor = _CountingCursor(context.cursor, counters)
+
+def _on_load(target, context):
+    counters = _request_counters()
+    if counters is not None:
+        counters['orm_objects_loaded'] += 1
+
+def init_instrumentation(app):
+    """Record latency, SQL and response size per route, with slow-request logging and sampled profiling"""
+    slow_threshold = app.config.get('SLOW_REQUEST_MS', 1000) / 1000
+    profile_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    profile_dir = app.config.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    # db.Model is shared by every app, unlike the engine
+    if not event.contains(db.Model, 'load', _on_load):
+        event.listen(db.Model, 'load', _on_load, propagate=True)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics = {
+            'started': time.perf_counter(), 'sql_statements': 0, 'sql_seconds': 0.0,
+            'rows_returned': 0, 'rows_written': 0, 'orm_objects_loaded': 0
+        }
+        if profile_rate and random.random() < profile_rate:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request_metrics(response):
+        counters = g.pop('metrics', None)
+        if counters is None:
+            return response
+        latency = time.perf_counter() - counters['started']
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        response_bytes = 0 if response.is_streamed else (response.calculate_content_length() or 0)
+        slow = latency >= slow_threshold
+
+        registry.record(
+            (request.method, route, response.status_code), latency,
+            counters['sql_statements'], counters['sql_seconds'], counters['rows_returned'], counters['rows_written'],
+            counters['orm_objects_loaded'], response_bytes, slow
+        )
+        if slow:
+            app.logger.warning(
+                'Slow request: %s %s took %.0f ms (%d SQL statements, %.0f ms in SQL)',
+                request.method, request.full_path, latency * 1000,
+                counters['sql_statements'], counters['sql_seconds'] * 1000
+            )
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            endpoint = (request.endpoint or 'unmatched').replace('.', '_')
+            profiler.dump_stats(os.path.join(profile_dir, f'{endpoint}-{os.getpid()}-{time.time_ns()}.prof'))
+        return response
+
+def metrics_response():
+    """Prometheus exposition of this worker's request metrics"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,441 @@
+import glob
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from database import sqlite_database_path
+from worker_state import try_lock
+
+JOBS = ('backup', 'integrity_check', 'vacuum', 'reprice')
+
+# Jobs the scheduler runs every MAINTENANCE_INTERVAL_HOURS
+SCHEDULED_JOBS = ('backup', 'integrity_check', 'vacuum')
+
+# A stepped backup starts over whenever another connection writes; after this
+# many restarts the remaining pages are copied in a single step instead
+MAX_BACKUP_RESTARTS = 3
+
+# Seconds between progress writes to the shared status file
+STATUS_WRITE_INTERVAL = 0.5
+
+class MaintenanceBusy(Exception):
+    """Another maintenance job is already running"""
+
+class _BackupRestarting(Exception):
+    pass
+
+class DatabaseMaintenance:
+    """Online backups, integrity checks, vacuuming and labor cost repricing.
+
+    Every job works in small steps with a pause between them so requests keep
+    their share of the database. Only one job runs at a time across all
+    workers (a lock file in the backup directory); progress is written to a
+    status file there, so whichever worker answers the stats endpoint reports
+    it. With MAINTENANCE_INTERVAL_HOURS set, a scheduler thread started
+    lazily in each worker runs backup, check and vacuum when they are due.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pid = None
+        self._scheduler = None
+        self._lock = threading.Lock()  # held for the duration of a job
+        self._scheduler_lock = threading.Lock()
+        self._status = {}
+        self._last_write = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.backup_dir = app.config.get('BACKUP_DIR', os.path.join(app.instance_path, 'backups'))
+        self.pages_per_step = app.config.get('BACKUP_PAGES_PER_STEP', 256)
+        self.step_sleep = app.config.get('BACKUP_STEP_SLEEP_MS', 10) / 1000
+        self.retention = app.config.get('BACKUP_RETENTION', 7)
+        self.interval = app.config.get('MAINTENANCE_INTERVAL_HOURS', 0) * 3600
+        self.vacuum_free_ratio = app.config.get('VACUUM_FREE_RATIO', 0.2)
+        self.busy_timeout = app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000
+        if self.interval:
+            app.before_request(self._ensure_scheduler)
+
+    def _status_path(self):
+        return os.path.join(self.backup_dir, 'maintenance.json')
+
+    def _database_path(self):
+        with self.app.app_context():
+            path = sqlite_database_path()
+        if path is None:
+            raise ValueError('Backups and integrity checks require SQLite')
+        return path
+
+    def _connect(self, path, **kwargs):
+        return sqlite3.connect(path, timeout=self.busy_timeout, **kwargs)
+
+    # Locking and status
+
+    def _acquire(self):
+        """Take the maintenance lock shared by every worker, or raise MaintenanceBusy"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        if not self._lock.acquire(blocking=False):
+            raise MaintenanceBusy('A maintenance job is already running')
+        lock_file = open(os.path.join(self.backup_dir, 'maintenance.lock'), 'a')
+        if not try_lock(lock_file):
+            lock_file.close()
+            self._lock.release()
+            raise MaintenanceBusy('A maintenance job is already running in another worker')
+        return lock_file
+
+    def _release(self, lock_file):
+        lock_file.close()
+        self._lock.release()
+
+    def status(self):
+        """Last known state of every job as written by the worker that ran it, plus the snapshots kept"""
+        try:
+            with open(self._status_path()) as status_file:
+                status = json.load(status_file)
+        except (OSError, ValueError):
+            status = {}
+        jobs = {job: status.get(job, {'state': 'never_run'}) for job in JOBS}
+        jobs['snapshots'] = [{
+            'file_name': os.path.basename(path),
+            'bytes': os.path.getsize(path)
+        } for path in reversed(self.snapshots())]
+        jobs['scheduled_every_hours'] = self.interval / 3600 if self.interval else None
+        return jobs
+
+    def status_token(self):
+        """Changes whenever the status file is rewritten, for response caching"""
+        try:
+            return str(os.stat(self._status_path()).st_mtime_ns)
+        except OSError:
+            return ''
+
+    def _update(self, job, force=False, **fields):
+        """Record job progress; written to the shared status file at most every STATUS_WRITE_INTERVAL"""
+        self._status.setdefault(job, {}).update(fields)
+        now = time.monotonic()
+        if not force and now - self._last_write < STATUS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        try:
+            with open(self._status_path()) as status_file:
+                status = json.load(status_file)
+        except (OSError, ValueError):
+            status = {}
+        status[job] = self._status[job]
+        temp_path = f'{self._status_path()}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as status_file:
+            json.dump(status, status_file)
+        os.replace(temp_path, self._status_path())
+
+    # Running jobs
+
+    def run(self, job, **options):
+        """Run a job in the calling thread and return its result"""
+        lock_file = self._acquire()
+        try:
+            return self._run_job(job, options)
+        finally:
+            self._release(lock_file)
+
+    def start(self, job, **options):
+        """Run a job on a background thread; raises MaintenanceBusy instead of queueing"""
+        lock_file = self._acquire()
+
+        def target():
+            try:
+                self._run_job(job, options)
+            except Exception:
+                pass  # recorded in the status file
+            finally:
+                self._release(lock_file)
+
+        threading.Thread(target=target, name=f'database-{job}', daemon=True).start()
+
+    def _run_job(self, job, options):
+        if job not in JOBS:
+            raise ValueError(f'Unknown maintenance job {job}')
+        self._status[job] = {}
+        self._update(
+            job, force=True, state='running', pid=os.getpid(), progress=0.0,
+            started_at=datetime.utcnow().isoformat(), finished_at=None, error=None, result=None
+        )
+        started = time.monotonic()
+        try:
+            result = getattr(self, f'_{job}')(**options)
+        except Exception as e:
+            self._update(job, force=True, state='failed', finished_at=datetime.utcnow().isoformat(), error=str(e))
+            raise
+        self._update(
+            job, force=True, state='done', progress=1.0, finished_at=datetime.utcnow().isoformat(),
+            duration_s=round(time.monotonic() - started, 2), result=result
+        )
+        return result
+
+    # Backups
+
+    def snapshots(self):
+        """Snapshot paths, oldest first"""
+        return sorted(glob.glob(os.path.join(self.backup_dir, 'snapshot-*.db.gz')))
+
+    def _copy(self, source_path, target_path):
+        """Online backup API copy, pages_per_step pages at a time"""
+        source = self._connect(source_path)
+        target = sqlite3.connect(target_path)
+        last = {'remaining': None, 'restarts': 0}
+
+        def progress(status, remaining, total):
+            if last['remaining'] is not None and remaining >= last['remaining']:
+                last['restarts'] += 1
+                if last['restarts'] > MAX_BACKUP_RESTARTS:
+                    raise _BackupRestarting()
+            last['remaining'] = remaining
+            self._update(
+                'backup', pages_total=total, pages_remaining=remaining, restarts=last['restarts'],
+                progress=round((total - remaining) / total, 3) if total else 1.0
+            )
+
+        try:
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=progress, sleep=self.step_sleep)
+            except _BackupRestarting:
+                # In WAL mode a single step reads one consistent snapshot without blocking writers
+                source.backup(target)
+            # A standalone file: no -wal/-shm beside the snapshot
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+            source.close()
+
+    def _quick_check_file(self, path):
+        connection = sqlite3.connect(path)
+        try:
+            return [row[0] for row in connection.execute('PRAGMA quick_check') if row[0] != 'ok']
+        finally:
+            connection.close()
+
+    def _backup(self):
+        """Copy, verify and gzip the database into snapshot-<UTC timestamp>.db.gz, then apply retention"""
+        path = self._database_path()
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        copy_path = os.path.join(self.backup_dir, f'snapshot-{stamp}.db.tmp')
+        snapshot_path = os.path.join(self.backup_dir, f'snapshot-{stamp}.db.gz')
+        partial_path = snapshot_path + '.part'
+        try:
+            self._update('backup', phase='copying')
+            self._copy(path, copy_path)
+            self._update('backup', force=True, phase='verifying')
+            problems = self._quick_check_file(copy_path)
+            if problems:
+                raise RuntimeError(f'Snapshot failed its integrity check: {problems[0]}')
+            self._update('backup', force=True, phase='compressing')
+            with open(copy_path, 'rb') as source, gzip.open(partial_path, 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            database_bytes = os.path.getsize(copy_path)
+            os.replace(partial_path, snapshot_path)
+        finally:
+            for leftover in (copy_path, copy_path + '-journal', partial_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        pruned = []
+        if self.retention:
+            for old_path in self.snapshots()[:-self.retention]:
+                os.remove(old_path)
+                pruned.append(os.path.basename(old_path))
+        return {
+            'snapshot': os.path.basename(snapshot_path),
+            'database_bytes': database_bytes,
+            'snapshot_bytes': os.path.getsize(snapshot_path),
+            'pruned': pruned
+        }
+
+    def restore(self, snapshot_path):
+        """Replace the live database's content with a snapshot.
+
+        The snapshot is decompressed and checked first, then copied in with
+        the backup API in one step, so open connections in every worker see
+        the restored data on their next read. Version tokens are bumped so
+        caches drop. The change feed is replaced by a single restore marker
+        past every position handed out before, so delta-sync clients reload
+        once and then resume from the marker, and receipt ids keep counting
+        from the highest ever used.
+        """
+        lock_file = self._acquire()
+        restore_path = os.path.join(self.backup_dir, f'restore-{os.getpid()}.db.tmp')
+        try:
+            path = self._database_path()
+            opener = gzip.open if snapshot_path.endswith('.gz') else open
+            with opener(snapshot_path, 'rb') as source, open(restore_path, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            problems = self._quick_check_file(restore_path)
+            if problems:
+                raise ValueError(f'Snapshot failed its integrity check: {problems[0]}')
+
+            live = self._connect(path)
+            try:
+                used = self._used_sequences(live)
+                source = sqlite3.connect(restore_path)
+                try:
+                    source.backup(live)
+                finally:
+                    source.close()
+                with live:
+                    restored = self._used_sequences(live)
+                    live.execute('DELETE FROM receipt_change')
+                    live.execute("DELETE FROM sqlite_sequence WHERE name IN ('receipt', 'receipt_change')")
+                    live.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES ('receipt', ?)",
+                        (max(used['receipt'], restored['receipt']),)
+                    )
+                    # AUTOINCREMENT carries the feed's sequence on from the marker
+                    live.execute(
+                        "INSERT INTO receipt_change (seq, receipt_id, operation, changed_at) VALUES (?, 0, 'restore', ?)",
+                        (max(used['receipt_change'], restored['receipt_change']) + 1, datetime.utcnow().isoformat(' '))
+                    )
+            finally:
+                live.close()
+        finally:
+            if os.path.exists(restore_path):
+                os.remove(restore_path)
+            self._release(lock_file)
+
+        from versioning import data_version
+        from rate_cache import labor_rate_cache
+        with self.app.app_context():
+            data_version.bump()
+            labor_rate_cache.invalidate()
+
+    @staticmethod
+    def _used_sequences(connection):
+        """Highest receipt id and change feed position ever handed out in a database"""
+        sequences = dict(connection.execute(
+            "SELECT name, seq FROM sqlite_sequence WHERE name IN ('receipt', 'receipt_change')"
+        ).fetchall())
+        last_receipt_id = connection.execute('SELECT max(id) FROM receipt').fetchone()[0] or 0
+        return {
+            'receipt': max(sequences.get('receipt', 0), last_receipt_id),
+            'receipt_change': sequences.get('receipt_change', 0)
+        }
+
+    # Integrity check and vacuum
+
+    def _integrity_check(self):
+        """PRAGMA quick_check one table at a time, pausing between tables"""
+        connection = self._connect(self._database_path())
+        try:
+            tables = [row[0] for row in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND sql NOT LIKE 'CREATE VIRTUAL%' ORDER BY name"
+            )]
+            problems = []
+            try:
+                for index, table in enumerate(tables):
+                    self._update('integrity_check', current_table=table)
+                    quoted = table.replace('"', '""')
+                    problems.extend(
+                        f'{table}: {row[0]}' for row in connection.execute(f'PRAGMA quick_check("{quoted}")') if row[0] != 'ok'
+                    )
+                    self._update(
+                        'integrity_check', tables_checked=index + 1, tables_total=len(tables),
+                        progress=round((index + 1) / len(tables), 3)
+                    )
+                    time.sleep(self.step_sleep)
+            except sqlite3.OperationalError:
+                # SQLite before 3.33 cannot check a single table; check everything at once
+                problems = [row[0] for row in connection.execute('PRAGMA quick_check') if row[0] != 'ok']
+        finally:
+            connection.close()
+        return {'ok': not problems, 'tables': len(tables), 'problems': problems[:100]}
+
+    def _vacuum(self, force=False):
+        """Give free pages back to the filesystem once they pass VACUUM_FREE_RATIO of the file.
+
+        The first run switches the database to incremental auto-vacuum, which
+        takes one full VACUUM; later runs free pages_per_step pages at a time.
+        """
+        connection = self._connect(self._database_path(), isolation_level=None)
+        try:
+            def pragma(name):
+                return connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+            page_count, free_pages = pragma('page_count'), pragma('freelist_count')
+            if not force and (not page_count or free_pages / page_count < self.vacuum_free_ratio):
+                return {'skipped': True, 'page_count': page_count, 'free_pages': free_pages}
+
+            if pragma('auto_vacuum') != 2:
+                mode = 'full'
+                self._update('vacuum', force=True, mode=mode)
+                connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                connection.execute('VACUUM')
+            else:
+                mode = 'incremental'
+                remaining = free_pages
+                while remaining:
+                    connection.execute(f'PRAGMA incremental_vacuum({self.pages_per_step})').fetchall()
+                    previous, remaining = remaining, pragma('freelist_count')
+                    self._update(
+                        'vacuum', mode=mode, free_pages=remaining,
+                        progress=round(1 - remaining / free_pages, 3)
+                    )
+                    if remaining >= previous:
+                        break
+                    time.sleep(self.step_sleep)
+            return {
+                'skipped': False,
+                'mode': mode,
+                'freed_pages': free_pages - pragma('freelist_count'),
+                'page_count': pragma('page_count')
+            }
+        finally:
+            connection.close()
+
+    def _reprice(self, start_date, end_date):
+        """Recompute labor costs in a date range from the rate history; see repricing.reprice_receipts"""
+        from models import db
+        from repricing import reprice_receipts
+
+        def progress(done, total):
+            self._update('reprice', receipts_done=done, receipts_total=total, progress=round(done / total, 3) if total else 1.0)
+
+        with self.app.app_context():
+            try:
+                result = reprice_receipts(start_date, end_date, progress=progress)
+            finally:
+                db.session.remove()
+        return dict(result, start_date=start_date.isoformat(), end_date=end_date.isoformat())
+
+    # Scheduling
+
+    def _ensure_scheduler(self):
+        """Start this process's scheduler thread on its first request"""
+        if self._pid == os.getpid():
+            return
+        with self._scheduler_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._scheduler = threading.Thread(target=self._schedule, name='database-maintenance', daemon=True)
+            self._scheduler.start()
+
+    def _due(self, job):
+        finished_at = self.status()[job].get('finished_at')
+        if not finished_at:
+            return True
+        return (datetime.utcnow() - datetime.fromisoformat(finished_at)).total_seconds() >= self.interval
+
+    def _schedule(self):
+        while True:
+            time.sleep(min(self.interval, 60))
+            for job in SCHEDULED_JOBS:
+                try:
+                    if self._due(job):
+                        self.run(job)
+                except MaintenanceBusy:
+                    break
+                except Exception:
+                    continue  # recorded in the status file; retried at the next interval
+
+maintenance = DatabaseMaintenance()
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import MetaData, and_, case, func, insert, select, text
+from sqlalchemy.schema import CreateTable
 from datetime import datetime
-import bcrypt
 
 db = SQLAlchemy()
 
@@ -15,6 +16,21 @@ class LaborRate(db.Model):
     rate_per_kg = db.Column(db.Float, nullable=False, default=0.0)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Start of the first history entry: the rate in use when the history was
+# introduced is assumed for every earlier receipt
+EARLIEST_RATE_START = datetime(1970, 1, 1)
+
+class LaborRateHistory(db.Model):
+    """Every labor rate with the moment it took effect, in the server's local time like receipt dates and times.
+
+    The rate at an instant is the one with the latest effective_from at or
+    before it; LaborRate mirrors the newest entry.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    rate_per_kg = db.Column(db.Float, nullable=False)
+    effective_from = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Receipt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(100))
@@ -26,6 +42,16 @@ class Receipt(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     items = db.relationship('ReceiptItem', backref='receipt', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_receipt_date_time_id', 'date', 'time', 'id'),
+        db.Index('ix_receipt_labor_cost_id', 'total_labor_cost', 'id'),
+        db.Index('ix_receipt_created_at', 'created_at'),
+        db.Index('ix_receipt_customer_name', 'customer_name'),
+        # AUTOINCREMENT so a deleted receipt's id is never reused: cached renders,
+        # idempotency keys and sync clients all refer to receipts by id
+        {'sqlite_autoincrement': True},
+    )
+
 class ReceiptItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     receipt_id = db.Column(db.Integer, db.ForeignKey('receipt.id'), nullable=False)
@@ -34,13 +60,231 @@ class ReceiptItem(db.Model):
     dimension = db.Column(db.String(50))  # e.g., "8x8 feet", "10 units", "2.5 meters"
     labor_cost = db.Column(db.Float, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_receipt_item_receipt_id', 'receipt_id'),
+    )
+
+class IdempotencyKey(db.Model):
+    """Client-supplied key recorded with the receipt it created, so retried uploads are not duplicated"""
+    key = db.Column(db.String(100), primary_key=True)
+    receipt_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class IdSequence(db.Model):
+    """Next free id of a table whose ids are handed out before the row is written"""
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+
+def reserve_receipt_ids(count):
+    """Reserve a block of receipt ids, returning the first one.
+
+    Runs in its own short transaction. The block never overlaps ids already
+    present in the receipt table, even if rows were inserted without it. On
+    SQLite the AUTOINCREMENT sequence is moved past the block, so receipts
+    inserted without an id never take a reserved one.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    table = IdSequence.__table__
+    floor = select(func.coalesce(func.max(Receipt.id), 0) + 1).scalar_subquery()
+    if db.engine.dialect.name == 'sqlite':
+        # Nor ids of deleted receipts that SQLite's AUTOINCREMENT has already used
+        used = select(func.coalesce(func.max(text('seq')), 0) + 1).select_from(text('sqlite_sequence')).where(
+            text("name = 'receipt'")
+        ).scalar_subquery()
+        floor = select(func.max(floor, used)).scalar_subquery()
+    with db.engine.begin() as connection:
+        connection.execute(insert(table).from_select(['name', 'next_value'], select(text("'receipt'"), floor))
+                           .on_conflict_do_nothing(index_elements=[table.c.name]))
+        # Read back in the same transaction rather than with RETURNING, which needs SQLite 3.35
+        connection.execute(
+            table.update()
+            .where(table.c.name == 'receipt')
+            .values(next_value=case((table.c.next_value > floor, table.c.next_value), else_=floor) + count)
+        )
+        end = connection.execute(select(table.c.next_value).where(table.c.name == 'receipt')).scalar_one()
+        if db.engine.dialect.name == 'sqlite':
+            connection.execute(text(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT 'receipt', 0 "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'receipt')"
+            ))
+            connection.execute(
+                text("UPDATE sqlite_sequence SET seq = max(seq, :last) WHERE name = 'receipt'"), {'last': end - 1}
+            )
+    return end - count
+
+class ReceiptChange(db.Model):
+    """Append-only feed of receipt inserts, updates and deletes, read by delta-sync clients"""
+    seq = db.Column(db.Integer, primary_key=True)
+    receipt_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # insert, update (repriced), delete, restore (marker)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # AUTOINCREMENT so a sequence number is never handed out twice, even after pruning
+    __table_args__ = ({'sqlite_autoincrement': True},)
+
+    @staticmethod
+    def record(receipt_ids, operation):
+        """Append one change per receipt in the current transaction"""
+        if not receipt_ids:
+            return
+        now = datetime.utcnow()
+        db.session.execute(insert(ReceiptChange), [
+            {'receipt_id': receipt_id, 'operation': operation, 'changed_at': now} for receipt_id in receipt_ids
+        ])
+
+def prune_receipt_changes(before):
+    """Delete changes older than a cutoff, always keeping the newest one.
+
+    Pruning removes a contiguous run from the start of the feed, so clients
+    whose last sequence number is older than the oldest remaining change
+    minus one know they missed changes and must reload.
+    """
+    table = ReceiptChange.__table__
+    last_pruned = select(func.max(table.c.seq)).where(table.c.changed_at < before).scalar_subquery()
+    newest = select(func.max(table.c.seq)).scalar_subquery()
+    result = db.session.execute(table.delete().where(table.c.seq <= last_pruned, table.c.seq < newest))
+    db.session.commit()
+    return result.rowcount
+
+class DailyAggregate(db.Model):
+    """Per-day rollup of receipt totals, maintained alongside receipt writes"""
+    date = db.Column(db.Date, primary_key=True)
+    receipt_count = db.Column(db.Integer, nullable=False, default=0)
+    total_weight = db.Column(db.Float, nullable=False, default=0.0)
+    total_labor_cost = db.Column(db.Float, nullable=False, default=0.0)
+
+    @staticmethod
+    def apply(date, receipt_count, total_weight, total_labor_cost):
+        """Add the given deltas to a day's totals in the current transaction"""
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        
+        table = DailyAggregate.__table__
+        stmt = insert(table).values(
+            date=date,
+            receipt_count=receipt_count,
+            total_weight=total_weight,
+            total_labor_cost=total_labor_cost
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.date],
+            set_={
+                'receipt_count': table.c.receipt_count + stmt.excluded.receipt_count,
+                'total_weight': table.c.total_weight + stmt.excluded.total_weight,
+                'total_labor_cost': table.c.total_labor_cost + stmt.excluded.total_labor_cost
+            }
+        )
+        db.session.execute(stmt)
+
+class ArchivedPeriod(db.Model):
+    """A closed month whose receipts were moved out to their own archive database"""
+    period = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    first_date = db.Column(db.Date, nullable=False)
+    last_date = db.Column(db.Date, nullable=False)
+    file_name = db.Column(db.String(100), nullable=False)
+    receipt_count = db.Column(db.Integer, nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    total_weight = db.Column(db.Float, nullable=False, default=0.0)
+    total_labor_cost = db.Column(db.Float, nullable=False, default=0.0)
+    searchable = db.Column(db.Boolean, nullable=False, default=False)  # archive carries its own FTS index
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _in_archived_period(date_column):
+    return select(ArchivedPeriod.period).where(
+        and_(date_column >= ArchivedPeriod.first_date, date_column <= ArchivedPeriod.last_date)
+    ).exists()
+
+def rebuild_daily_aggregates(start_date=None, end_date=None):
+    """Recompute daily aggregates from the receipt table, optionally for a date range only.
+
+    Days inside archived periods keep their rollups, since their receipts are
+    no longer in the receipt table.
+    """
+    table = DailyAggregate.__table__
+    delete_stmt = table.delete().where(~_in_archived_period(table.c.date))
+    source = select(
+        Receipt.date,
+        func.count(Receipt.id),
+        func.coalesce(func.sum(Receipt.total_weight), 0.0),
+        func.coalesce(func.sum(Receipt.total_labor_cost), 0.0)
+    ).where(~_in_archived_period(Receipt.date)).group_by(Receipt.date)
+    
+    if start_date:
+        delete_stmt = delete_stmt.where(table.c.date >= start_date)
+        source = source.where(Receipt.date >= start_date)
+    if end_date:
+        delete_stmt = delete_stmt.where(table.c.date <= end_date)
+        source = source.where(Receipt.date <= end_date)
+    
+    db.session.execute(delete_stmt)
+    result = db.session.execute(table.insert().from_select(
+        ['date', 'receipt_count', 'total_weight', 'total_labor_cost'], source
+    ))
+    db.session.commit()
+    return result.rowcount
+
+def ensure_indexes():
+    """Create any declared indexes missing from an existing database.
+
+    create_all() only builds indexes together with new tables, so databases
+    created before an index was declared are migrated here.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+def ensure_receipt_autoincrement():
+    """Rebuild a SQLite receipt table created without AUTOINCREMENT.
+
+    SQLite cannot add AUTOINCREMENT to an existing table, so the rows are
+    copied into a new table that replaces the old one in one transaction;
+    ensure_indexes() then recreates its indexes. The sequence starts past
+    every id already handed out, including reserved ones. Returns whether
+    the table was rebuilt.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    with db.engine.begin() as connection:
+        sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'receipt'")).scalar()
+        if sql is None or 'AUTOINCREMENT' in sql.upper():
+            return False
+        rebuilt = Receipt.__table__.to_metadata(MetaData(), name='receipt_rebuild')
+        columns = ', '.join(column.name for column in rebuilt.columns)
+        connection.execute(text('DROP TABLE IF EXISTS receipt_rebuild'))
+        connection.execute(CreateTable(rebuilt))
+        connection.execute(text(f'INSERT INTO receipt_rebuild ({columns}) SELECT {columns} FROM receipt'))
+        connection.execute(text('DROP TABLE receipt'))
+        connection.execute(text('ALTER TABLE receipt_rebuild RENAME TO receipt'))
+        reserved = connection.execute(
+            select(IdSequence.next_value).where(IdSequence.name == 'receipt')
+        ).scalar() or 1
+        last_id = connection.execute(select(func.coalesce(func.max(Receipt.id), 0))).scalar()
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'receipt'"))
+        connection.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES ('receipt', :seq)"), {'seq': max(last_id, reserved - 1)}
+        )
+    return True
+
 def init_db(app):
     """Initialize database and create default data"""
     with app.app_context():
         db.create_all()
+        if ensure_receipt_autoincrement():
+            print('Receipt table rebuilt with AUTOINCREMENT')
+        ensure_indexes()
+        
+        from search import ensure_search_index
+        ensure_search_index()
         
         # Create default user if not exists
         if not User.query.first():
+            import bcrypt
             default_password = 'admin123'
             password_hash = bcrypt.hashpw(default_password.encode('utf-8'), bcrypt.gensalt())
             default_user = User(username='admin', password_hash=password_hash.decode('utf-8'))
@@ -49,6 +293,19 @@ def init_db(app):
             # Create default labor rate
             default_rate = LaborRate(rate_per_kg=10.0)  # ₹10 per kg
             db.session.add(default_rate)
+            db.session.add(LaborRateHistory(rate_per_kg=default_rate.rate_per_kg, effective_from=EARLIEST_RATE_START))
             
             db.session.commit()
-            print(f"Default user created: admin / {default_password}") 
\ No newline at end of file
+            print(f"Default user created: admin / {default_password}")
+        
+        # Start the rate history of databases created before it existed from the current rate
+        if not LaborRateHistory.query.first():
+            current_rate = LaborRate.query.first()
+            if current_rate:
+                db.session.add(LaborRateHistory(rate_per_kg=current_rate.rate_per_kg, effective_from=EARLIEST_RATE_START))
+                db.session.commit()
+        
+        # Backfill the rollup table for databases created before it existed
+        if not DailyAggregate.query.first() and Receipt.query.first():
+            days = rebuild_daily_aggregates()
+            print(f"Daily aggregates rebuilt for {days} days") 
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+class PasswordPoolBusy(Exception):
+    """Raised when every password worker is busy and the wait queue is full"""
+
+class PasswordHasherPool:
+    """Runs bcrypt on a small bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so a few threads keep request
+    threads free without letting a login burst occupy every CPU. Requests
+    beyond the pool size plus the queue limit are rejected immediately.
+    """
+
+    def __init__(self):
+        self.workers = 2
+        self.queue_limit = 8
+        self.timeout = 10
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'hashes': 0,
+            'checks': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'last_ms': 0.0,
+            'rejected_busy': 0,
+            'timeouts': 0
+        }
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.queue_limit = app.config.get('PASSWORD_HASH_QUEUE', 8)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+
+    def _ensure_executor(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+
+    def _run(self, kind, fn, *args):
+        with self._lock:
+            self._ensure_executor()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics['rejected_busy'] += 1
+            raise PasswordPoolBusy()
+        
+        started = time.monotonic()
+        try:
+            return self._executor.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._metrics['timeouts'] += 1
+            raise PasswordPoolBusy()
+        finally:
+            self._slots.release()
+            elapsed_ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._metrics[kind] += 1
+                self._metrics['total_ms'] += elapsed_ms
+                self._metrics['last_ms'] = round(elapsed_ms, 2)
+                self._metrics['max_ms'] = round(max(self._metrics['max_ms'], elapsed_ms), 2)
+
+    def check(self, password, password_hash):
+        """Verify a password against a stored bcrypt hash"""
+        import bcrypt
+        return self._run('checks', bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def hash(self, password):
+        """Hash a password with a fresh salt"""
+        import bcrypt
+        return self._run('hashes', bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    def metrics(self):
+        with self._lock:
+            calls = self._metrics['hashes'] + self._metrics['checks']
+            return dict(
+                self._metrics,
+                total_ms=round(self._metrics['total_ms'], 2),
+                avg_ms=round(self._metrics['total_ms'] / calls, 2) if calls else 0.0,
+                workers=self.workers,
+                queue_limit=self.queue_limit
+            )
+
+password_hasher = PasswordHasherPool()
@@ -0,0 +1,75 @@
+from datetime import date, time, timedelta
+from sqlalchemy import select, tuple_
+from models import db, User, Receipt, ReceiptItem, DailyAggregate, ReceiptChange
+
+def _hot_queries():
+    """Representative statements for every hot access path, keyed by name"""
+    today = date.today()
+    month_start = today.replace(day=1)
+    
+    return {
+        'receipts_by_date_range': select(Receipt)
+            .where(Receipt.date >= month_start, Receipt.date <= today)
+            .order_by(Receipt.date.desc(), Receipt.time.desc(), Receipt.id.desc())
+            .limit(101),
+        'receipts_by_date_after_cursor': select(Receipt)
+            .where(tuple_(Receipt.date, Receipt.time, Receipt.id) < tuple_(today, time(12, 0), 1000))
+            .order_by(Receipt.date.desc(), Receipt.time.desc(), Receipt.id.desc())
+            .limit(101),
+        'receipts_by_labor_cost': select(Receipt)
+            .order_by(Receipt.total_labor_cost.desc(), Receipt.id.desc())
+            .limit(101),
+        'receipts_by_labor_cost_after_cursor': select(Receipt)
+            .where(tuple_(Receipt.total_labor_cost, Receipt.id) < tuple_(100.0, 1000))
+            .order_by(Receipt.total_labor_cost.desc(), Receipt.id.desc())
+            .limit(101),
+        'receipt_items_for_page': select(ReceiptItem)
+            .where(ReceiptItem.receipt_id.in_([1, 2, 3])),
+        'export_by_date_range': select(Receipt)
+            .where(Receipt.date.between(month_start - timedelta(days=365), today))
+            .order_by(Receipt.date.desc(), Receipt.time.desc(), Receipt.id.desc()),
+        'recent_receipts': select(Receipt)
+            .order_by(Receipt.created_at.desc())
+            .limit(5),
+        'daily_aggregates_for_month': select(DailyAggregate)
+            .where(DailyAggregate.date >= month_start, DailyAggregate.date <= today)
+            .order_by(DailyAggregate.date),
+        'receipt_changes_since': select(ReceiptChange)
+            .where(ReceiptChange.seq > 1000)
+            .order_by(ReceiptChange.seq)
+            .limit(501),
+        'admin_table_page': select(ReceiptItem)
+            .where(ReceiptItem.id < 1000)
+            .order_by(ReceiptItem.id.desc())
+            .limit(51),
+        'user_by_username': select(User)
+            .where(User.username == 'admin'),
+    }
+
+def check_query_plans():
+    """Run EXPLAIN QUERY PLAN on each hot query and flag full table scans.
+
+    Returns a list of reports, one per query. Only SQLite is inspected;
+    other databases return an empty list.
+    """
+    dialect = db.engine.dialect
+    if dialect.name != 'sqlite':
+        return []
+    
+    reports = []
+    with db.engine.connect() as connection:
+        for name, statement in _hot_queries().items():
+            compiled = statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled)).fetchall()
+            plan = [row[-1] for row in rows]
+            
+            # "SCAN <table>" without an index is a full table scan; "SCAN ... USING INDEX" is an ordered index walk
+            full_scans = [step for step in plan if step.startswith('SCAN') and 'USING' not in step]
+            temp_sorts = [step for step in plan if 'TEMP B-TREE' in step]
+            reports.append({
+                'query': name,
+                'plan': plan,
+                'full_scan': bool(full_scans),
+                'temp_sort': bool(temp_sorts)
+            })
+    return reports
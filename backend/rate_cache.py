@@ -0,0 +1,77 @@
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from models import LaborRateHistory
+from versioning import VersionFile
+
+# Upper bound on staleness when the version file cannot be shared (e.g. several hosts)
+LABOR_RATE_CACHE_TTL = 60
+
+class LaborRateCache:
+    """Process-wide cache of the labor rate history.
+
+    The history is small, so it is held as two sorted lists and the rate at
+    any instant is a binary search over their start times. Writers call
+    invalidate() after committing, which bumps a version file next to the
+    database. Every lookup reads that file, so a rate changed by another
+    gunicorn worker is picked up on the next request without a database query.
+    """
+
+    def __init__(self, ttl=LABOR_RATE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = VersionFile('LABOR_RATE_VERSION_FILE')
+        self._loaded = False
+        self._starts = []
+        self._rates = []
+        self._stamp = None
+        self._loaded_at = 0.0
+
+    def _history(self):
+        """(start times, rates) sorted by start, reloaded when the version changes"""
+        # Read the stamp before the database so a concurrent update forces a reload next time
+        stamp = self._version.read()
+        with self._lock:
+            if self._loaded and stamp == self._stamp and time.monotonic() - self._loaded_at < self.ttl:
+                return self._starts, self._rates
+        
+        rows = LaborRateHistory.query.with_entities(
+            LaborRateHistory.effective_from, LaborRateHistory.rate_per_kg
+        ).order_by(LaborRateHistory.effective_from, LaborRateHistory.id).all()
+        starts = [row[0] for row in rows]
+        rates = [row[1] for row in rows]
+        with self._lock:
+            self._starts = starts
+            self._rates = rates
+            self._stamp = stamp
+            self._loaded_at = time.monotonic()
+            self._loaded = True
+        return starts, rates
+
+    def rate_at(self, instant):
+        """Rate per kg in effect at a local datetime, or None if no rate had been set by then"""
+        starts, rates = self._history()
+        index = bisect_right(starts, instant) - 1
+        return rates[index] if index >= 0 else None
+
+    def get(self):
+        """Return the current rate per kg, or None if no rate is configured"""
+        return self.rate_at(datetime.now())
+
+    def periods(self):
+        """(effective_from, rate_per_kg) pairs, oldest first"""
+        starts, rates = self._history()
+        return list(zip(starts, rates))
+
+    def version(self):
+        """Token that changes with every rate change, for caches of rate-dependent output"""
+        return self._version.read() or 'initial'
+
+    def invalidate(self):
+        """Drop the cached history in this and every other worker"""
+        self._version.bump()
+        with self._lock:
+            self._loaded = False
+
+labor_rate_cache = LaborRateCache()
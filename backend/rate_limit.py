@@ -0,0 +1,91 @@
+import threading
+import time
+
+# Buckets kept per limiter before idle, fully refilled ones are pruned
+MAX_TRACKED_KEYS = 10000
+
+class TokenBucketLimiter:
+    """In-process token buckets keyed by an arbitrary string (username, IP, ...)"""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, last refill time]
+        self.rejected = 0
+
+    def consume(self, key, take=True):
+        """Take a token for key; return 0 if allowed, else seconds until one is available.
+
+        With take=False the bucket is only checked, so callers can charge it
+        later (for example only when an attempt fails).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+            if tokens >= 1:
+                if take:
+                    self._buckets[key] = [tokens - 1, now]
+                    if len(self._buckets) > MAX_TRACKED_KEYS:
+                        self._prune(now)
+                return 0
+            self._buckets[key] = [tokens, now]
+            self.rejected += 1
+            return (1 - tokens) / self.refill_per_second
+
+    def _prune(self, now):
+        full_after = self.capacity / self.refill_per_second
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+class LoginLimiter:
+    """Token buckets in front of password checks.
+
+    Every attempt takes a token from its client IP's bucket. Failed attempts
+    take one from the username's bucket and one from the bucket of the
+    (username, client IP) pair. The pair bucket stops a single client
+    quickly without affecting terminals that share the account; the
+    username bucket allows more failures, so wrong passwords from one
+    client cannot lock the account for everyone, but still throttles
+    guessing spread over many addresses. Buckets live in memory, so limits
+    apply per gunicorn worker.
+    """
+
+    def __init__(self):
+        self.by_user = TokenBucketLimiter(20, 20 / 60)
+        self.by_user_ip = TokenBucketLimiter(5, 5 / 60)
+        self.by_ip = TokenBucketLimiter(30, 30 / 60)
+
+    def init_app(self, app):
+        user_per_minute = app.config.get('LOGIN_ATTEMPTS_PER_USER_PER_MINUTE', 20)
+        user_ip_per_minute = app.config.get('LOGIN_ATTEMPTS_PER_USER_AND_IP_PER_MINUTE', 5)
+        ip_per_minute = app.config.get('LOGIN_ATTEMPTS_PER_IP_PER_MINUTE', 30)
+        self.by_user = TokenBucketLimiter(user_per_minute, user_per_minute / 60)
+        self.by_user_ip = TokenBucketLimiter(user_ip_per_minute, user_ip_per_minute / 60)
+        self.by_ip = TokenBucketLimiter(ip_per_minute, ip_per_minute / 60)
+
+    def check(self, username, client_ip):
+        """Return 0 if the attempt may proceed, else the seconds to wait before retrying"""
+        username = (username or '').lower()
+        client_ip = client_ip or 'unknown'
+        return max(
+            self.by_ip.consume(client_ip),
+            self.by_user.consume(username, take=False),
+            self.by_user_ip.consume((username, client_ip), take=False)
+        )
+
+    def failed(self, username, client_ip):
+        """Charge a failed password check to the username and to the username from this client"""
+        username = (username or '').lower()
+        self.by_user.consume(username)
+        self.by_user_ip.consume((username, client_ip or 'unknown'))
+
+    def metrics(self):
+        return {
+            'rejected_by_user': self.by_user.rejected,
+            'rejected_by_user_and_ip': self.by_user_ip.rejected,
+            'rejected_by_ip': self.by_ip.rejected
+        }
+
+login_limiter = LoginLimiter()
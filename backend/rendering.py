@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from jinja2 import Environment, FileSystemLoader
+
+# Kept free of Flask and database imports: pool processes import this module to render
+
+FORMATS = ('html', 'pdf')
+
+# Fewer uncached receipts than this are rendered in the request thread
+POOL_MIN_RECEIPTS = 1000
+
+# Receipts sent to a pool process per task
+POOL_CHUNK_SIZE = 250
+
+# Characters per line of the plain-text layout used for PDF pages
+TEXT_WIDTH = 63
+
+# A4 in points, with Courier at 10pt (6pt per character) and 12pt leading
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE, LEADING = 10, 12
+MARGIN_TOP = 60
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN_TOP) // LEADING
+MARGIN_LEFT = (PAGE_WIDTH - TEXT_WIDTH * FONT_SIZE * 3 // 5) // 2
+
+def _number(value):
+    # Match the browser: 10.0 prints as 10, 10.5 as 10.5
+    return int(value) if value == int(value) else value
+
+def _environment(autoescape):
+    environment = Environment(
+        loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')),
+        autoescape=autoescape, trim_blocks=True, lstrip_blocks=True
+    )
+    environment.filters['number'] = _number
+    return environment
+
+# Compiled once per process
+_html = _environment(True)
+RECEIPT_HTML = _html.get_template('receipt.html')
+DOCUMENT_HTML = _html.get_template('receipt_document.html')
+RECEIPT_TEXT = _environment(False).get_template('receipt.txt')
+
+RECORD_KEYS = ('id', 'customer_name', 'notes', 'date', 'time', 'total_weight', 'total_labor_cost', 'items')
+ITEM_KEYS = ('item_name', 'weight_kg', 'dimension', 'labor_cost')
+
+def _receipt(record):
+    receipt = dict(zip(RECORD_KEYS, record))
+    receipt['items'] = [dict(zip(ITEM_KEYS, item)) for item in receipt['items']]
+    return receipt
+
+def _pdf_text(line):
+    # Courier in a PDF string: Latin-1 only, with backslash and parentheses escaped
+    text = line.encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def _pdf_pages(receipt):
+    """Compressed content streams, one per A4 page, for a receipt laid out by the text template"""
+    lines = RECEIPT_TEXT.render(receipt=receipt, width=TEXT_WIDTH).splitlines()
+    pages = []
+    for start in range(0, max(len(lines), 1), LINES_PER_PAGE):
+        body = ' T*\n'.join(f'({_pdf_text(line)}) Tj' for line in lines[start:start + LINES_PER_PAGE])
+        stream = (
+            f'BT\n/F1 {FONT_SIZE} Tf\n{LEADING} TL\n{MARGIN_LEFT} {PAGE_HEIGHT - MARGIN_TOP} Td\n{body}\nET'
+        )
+        pages.append(zlib.compress(stream.encode('latin-1')))
+    return pages
+
+def render_fragment(record, render_format):
+    """One receipt as an HTML <section> or a list of PDF page streams"""
+    receipt = _receipt(record)
+    if render_format == 'html':
+        return RECEIPT_HTML.render(receipt=receipt)
+    return _pdf_pages(receipt)
+
+def render_fragments(records, render_format):
+    """render_fragment over a chunk of records; the unit of work sent to pool processes"""
+    return [render_fragment(record, render_format) for record in records]
+
+def html_document(fragments, title='Receipts'):
+    return DOCUMENT_HTML.render(fragments=fragments, title=title).encode('utf-8')
+
+def pdf_document(fragments):
+    """Assemble a PDF from per-receipt page streams; each receipt starts on a new page"""
+    streams = [stream for pages in fragments for stream in pages]
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    page_ids = [4 + 2 * index for index in range(len(streams))]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{" ".join(f"{page_id} 0 R" for page_id in page_ids)}] /Count {len(streams)} >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>'
+    ]
+    for page_id, stream in zip(page_ids, streams):
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>'.encode()
+        )
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+class ReceiptRenderer:
+    """Renders receipts to HTML or PDF with an LRU cache of per-receipt output.
+
+    Receipts are never edited, so a rendering stays valid until the receipt
+    is deleted (callers look the receipt up first) or the labor-rate version
+    changes. Large batches of uncached receipts are spread over a process
+    pool, created lazily per worker process.
+    """
+
+    def __init__(self):
+        self.workers = 2
+        self.cache_size = 5000
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.workers = app.config.get('RENDER_WORKERS', 2)
+        self.cache_size = app.config.get('RENDER_CACHE_SIZE', 5000)
+
+    def _ensure_pool(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            # Fresh interpreters rather than forks of a threaded web worker
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+        return self._pool
+
+    def cached(self, receipt_id, render_format, version):
+        key = (receipt_id, render_format, version)
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return fragment
+
+    def _store(self, receipt_id, render_format, version, fragment):
+        with self._lock:
+            self._entries[(receipt_id, render_format, version)] = fragment
+            while len(self._entries) > self.cache_size:
+                self._entries.popitem(last=False)
+
+    def render(self, records, render_format, version):
+        """Fragments for a list of receipt records, in order, from the cache where possible"""
+        fragments = [self.cached(record[0], render_format, version) for record in records]
+        missing = [index for index, fragment in enumerate(fragments) if fragment is None]
+        todo = [records[index] for index in missing]
+
+        if self.workers and len(todo) >= POOL_MIN_RECEIPTS:
+            with self._lock:
+                pool = self._ensure_pool()
+            chunks = [todo[start:start + POOL_CHUNK_SIZE] for start in range(0, len(todo), POOL_CHUNK_SIZE)]
+            rendered = [
+                fragment for chunk in pool.map(render_fragments, chunks, [render_format] * len(chunks))
+                for fragment in chunk
+            ]
+        else:
+            rendered = render_fragments(todo, render_format)
+
+        for index, fragment in zip(missing, rendered):
+            fragments[index] = fragment
+            self._store(records[index][0], render_format, version, fragment)
+        return fragments
+
+    def document(self, fragments, render_format, title='Receipts'):
+        """The response body for rendered fragments"""
+        if render_format == 'html':
+            return html_document(fragments, title)
+        return pdf_document(fragments)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'workers': self.workers}
+
+renderer = ReceiptRenderer()
@@ -0,0 +1,159 @@
+from sqlalchemy import String, case, func, select, type_coerce
+from models import db, Receipt, ReceiptItem
+import archive
+
+# Largest number of groups a report returns when no top-N is given
+MAX_REPORT_GROUPS = 1000
+
+PERIOD_GROUPS = ('day', 'week', 'month')
+RECEIPT_GROUPS = PERIOD_GROUPS + ('customer',)
+ITEM_GROUPS = ('item_name', 'dimension')
+GROUP_BY_OPTIONS = RECEIPT_GROUPS + ITEM_GROUPS
+METRICS = ('weight', 'labor_cost')
+
+def _period_key(group_by):
+    """Group key for day/week/month as ISO text; weeks are keyed by their Monday"""
+    if db.engine.dialect.name == 'sqlite':
+        if group_by == 'day':
+            return type_coerce(Receipt.date, String)
+        if group_by == 'week':
+            return func.date(Receipt.date, 'weekday 0', '-6 days')
+        return func.strftime('%Y-%m', Receipt.date)
+    if group_by == 'day':
+        return func.to_char(Receipt.date, 'YYYY-MM-DD')
+    if group_by == 'week':
+        return func.to_char(func.date_trunc('week', Receipt.date), 'YYYY-MM-DD')
+    return func.to_char(Receipt.date, 'YYYY-MM')
+
+def _base_rows(group_by, metric, start_dt, end_dt):
+    """One row per receipt (or per item for item groupings) with its group key and metric value"""
+    if group_by in ITEM_GROUPS:
+        column = ReceiptItem.item_name if group_by == 'item_name' else func.coalesce(ReceiptItem.dimension, '')
+        value = ReceiptItem.weight_kg if metric == 'weight' else ReceiptItem.labor_cost
+        return select(
+            column.label('group_key'),
+            ReceiptItem.receipt_id.label('receipt_id'),
+            ReceiptItem.weight_kg.label('weight'),
+            ReceiptItem.labor_cost.label('labor_cost'),
+            value.label('value')
+        ).join(Receipt, Receipt.id == ReceiptItem.receipt_id).where(Receipt.date.between(start_dt, end_dt))
+
+    column = Receipt.customer_name if group_by == 'customer' else _period_key(group_by)
+    value = Receipt.total_weight if metric == 'weight' else Receipt.total_labor_cost
+    return select(
+        column.label('group_key'),
+        Receipt.id.label('receipt_id'),
+        Receipt.total_weight.label('weight'),
+        Receipt.total_labor_cost.label('labor_cost'),
+        value.label('value')
+    ).where(Receipt.date.between(start_dt, end_dt))
+
+def _group(group_by, key, receipts, item_count, total_weight, total_labor_cost):
+    group = {
+        'key': key,
+        'receipts': receipts,
+        'total_weight': total_weight or 0.0,
+        'total_labor_cost': total_labor_cost or 0.0,
+    }
+    if group_by in ITEM_GROUPS:
+        group['items'] = item_count
+    return group
+
+def build_report(group_by, metric, start_dt, end_dt, top=None, percentiles=()):
+    """Grouped weight and labor cost totals between two dates, computed in a single query.
+
+    Percentiles are nearest-rank percentiles of the metric per receipt (or per
+    item for item groupings) within each group, ranked with window functions.
+    Period groupings are ordered by period; everything else, and any top-N
+    report, is ordered by the metric total, largest first. Ranges reaching
+    into archived months are answered by _merged_report instead.
+    """
+    sources = archive.sources_between(start_dt, end_dt)
+    if len(sources) > 1:
+        return _merged_report(sources, group_by, metric, start_dt, end_dt, top, percentiles)
+
+    base = _base_rows(group_by, metric, start_dt, end_dt).subquery()
+    ranked = select(
+        base,
+        func.row_number().over(partition_by=base.c.group_key, order_by=base.c.value).label('value_rank'),
+        func.count().over(partition_by=base.c.group_key).label('group_size')
+    ).subquery()
+
+    metric_total = func.sum(ranked.c.weight if metric == 'weight' else ranked.c.labor_cost)
+    columns = [
+        ranked.c.group_key,
+        func.count(ranked.c.receipt_id.distinct()).label('receipts'),
+        func.count().label('item_count'),
+        func.sum(ranked.c.weight).label('total_weight'),
+        func.sum(ranked.c.labor_cost).label('total_labor_cost'),
+    ]
+    for percentile in percentiles:
+        # Integer ceil(percentile / 100 * n), so the rank matches on every database
+        target_rank = (ranked.c.group_size * percentile + 99) // 100
+        columns.append(func.max(case((ranked.c.value_rank == target_rank, ranked.c.value))).label(f'p{percentile}'))
+
+    query = select(*columns).group_by(ranked.c.group_key)
+    if top:
+        query = query.order_by(metric_total.desc(), ranked.c.group_key).limit(top)
+    elif group_by in PERIOD_GROUPS:
+        query = query.order_by(ranked.c.group_key).limit(MAX_REPORT_GROUPS)
+    else:
+        query = query.order_by(metric_total.desc(), ranked.c.group_key).limit(MAX_REPORT_GROUPS)
+
+    groups = []
+    for row in db.session.execute(query):
+        group = _group(group_by, row.group_key, row.receipts, row.item_count, row.total_weight, row.total_labor_cost)
+        if percentiles:
+            group['percentiles'] = {str(percentile): getattr(row, f'p{percentile}') for percentile in percentiles}
+        groups.append(group)
+    return groups
+
+def _merged_report(sources, group_by, metric, start_dt, end_dt, top, percentiles):
+    """build_report over the live database and archives: grouped in SQL per database, then combined.
+
+    Receipts never span databases, so counts and sums add up exactly.
+    Percentiles cannot be combined from per-database ranks, so the metric
+    values are fetched sorted per group and ranked here instead.
+    """
+    base = _base_rows(group_by, metric, start_dt, end_dt).subquery()
+    totals_query = select(
+        base.c.group_key,
+        func.count(base.c.receipt_id.distinct()),
+        func.count(),
+        func.sum(base.c.weight),
+        func.sum(base.c.labor_cost)
+    ).group_by(base.c.group_key)
+    values_query = select(base.c.group_key, base.c.value).order_by(base.c.group_key, base.c.value)
+
+    totals = {}
+    values = {}
+    for source in sources:
+        with archive.connect(source) as connection:
+            for key, receipts, item_count, total_weight, total_labor_cost in connection.execute(totals_query):
+                entry = totals.setdefault(key, [0, 0, 0.0, 0.0])
+                entry[0] += receipts
+                entry[1] += item_count
+                entry[2] += total_weight or 0.0
+                entry[3] += total_labor_cost or 0.0
+            if percentiles:
+                for key, value in connection.execute(values_query):
+                    values.setdefault(key, []).append(value)
+
+    metric_index = 2 if metric == 'weight' else 3
+    keys = list(totals)
+    if top or group_by not in PERIOD_GROUPS:
+        keys.sort(key=lambda key: (-totals[key][metric_index], key or ''))
+    else:
+        keys.sort(key=lambda key: key or '')
+    keys = keys[:top or MAX_REPORT_GROUPS]
+
+    groups = []
+    for key in keys:
+        group = _group(group_by, key, *totals[key])
+        if percentiles:
+            ordered = sorted(values[key])
+            group['percentiles'] = {
+                str(percentile): ordered[(len(ordered) * percentile + 99) // 100 - 1] for percentile in percentiles
+            }
+        groups.append(group)
+    return groups
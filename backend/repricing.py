@@ -0,0 +1,91 @@
+from datetime import datetime, time as time_cls
+from sqlalchemy import and_, func, insert, literal, or_, select, update
+from models import db, Receipt, ReceiptItem, ReceiptChange, rebuild_daily_aggregates
+from rate_cache import labor_rate_cache
+from versioning import data_version
+
+# Receipts repriced per transaction
+REPRICE_CHUNK_SIZE = 500
+
+def _at_or_after(instant):
+    """Receipts whose local date and time is at or after an instant"""
+    return or_(Receipt.date > instant.date(), and_(Receipt.date == instant.date(), Receipt.time >= instant.time()))
+
+def _rate_periods(start_date, end_date):
+    """(rate, receipt condition) for every history entry in effect during the date range"""
+    range_start = datetime.combine(start_date, time_cls.min)
+    range_end = datetime.combine(end_date, time_cls.max)
+    periods = labor_rate_cache.periods()
+    conditions = []
+    for index, (effective_from, rate) in enumerate(periods):
+        until = periods[index + 1][0] if index + 1 < len(periods) else None
+        if effective_from > range_end or (until is not None and (until <= range_start or until <= effective_from)):
+            continue
+        condition = _at_or_after(effective_from)
+        if until is not None:
+            condition = and_(condition, ~_at_or_after(until))
+        conditions.append((rate, condition))
+    return conditions
+
+def reprice_receipts(start_date, end_date, chunk_size=REPRICE_CHUNK_SIZE, progress=None):
+    """Recompute item labor costs and receipt totals between two dates from the labor rate history.
+
+    Each item is priced at the rate in effect at its receipt's date and time.
+    Receipts are walked in id order, chunk_size per transaction, and every
+    change is a set-based UPDATE; no receipt or item rows are loaded. Only
+    receipts whose total changes are rewritten and published to the change
+    feed. Receipts in archived months are left as they are. progress, if
+    given, is called with (receipts done, receipts in range) after each chunk.
+    """
+    in_range = Receipt.date.between(start_date, end_date)
+    first_id, total = db.session.execute(select(func.min(Receipt.id), func.count(Receipt.id)).where(in_range)).one()
+    periods = _rate_periods(start_date, end_date)
+    labor_total = select(func.coalesce(func.sum(ReceiptItem.labor_cost), 0.0)) \
+        .where(ReceiptItem.receipt_id == Receipt.id).scalar_subquery()
+    changed = func.abs(Receipt.total_labor_cost - labor_total) > 1e-6
+
+    done = 0
+    repriced = 0
+    last_id = (first_id or 0) - 1
+    while first_id is not None:
+        # Last id of this chunk, read off the primary key index
+        upper = db.session.scalar(
+            select(Receipt.id).where(in_range, Receipt.id > last_id).order_by(Receipt.id).offset(chunk_size - 1).limit(1)
+        )
+        chunk = and_(in_range, Receipt.id > last_id)
+        if upper is not None:
+            chunk = and_(chunk, Receipt.id <= upper)
+
+        try:
+            for rate, condition in periods:
+                db.session.execute(
+                    update(ReceiptItem)
+                    .where(ReceiptItem.receipt_id.in_(select(Receipt.id).where(chunk, condition)))
+                    .values(labor_cost=ReceiptItem.weight_kg * rate)
+                )
+            db.session.execute(insert(ReceiptChange).from_select(
+                ['receipt_id', 'operation', 'changed_at'],
+                select(Receipt.id, literal('update'), literal(datetime.utcnow())).where(chunk, changed)
+            ))
+            result = db.session.execute(update(Receipt).where(chunk, changed).values(total_labor_cost=labor_total))
+            chunk_count = db.session.scalar(select(func.count(Receipt.id)).where(chunk))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        done += chunk_count
+        repriced += result.rowcount
+        if result.rowcount:
+            data_version.bump()
+        if progress:
+            progress(done, total)
+        if upper is None:
+            break
+        last_id = upper
+
+    days = rebuild_daily_aggregates(start_date, end_date)
+    # Rendered receipts are cached per rate version
+    labor_rate_cache.invalidate()
+    data_version.bump()
+    return {'receipts': total, 'repriced': repriced, 'days': days}
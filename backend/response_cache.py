@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from datetime import date
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request
+from versioning import data_version
+
+class ResponseCache:
+    """LRU cache of rendered responses, valid for a single data version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, mimetype, max_entries):
+        with self._lock:
+            self._entries[key] = (version, body, mimetype)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified
+            }
+
+response_cache = ResponseCache()
+
+def _cache_key():
+    args = '&'.join(f'{name}={value}' for name, value in sorted(request.args.items(multi=True)))
+    # Views default to "today", so a new day invalidates entries even without writes
+    return f'{date.today().isoformat()}|{request.path}?{args}'
+
+def _etag(key, version):
+    return hashlib.sha1(f'{version}|{key}'.encode('utf-8')).hexdigest()[:20]
+
+def cached_response(view=None, vary=None):
+    """Cache a GET view's JSON response until the data version changes.
+
+    Responses carry an ETag; a matching If-None-Match is answered with 304
+    before the view runs. Place it under @jwt_required() so authentication
+    is still checked on every request. vary, if given, returns a token for
+    state outside the database that the response also depends on; use it
+    as @cached_response(vary=...).
+    """
+    if view is None:
+        return lambda view: cached_response(view, vary)
+    
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+            return view(*args, **kwargs)
+        
+        version = data_version.read() or 'initial'
+        if vary is not None:
+            version = f'{version}|{vary()}'
+        key = _cache_key()
+        etag = _etag(key, version)
+        
+        if etag in request.if_none_match:
+            response_cache.not_modified += 1
+            response = make_response('', 304)
+        else:
+            entry = response_cache.get(key, version)
+            if entry is not None:
+                response = make_response(entry[1])
+                response.mimetype = entry[2]
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                response_cache.put(
+                    key, version, response.get_data(), response.mimetype,
+                    current_app.config.get('RESPONSE_CACHE_SIZE', 256)
+                )
+        
+        response.set_etag(etag)
+        # Let browsers keep the response but revalidate it on every poll
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
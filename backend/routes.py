@@ -0,0 +1,129 @@
+from flask import Blueprint
+from controllers import AuthController, LaborRateController, ReceiptController, SummaryController, DatabaseController
+from instrumentation import metrics_response
+
+api = Blueprint('api', __name__)
+
+# API Routes
+@api.route('/api/login', methods=['POST'])
+def login():
+    return AuthController.login()
+
+@api.route('/api/update-password', methods=['POST'])
+def update_password():
+    return AuthController.update_password()
+
+@api.route('/api/labor-rate', methods=['GET'])
+def get_labor_rate():
+    return LaborRateController.get_labor_rate()
+
+@api.route('/api/labor-rate', methods=['PUT'])
+def update_labor_rate():
+    return LaborRateController.update_labor_rate()
+
+@api.route('/api/labor-rate/history', methods=['GET'])
+def get_labor_rate_history():
+    return LaborRateController.get_labor_rate_history()
+
+@api.route('/api/labor-rate/reprice', methods=['POST'])
+def reprice_receipts():
+    return LaborRateController.reprice_receipts()
+
+@api.route('/api/receipts', methods=['GET'])
+def get_receipts():
+    return ReceiptController.get_receipts()
+
+@api.route('/api/receipts/search', methods=['GET'])
+def search_receipts():
+    return ReceiptController.search_receipts()
+
+@api.route('/api/receipts/changes', methods=['GET'])
+def get_receipt_changes():
+    return ReceiptController.get_changes()
+
+@api.route('/api/receipts', methods=['POST'])
+def create_receipt():
+    return ReceiptController.create_receipt()
+
+@api.route('/api/receipts/bulk', methods=['POST'])
+def create_receipts_bulk():
+    return ReceiptController.create_receipts_bulk()
+
+@api.route('/api/receipts/render', methods=['GET'])
+def render_receipts():
+    return ReceiptController.render_receipts()
+
+@api.route('/api/receipts/<int:receipt_id>/render', methods=['GET'])
+def render_receipt(receipt_id):
+    return ReceiptController.render_receipt(receipt_id)
+
+@api.route('/api/receipts/<int:receipt_id>', methods=['DELETE'])
+def delete_receipt(receipt_id):
+    return ReceiptController.delete_receipt(receipt_id)
+
+@api.route('/api/summary', methods=['GET'])
+def get_summary():
+    return SummaryController.get_summary()
+
+@api.route('/api/monthly-summary', methods=['GET'])
+def get_monthly_summary():
+    return SummaryController.get_monthly_summary()
+
+@api.route('/api/range-summary', methods=['GET'])
+def get_range_summary():
+    return SummaryController.get_range_summary()
+
+@api.route('/api/reports', methods=['GET'])
+def get_report():
+    return SummaryController.get_report()
+
+@api.route('/api/export', methods=['GET'])
+def export_data():
+    return SummaryController.export_data()
+
+# Database Management Routes (Admin only)
+@api.route('/api/admin/auth-metrics', methods=['GET'])
+def get_auth_metrics():
+    return AuthController.get_auth_metrics()
+
+@api.route('/api/admin/database-stats', methods=['GET'])
+def get_database_stats():
+    return DatabaseController.get_database_stats()
+
+@api.route('/api/admin/table-data', methods=['GET'])
+def get_table_data():
+    return DatabaseController.get_table_data()
+
+@api.route('/api/admin/query-plans', methods=['GET'])
+def get_query_plans():
+    return DatabaseController.get_query_plans()
+
+@api.route('/api/admin/write-behind', methods=['GET'])
+def get_write_behind_status():
+    return DatabaseController.get_write_behind_status()
+
+@api.route('/api/admin/backup', methods=['POST'])
+def start_backup():
+    return DatabaseController.start_maintenance('backup')
+
+@api.route('/api/admin/integrity-check', methods=['POST'])
+def start_integrity_check():
+    return DatabaseController.start_maintenance('integrity_check')
+
+@api.route('/api/admin/vacuum', methods=['POST'])
+def start_vacuum():
+    return DatabaseController.start_maintenance('vacuum')
+
+@api.route('/api/admin/archives', methods=['GET'])
+def get_archives():
+    return DatabaseController.get_archives()
+
+# Metrics endpoint (Prometheus text format, per worker)
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    return metrics_response()
+
+# Health check endpoint
+@api.route('/api/health', methods=['GET'])
+def health_check():
+    return {'status': 'ok', 'message': 'Iron & Steel Business API is running'}
@@ -0,0 +1,116 @@
+import re
+from sqlalchemy import Integer, column, text
+from models import db
+
+# FTS5 virtual table keyed by receipt id (its rowid). Item names and dimensions
+# of a receipt are stored space-joined so one row matches the whole receipt.
+SEARCH_TABLE_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS receipt_search USING fts5(
+    customer_name, notes, item_names, dimensions,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# bm25 column weights: customer_name, notes, item_names, dimensions
+RANK_EXPRESSION = 'bm25(receipt_search, 10.0, 1.0, 5.0, 2.0)'
+
+_search_available = None
+
+def search_available():
+    """Whether the FTS5 search index exists in the current database"""
+    global _search_available
+    if _search_available is None:
+        if db.engine.dialect.name != 'sqlite':
+            _search_available = False
+        else:
+            _search_available = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'receipt_search'"
+            )).first() is not None
+    return _search_available
+
+def ensure_search_index():
+    """Create the FTS5 search index if SQLite supports it, backfilling it when new"""
+    global _search_available
+    if db.engine.dialect.name != 'sqlite':
+        _search_available = False
+        return
+    
+    exists = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'receipt_search'"
+    )).first() is not None
+    if not exists:
+        try:
+            db.session.execute(text(SEARCH_TABLE_DDL))
+        except Exception:
+            # SQLite built without FTS5; searches fall back to ILIKE
+            db.session.rollback()
+            _search_available = False
+            return
+        rebuild_search_index()
+    _search_available = True
+
+def rebuild_search_index():
+    """Repopulate the search index from the receipt and receipt_item tables"""
+    db.session.execute(text("DELETE FROM receipt_search"))
+    result = db.session.execute(text("""
+        INSERT INTO receipt_search (rowid, customer_name, notes, item_names, dimensions)
+        SELECT r.id, coalesce(r.customer_name, ''), coalesce(r.notes, ''),
+               coalesce(group_concat(i.item_name, ' '), ''), coalesce(group_concat(i.dimension, ' '), '')
+        FROM receipt r
+        LEFT JOIN receipt_item i ON i.receipt_id = r.id
+        GROUP BY r.id
+    """))
+    db.session.commit()
+    return result.rowcount
+
+def index_receipt(receipt_id, customer_name, notes, items):
+    """Add a receipt to the search index in the current transaction"""
+    index_receipts([(receipt_id, customer_name, notes, items)])
+
+def index_receipts(entries):
+    """Add (receipt_id, customer_name, notes, items) entries to the search index in one executemany"""
+    if not search_available() or not entries:
+        return
+    db.session.execute(text("""
+        INSERT INTO receipt_search (rowid, customer_name, notes, item_names, dimensions)
+        VALUES (:id, :customer_name, :notes, :item_names, :dimensions)
+    """), [{
+        'id': receipt_id,
+        'customer_name': customer_name or '',
+        'notes': notes or '',
+        'item_names': ' '.join(str(item.get('item_name') or '') for item in items),
+        'dimensions': ' '.join(str(item.get('dimension') or '') for item in items)
+    } for receipt_id, customer_name, notes, items in entries])
+
+def remove_receipt(receipt_id):
+    """Remove a receipt from the search index in the current transaction"""
+    if not search_available():
+        return
+    db.session.execute(text("DELETE FROM receipt_search WHERE rowid = :id"), {'id': receipt_id})
+
+def build_match_query(search_text):
+    """Turn free text into an FTS5 query where every token must prefix-match.
+
+    Returns None when the text contains no searchable tokens.
+    """
+    tokens = re.findall(r'\w+', search_text or '', re.UNICODE)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def matching_ids_clause(match_query):
+    """SQL selecting the ids of receipts matching an FTS5 query, for use with IN"""
+    return text("SELECT rowid FROM receipt_search WHERE receipt_search MATCH :match_query").bindparams(
+        match_query=match_query
+    ).columns(column('rowid', Integer))
+
+def ranked_receipt_ids(match_query, limit):
+    """Ids of the best-matching receipts, most relevant first"""
+    rows = db.session.execute(text(f"""
+        SELECT rowid FROM receipt_search
+        WHERE receipt_search MATCH :match_query
+        ORDER BY {RANK_EXPRESSION}
+        LIMIT :limit
+    """), {'match_query': match_query, 'limit': limit})
+    return [row[0] for row in rows]
@@ -0,0 +1,110 @@
+import json
+from flask import Response
+from sqlalchemy import String, select, type_coerce
+from models import db, Receipt, ReceiptItem
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+def dumps(payload):
+    """Encode a payload of plain dicts, lists, strings and numbers to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200):
+    """Fast-path replacement for jsonify() on large payloads"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+def _raw(column):
+    # SQLite returns the stored ISO text instead of building date/time objects
+    return type_coerce(column, String)
+
+# Formatters accept the stored text (SQLite) or date/time objects (other databases)
+def fmt_date(value):
+    return value if isinstance(value, str) else value.isoformat()
+
+def fmt_time(value):
+    return value[:8] if isinstance(value, str) else value.strftime('%H:%M:%S')
+
+def _trim_micros(value):
+    # isoformat() leaves out a zero microsecond part, SQLite stores it as .000000
+    return value[:-7] if value.endswith('.000000') else value
+
+def fmt_time_full(value):
+    return _trim_micros(value) if isinstance(value, str) else value.isoformat()
+
+def fmt_datetime(value):
+    return _trim_micros(value).replace(' ', 'T') if isinstance(value, str) else value.isoformat()
+
+# Column projections and the matching key layouts, computed once
+RECEIPT_LIST_COLUMNS = (
+    Receipt.id, Receipt.customer_name, Receipt.notes, _raw(Receipt.date), _raw(Receipt.time),
+    Receipt.total_weight, Receipt.total_labor_cost, _raw(Receipt.created_at)
+)
+RECEIPT_LIST_KEYS = ('id', 'customer_name', 'notes', 'date', 'time', 'total_weight', 'total_labor_cost', 'created_at', 'items')
+
+EXPORT_COLUMNS = (
+    Receipt.id, Receipt.customer_name, _raw(Receipt.date), _raw(Receipt.time),
+    Receipt.total_weight, Receipt.total_labor_cost, Receipt.notes
+)
+EXPORT_KEYS = ('id', 'customer_name', 'date', 'time', 'total_weight', 'total_labor_cost', 'notes', 'items')
+
+ITEM_COLUMNS = (
+    ReceiptItem.receipt_id, ReceiptItem.id, ReceiptItem.item_name,
+    ReceiptItem.weight_kg, ReceiptItem.dimension, ReceiptItem.labor_cost
+)
+LIST_ITEM_KEYS = ('id', 'item_name', 'weight_kg', 'dimension', 'labor_cost')
+EXPORT_ITEM_KEYS = ('item_name', 'weight_kg', 'dimension', 'labor_cost')
+
+def load_item_rows(receipt_ids, connection=None):
+    """Item tuples (receipt_id, id, item_name, weight_kg, dimension, labor_cost) grouped by receipt, one IN query"""
+    items_by_receipt = {}
+    if not receipt_ids:
+        return items_by_receipt
+    rows = (connection or db.session).execute(
+        select(*ITEM_COLUMNS).where(ReceiptItem.receipt_id.in_(receipt_ids)).order_by(ReceiptItem.receipt_id, ReceiptItem.id)
+    )
+    for row in rows:
+        items_by_receipt.setdefault(row[0], []).append(row)
+    return items_by_receipt
+
+def receipt_list_payload(rows, items_by_receipt=None):
+    """Dicts for the receipt list endpoints from RECEIPT_LIST_COLUMNS rows"""
+    if items_by_receipt is None:
+        items_by_receipt = load_item_rows([row[0] for row in rows])
+    payload = []
+    for row in rows:
+        items = [
+            dict(zip(LIST_ITEM_KEYS, (item[1], item[2], item[3], item[4] or '', item[5])))
+            for item in items_by_receipt.get(row[0], ())
+        ]
+        payload.append(dict(zip(RECEIPT_LIST_KEYS, (
+            row[0], row[1], row[2], fmt_date(row[3]), fmt_time(row[4]), row[5], row[6], fmt_datetime(row[7]), items
+        ))))
+    return payload
+
+def export_payload(rows, items_by_receipt):
+    """Dicts for the JSON/NDJSON export from EXPORT_COLUMNS rows"""
+    payload = []
+    for row in rows:
+        items = [
+            dict(zip(EXPORT_ITEM_KEYS, (item[2], item[3], item[4], item[5])))
+            for item in items_by_receipt.get(row[0], ())
+        ]
+        payload.append(dict(zip(EXPORT_KEYS, (
+            row[0], row[1], fmt_date(row[2]), fmt_time_full(row[3]), row[4], row[5], row[6], items
+        ))))
+    return payload
+
+def render_records(rows, items_by_receipt):
+    """Plain tuples for rendering.render_fragment from EXPORT_COLUMNS rows, picklable for pool processes"""
+    return [
+        (
+            row[0], row[1], row[6], fmt_date(row[2]), fmt_time(row[3]), row[4], row[5],
+            [(item[2], item[3], item[4], item[5]) for item in items_by_receipt.get(row[0], ())]
+        )
+        for row in rows
+    ]
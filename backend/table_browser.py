@@ -0,0 +1,245 @@
+import threading
+import time
+from datetime import date, datetime, time as time_cls
+from flask import current_app
+from sqlalchemy import Date, DateTime, String, Time, func, select, type_coerce
+from models import db, User, LaborRate, LaborRateHistory, Receipt, ReceiptItem, ReceiptChange
+from serializers import dumps, fmt_date, fmt_time_full, fmt_datetime
+from versioning import data_version
+
+# Columns the admin browser may show per table; password hashes are never exposed
+BROWSABLE_TABLES = {
+    'user': (User, ('id', 'username', 'created_at')),
+    'receipt': (Receipt, (
+        'id', 'customer_name', 'notes', 'date', 'time', 'total_weight', 'total_labor_cost', 'created_at'
+    )),
+    'receipt_item': (ReceiptItem, ('id', 'receipt_id', 'item_name', 'weight_kg', 'dimension', 'labor_cost')),
+    'labor_rate': (LaborRate, ('id', 'rate_per_kg', 'updated_at')),
+    'labor_rate_history': (LaborRateHistory, ('id', 'rate_per_kg', 'effective_from', 'created_at')),
+}
+
+DEFAULT_BROWSE_LIMIT = 50
+MAX_BROWSE_LIMIT = 5000
+
+# Rows fetched from the database per streamed chunk
+BROWSE_CHUNK_SIZE = 500
+
+# Query arguments that are not column filters
+BROWSE_ARGUMENTS = ('table', 'columns', 'order', 'after', 'limit')
+
+FILTER_OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'contains': lambda column, value: column.contains(value, autoescape=True),
+}
+
+def _formatter(column):
+    if isinstance(column.type, DateTime):
+        return fmt_datetime
+    if isinstance(column.type, Date):
+        return fmt_date
+    if isinstance(column.type, Time):
+        return fmt_time_full
+    return None
+
+def _parse(column, text):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(text)
+    if python_type is date:
+        return date.fromisoformat(text)
+    if python_type is time_cls:
+        return time_cls.fromisoformat(text)
+    return python_type(text)
+
+def browse(table_name, args):
+    """Validate browser arguments and return a generator of JSON chunks for one page of a table.
+
+    args is the request's query arguments: columns (comma-separated
+    projection, id always included), order (desc by default), after (the
+    next_cursor of the previous page), limit, and filters named
+    <column> or <column>__<eq|gt|gte|lt|lte|contains>. Raises ValueError for
+    anything invalid before a byte is streamed.
+    """
+    if table_name not in BROWSABLE_TABLES:
+        raise ValueError('Invalid table name')
+    model, allowed = BROWSABLE_TABLES[table_name]
+    table = model.__table__
+
+    names = list(allowed)
+    if args.get('columns'):
+        names = ['id'] + [name for name in args['columns'].split(',') if name and name != 'id']
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValueError(f'Unknown columns: {", ".join(unknown)}')
+
+    descending = args.get('order', 'desc') != 'asc'
+    limit = int(args.get('limit', DEFAULT_BROWSE_LIMIT))
+    if limit < 1 or limit > MAX_BROWSE_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_BROWSE_LIMIT}')
+
+    conditions = []
+    if args.get('after'):
+        after = int(args['after'])
+        conditions.append(table.c.id < after if descending else table.c.id > after)
+    for argument, text in args.items():
+        if argument in BROWSE_ARGUMENTS:
+            continue
+        name, _, operator = argument.partition('__')
+        if name not in allowed or (operator or 'eq') not in FILTER_OPERATORS:
+            raise ValueError(f'Unknown filter {argument}')
+        column = table.c[name]
+        if operator == 'contains' and column.type.python_type is not str:
+            raise ValueError(f'{name} is not a text column')
+        value = text if operator == 'contains' else _parse(column, text)
+        conditions.append(FILTER_OPERATORS[operator or 'eq'](column, value))
+
+    columns = [table.c[name] for name in names]
+    formatters = [_formatter(column) for column in columns]
+    # SQLite returns temporal columns as their stored text; the formatters accept either
+    query = select(*(
+        type_coerce(column, String) if formatter else column for column, formatter in zip(columns, formatters)
+    )) \
+        .where(*conditions) \
+        .order_by(table.c.id.desc() if descending else table.c.id) \
+        .limit(limit + 1)
+    return _stream(table_name, names, formatters, query, limit)
+
+def _stream(table_name, names, formatters, query, limit):
+    yield b'{"table":' + dumps(table_name) + b',"columns":' + dumps(names) + b',"data":['
+    count = 0
+    has_more = False
+    last_id = None
+    result = db.session.execute(query.execution_options(yield_per=BROWSE_CHUNK_SIZE))
+    for rows in result.partitions():
+        if count + len(rows) > limit:
+            rows = rows[:limit - count]
+            has_more = True
+        chunk = b','.join(
+            dumps(dict(zip(names, (
+                formatter(value) if formatter and value is not None else value
+                for formatter, value in zip(formatters, row)
+            ))))
+            for row in rows
+        )
+        if chunk:
+            yield (b',' if count else b'') + chunk
+        count += len(rows)
+        if rows:
+            last_id = rows[-1][0]
+        if has_more:
+            break
+    result.close()
+    yield b'],"count":' + dumps(count) + b',"next_cursor":' + dumps(last_id if has_more else None) + \
+        b',"estimated_total":' + dumps(row_counts.estimate(table_name)) + b'}'
+
+class RowCountEstimator:
+    """Cached row counts per table, kept current without COUNT(*) scans.
+
+    The first count is exact. After that, while the data version is unchanged
+    the cached figure is returned without a query; when it has changed, only
+    rows past the highest id seen are counted, a range scan of the primary
+    key. Receipt deletes are taken from the change feed; the items of deleted
+    receipts, and rows removed any other way (archiving), are caught by a
+    full count on a background thread, started when receipts were deleted
+    and at least every TABLE_COUNT_RECOUNT_SECONDS. A new restore marker in
+    the change feed makes the next estimate a full count.
+    """
+
+    def __init__(self):
+        self.recount_seconds = 300
+        self._lock = threading.Lock()
+        self._entries = {}  # table name -> count, max_id, version, seq, counted_at
+        self._recounting = set()
+
+    def init_app(self, app):
+        self.recount_seconds = app.config.get('TABLE_COUNT_RECOUNT_SECONDS', 300)
+
+    def _latest_seq(self, table_name):
+        if table_name not in ('receipt', 'receipt_item'):
+            return None
+        return db.session.scalar(select(func.max(ReceiptChange.seq)))
+
+    def _restored_at(self):
+        return db.session.scalar(select(func.max(ReceiptChange.seq)).where(ReceiptChange.operation == 'restore'))
+
+    def _full_count(self, table_name):
+        # Read the version and feed position first so rows added during the count are picked up incrementally
+        version = data_version.read()
+        seq = self._latest_seq(table_name)
+        restored = self._restored_at()
+        table = BROWSABLE_TABLES[table_name][0].__table__
+        count, max_id = db.session.execute(select(func.count(), func.max(table.c.id))).one()
+        return {
+            'count': count, 'max_id': max_id, 'version': version, 'seq': seq, 'restored': restored,
+            'counted_at': time.monotonic()
+        }
+
+    def estimate(self, table_name):
+        """Approximate number of rows in a browsable table"""
+        version = data_version.read()
+        with self._lock:
+            entry = self._entries.get(table_name)
+        if entry is None:
+            entry = self._full_count(table_name)
+        elif entry['version'] != version:
+            table = BROWSABLE_TABLES[table_name][0].__table__
+            seq = self._latest_seq(table_name)
+            if self._restored_at() != entry['restored']:
+                # The database was restored, so every table may have changed
+                entry = self._full_count(table_name)
+            else:
+                added, max_id = db.session.execute(
+                    select(func.count(), func.max(table.c.id)).where(table.c.id > (entry['max_id'] or 0))
+                ).one()
+                deleted = 0
+                if seq is not None and seq != entry['seq']:
+                    deleted = db.session.scalar(select(func.count()).where(
+                        ReceiptChange.seq > (entry['seq'] or 0), ReceiptChange.operation == 'delete'
+                    ))
+                entry = dict(
+                    entry, count=entry['count'] + added - (deleted if table_name == 'receipt' else 0),
+                    max_id=max_id or entry['max_id'], version=version, seq=seq
+                )
+                if deleted and table_name == 'receipt_item':
+                    entry['counted_at'] = 0.0
+        with self._lock:
+            self._entries[table_name] = entry
+        if time.monotonic() - entry['counted_at'] > self.recount_seconds:
+            self._start_recount(table_name)
+        return entry['count']
+
+    def _start_recount(self, table_name):
+        with self._lock:
+            if table_name in self._recounting:
+                return
+            self._recounting.add(table_name)
+        threading.Thread(
+            target=self._recount, args=(current_app._get_current_object(), table_name),
+            name=f'recount-{table_name}', daemon=True
+        ).start()
+
+    def _recount(self, app, table_name):
+        try:
+            with app.app_context():
+                try:
+                    entry = self._full_count(table_name)
+                finally:
+                    db.session.remove()
+            with self._lock:
+                self._entries[table_name] = entry
+        finally:
+            with self._lock:
+                self._recounting.discard(table_name)
+
+    def status(self):
+        with self._lock:
+            return {
+                name: {'count': entry['count'], 'counted_seconds_ago': round(time.monotonic() - entry['counted_at'], 1)}
+                for name, entry in self._entries.items()
+            }
+
+row_counts = RowCountEstimator()
@@ -0,0 +1,94 @@
+import os
+import sys
+from datetime import datetime, time
+
+import pytest
+
+# The backend is a flat set of modules run from its own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from models import db, init_db, Receipt, ReceiptItem, ReceiptChange, rebuild_daily_aggregates
+from rate_cache import labor_rate_cache
+from response_cache import response_cache
+from table_browser import row_counts
+from versioning import data_version
+import search
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh SQLite file, with every instance file under tmp_path"""
+    app = create_app({
+        'TESTING': True,
+        'JWT_SECRET_KEY': 'test-jwt-secret-key-of-at-least-32-bytes',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'DATA_VERSION_FILE': str(tmp_path / 'data.version'),
+        'LABOR_RATE_VERSION_FILE': str(tmp_path / 'labor_rate.version'),
+        'WRITE_BEHIND_JOURNAL_DIR': str(tmp_path / 'journal'),
+        'ARCHIVE_DIR': str(tmp_path / 'archive'),
+        'BACKUP_DIR': str(tmp_path / 'backups'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'RENDER_WORKERS': 0
+    })
+    init_db(app)
+    # Caches are per process; start each test from versions no earlier test has seen
+    with app.app_context():
+        labor_rate_cache.invalidate()
+        data_version.bump()
+    response_cache.clear()
+    row_counts._entries.clear()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def auth(app):
+    """Authorization header for the default admin, without a bcrypt round-trip"""
+    with app.app_context():
+        return {'Authorization': 'Bearer ' + create_access_token(identity='admin')}
+
+@pytest.fixture
+def add_receipt(app):
+    """Insert a receipt dated in the past, as the write paths would, and return its id"""
+    def add(day, moment=time(12, 0), customer='Customer', weights=(10.0,), rate=10.0, item_name='Rod'):
+        with app.app_context():
+            total_weight = sum(weights)
+            receipt = Receipt(
+                customer_name=customer, notes='', date=day, time=moment,
+                total_weight=total_weight, total_labor_cost=total_weight * rate,
+                created_at=datetime.combine(day, moment)
+            )
+            db.session.add(receipt)
+            db.session.flush()
+            items = [{'item_name': item_name, 'weight_kg': weight, 'dimension': '12mm'} for weight in weights]
+            for item in items:
+                db.session.add(ReceiptItem(receipt_id=receipt.id, labor_cost=item['weight_kg'] * rate, **item))
+            ReceiptChange.record([receipt.id], 'insert')
+            search.index_receipt(receipt.id, customer, '', items)
+            db.session.commit()
+            rebuild_daily_aggregates(day, day)
+            data_version.bump()
+            return receipt.id
+    return add
+
+@pytest.fixture
+def all_pages(client, auth):
+    """Every receipt of a listing, following next_cursor"""
+    def fetch(url):
+        receipts = []
+        cursor = None
+        while True:
+            response = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=auth)
+            assert response.status_code == 200, response.get_json()
+            page = response.get_json()
+            receipts.extend(page['receipts'])
+            cursor = page['next_cursor']
+            if not cursor:
+                return receipts
+    return fetch
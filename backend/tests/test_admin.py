@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import delete
+
+from models import db, Receipt, ReceiptItem, ReceiptChange
+from versioning import data_version
+
+def _browse_all(client, url):
+    rows, after = [], None
+    while True:
+        page = client.get(url + (f'&after={after}' if after else '')).get_json()
+        rows.extend(page['data'])
+        after = page['next_cursor']
+        if after is None:
+            return rows
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_table_browser_pages_cover_the_table(client, add_receipt, order):
+    ids = [add_receipt(date.today(), customer=f'Customer {index}') for index in range(11)]
+    rows = _browse_all(client, f'/api/admin/table-data?table=receipt&limit=3&order={order}')
+    assert [row['id'] for row in rows] == sorted(ids, reverse=order == 'desc')
+
+@pytest.mark.parametrize('query', ['table=password', 'table=user&columns=password_hash', 'table=receipt&id__like=1'])
+def test_table_browser_rejects_invalid_arguments(client, query):
+    assert client.get(f'/api/admin/table-data?{query}').status_code == 400
+
+def test_database_stats_follow_inserts_and_deletes(client, auth, add_receipt):
+    ids = [add_receipt(date.today()) for _ in range(4)]
+    assert client.get('/api/admin/database-stats').get_json()['database_stats']['receipts'] == 4
+    client.delete(f'/api/receipts/{ids[0]}', headers=auth)
+    assert client.get('/api/admin/database-stats').get_json()['database_stats']['receipts'] == 3
+
+def test_database_stats_recount_after_a_restore(app, client, add_receipt):
+    ids = [add_receipt(date.today()) for _ in range(4)]
+    assert client.get('/api/admin/database-stats').get_json()['database_stats']['receipts'] == 4
+    with app.app_context():
+        # What a restore to an older snapshot leaves behind
+        db.session.execute(delete(ReceiptItem).where(ReceiptItem.receipt_id.in_(ids[2:])))
+        db.session.execute(delete(Receipt).where(Receipt.id.in_(ids[2:])))
+        ReceiptChange.record([0], 'restore')
+        db.session.commit()
+        data_version.bump()
+    stats = client.get('/api/admin/database-stats').get_json()['database_stats']
+    assert stats['receipts'] == 2 and stats['items'] == 2
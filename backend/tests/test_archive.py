@@ -0,0 +1,76 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+import archive
+
+def _months_back(count):
+    month_index = date.today().year * 12 + date.today().month - 1 - count
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+@pytest.fixture
+def five_months(add_receipt):
+    """Seven receipts in each of the current and four previous months; returns {id: months back}"""
+    ids = {}
+    for months in range(5):
+        first = _months_back(months)
+        for day in range(0, 28, 4):
+            receipt_id = add_receipt(
+                first + timedelta(days=day), time(10, day), f'Customer {day % 3}', weights=(float(1 + day),)
+            )
+            ids[receipt_id] = months
+    return ids
+
+def _archive_oldest_two(app):
+    with app.app_context():
+        for months in (3, 4):
+            archive.archive_period(_months_back(months).strftime('%Y-%m'))
+
+@pytest.fixture
+def archived(app, five_months):
+    """The five months with the oldest two archived; returns (archived ids, live ids)"""
+    _archive_oldest_two(app)
+    old = [receipt_id for receipt_id, months in five_months.items() if months >= 3]
+    live = [receipt_id for receipt_id, months in five_months.items() if months < 3]
+    return old, live
+
+@pytest.mark.parametrize('url', [
+    '/api/receipts?limit=5&sort_by=date&sort_order=desc',
+    '/api/receipts?limit=5&sort_by=date&sort_order=asc',
+    '/api/receipts?limit=5&sort_by=labor_cost&sort_order=desc',
+    '/api/receipts?limit=5&sort_by=labor_cost&sort_order=asc',
+    '/api/receipts?limit=3&customer=Customer%201',
+])
+def test_listings_are_unchanged_by_archiving(app, client, auth, all_pages, five_months, url):
+    before = all_pages(url)
+    _archive_oldest_two(app)
+    assert client.get('/api/admin/archives', headers=auth).get_json()['archived_receipts'] == 14
+    assert all_pages(url) == before
+
+def test_date_range_inside_archive(all_pages, archived):
+    old, _ = archived
+    first = _months_back(4)
+    last = _months_back(3) + timedelta(days=27)
+    rows = all_pages(f'/api/receipts?limit=4&start_date={first}&end_date={last}')
+    assert sorted(row['id'] for row in rows) == sorted(old)
+
+def test_export_includes_archived_receipts(client, archived):
+    old, live = archived
+    assert {row['id'] for row in client.get('/api/export').get_json()} == set(old) | set(live)
+
+def test_archived_receipt_cannot_be_deleted(client, auth, archived):
+    old, live = archived
+    response = client.delete(f'/api/receipts/{old[0]}', headers=auth)
+    assert response.status_code == 409
+    assert 'archived' in response.get_json()['error']
+    assert client.delete(f'/api/receipts/{live[0]}', headers=auth).status_code == 200
+
+def test_open_month_cannot_be_archived(app):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            archive.archive_period(date.today().strftime('%Y-%m'))
+
+def test_archive_list_needs_a_token(client, auth, archived):
+    assert client.get('/api/admin/archives').status_code == 401
+    periods = client.get('/api/admin/archives', headers=auth).get_json()['archives']
+    assert [period['period'] for period in periods] == [_months_back(months).strftime('%Y-%m') for months in (3, 4)]
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+from rate_limit import login_limiter
+
+def _login(client, password, address):
+    return client.post(
+        '/api/login', json={'username': 'admin', 'password': password}, environ_base={'REMOTE_ADDR': address}
+    )
+
+def test_failed_logins_elsewhere_do_not_lock_the_account(client):
+    for index in range(5):
+        assert _login(client, 'wrong', f'10.0.0.{index}').status_code == 401
+    assert _login(client, 'admin123', '10.0.0.99').status_code == 200
+
+def test_failures_spread_over_many_addresses_are_limited(app, client):
+    app.config['LOGIN_ATTEMPTS_PER_USER_PER_MINUTE'] = 6
+    login_limiter.init_app(app)
+    for index in range(6):
+        assert _login(client, 'wrong', f'10.0.1.{index}').status_code == 401
+    response = _login(client, 'admin123', '10.0.2.1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_successful_logins_are_not_limited_per_user(client):
+    for _ in range(7):
+        assert _login(client, 'admin123', '10.0.0.1').status_code == 200
+
+def test_repeated_failures_from_one_address_are_limited(client):
+    for _ in range(5):
+        assert _login(client, 'wrong', '10.0.0.1').status_code == 401
+    response = _login(client, 'admin123', '10.0.0.1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert _login(client, 'admin123', '10.0.0.2').status_code == 200
+
+def test_importing_the_app_does_not_load_bcrypt():
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run(
+        [sys.executable, '-c', "import sys, app; assert 'bcrypt' not in sys.modules"], cwd=backend, check=True
+    )
+
+def test_auth_metrics_need_a_token(client, auth):
+    assert client.get('/api/admin/auth-metrics').status_code == 401
+    metrics = client.get('/api/admin/auth-metrics', headers=auth).get_json()
+    assert set(metrics['rate_limiting']) == {'rejected_by_user', 'rejected_by_user_and_ip', 'rejected_by_ip'}
@@ -0,0 +1,61 @@
+from models import db, reserve_receipt_ids
+
+def test_bulk_accepts_numeric_item_text(client, auth):
+    response = client.post('/api/receipts/bulk', headers=auth, json={'receipts': [
+        {'items': [{'item_name': 'Pipe', 'weight_kg': 1, 'dimension': 10}]},
+        {'items': [{'item_name': 7, 'weight_kg': 3}]}
+    ]})
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['created'] == 2
+
+def test_bulk_rejects_whole_batch_when_one_receipt_is_invalid(client, auth):
+    response = client.post('/api/receipts/bulk', headers=auth, json={'receipts': [
+        {'items': [{'item_name': 'Pipe', 'weight_kg': 1}]},
+        {'items': [{'item_name': 'Pipe', 'weight_kg': 0}]}
+    ]})
+    assert response.status_code == 400
+    assert [error['index'] for error in response.get_json()['errors']] == [1]
+    assert client.get('/api/receipts', headers=auth).get_json()['receipts'] == []
+
+def test_bulk_idempotency_keys(client, auth):
+    batch = {'receipts': [
+        {'idempotency_key': 'terminal-1-0001', 'items': [{'item_name': 'Pipe', 'weight_kg': 1}]},
+        {'idempotency_key': 'terminal-1-0001', 'items': [{'item_name': 'Pipe', 'weight_kg': 1}]},
+        {'items': [{'item_name': 'Angle', 'weight_kg': 2}]}
+    ]}
+    first = client.post('/api/receipts/bulk', headers=auth, json=batch).get_json()
+    assert [result['status'] for result in first['results']] == ['created', 'duplicate', 'created']
+    assert first['results'][1]['duplicate_of'] == 0
+
+    retry = client.post('/api/receipts/bulk', headers=auth, json={'receipts': batch['receipts'][:1]})
+    assert retry.status_code == 200
+    assert retry.get_json()['results'][0] == {
+        'index': 0, 'status': 'duplicate', 'receipt_id': first['results'][0]['receipt_id']
+    }
+    assert len(client.get('/api/receipts', headers=auth).get_json()['receipts']) == 2
+
+def test_bulk_insert_needs_no_returning(app, client, auth, monkeypatch):
+    # As on SQLite before 3.35
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'insert_returning', False)
+        monkeypatch.setattr(db.engine.dialect, 'update_returning', False)
+    response = client.post('/api/receipts/bulk', headers=auth, json={'receipts': [
+        {'items': [{'item_name': 'Pipe', 'weight_kg': 1}]},
+        {'items': [{'item_name': 'Angle', 'weight_kg': 2}]}
+    ]})
+    assert response.status_code == 201, response.get_json()
+    ids = [result['receipt_id'] for result in response.get_json()['results']]
+    assert ids == [ids[0], ids[0] + 1]
+
+def test_single_receipts_skip_reserved_ids(app, client, auth):
+    with app.app_context():
+        first = reserve_receipt_ids(10)
+    receipt_id = client.post('/api/receipts', headers=auth, json={
+        'items': [{'item_name': 'Pipe', 'weight_kg': 1}]
+    }).get_json()['receipt_id']
+    assert receipt_id >= first + 10
+    bulk = client.post('/api/receipts/bulk', headers=auth, json={'receipts': [
+        {'items': [{'item_name': 'Pipe', 'weight_kg': 1}]}
+    ]}).get_json()
+    assert bulk['results'][0]['receipt_id'] > receipt_id
+
@@ -0,0 +1,54 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db, init_db, ensure_indexes, ensure_receipt_autoincrement, reserve_receipt_ids, Receipt
+
+def test_in_memory_database(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'JWT_SECRET_KEY': 'test-jwt-secret-key-of-at-least-32-bytes',
+        'DATA_VERSION_FILE': str(tmp_path / 'data.version'),
+        'LABOR_RATE_VERSION_FILE': str(tmp_path / 'labor_rate.version')
+    })
+    init_db(app)
+    client = app.test_client()
+    login = client.post('/api/login', json={'username': 'admin', 'password': 'admin123'})
+    token = login.get_json()['access_token']
+    response = client.post('/api/receipts', headers={'Authorization': f'Bearer {token}'}, json={
+        'items': [{'item_name': 'Pipe', 'weight_kg': 1}]
+    })
+    assert response.status_code == 201
+
+def test_file_database_runs_in_wal_mode(app):
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+
+def test_receipt_table_is_rebuilt_with_autoincrement(app, add_receipt):
+    ids = [add_receipt(date(2024, 5, day), customer=f'Customer {day}') for day in (1, 2, 3)]
+    with app.app_context():
+        # The receipt table as databases created before AUTOINCREMENT have it
+        with db.engine.begin() as connection:
+            sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'receipt'")).scalar()
+            connection.execute(text('ALTER TABLE receipt RENAME TO receipt_old'))
+            connection.execute(text(sql.replace('AUTOINCREMENT', '')))
+            connection.execute(text('INSERT INTO receipt SELECT * FROM receipt_old'))
+            connection.execute(text('DROP TABLE receipt_old'))
+            connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'receipt'"))
+            connection.execute(text('DELETE FROM receipt WHERE id = :id'), {'id': ids[-1]})
+
+        assert ensure_receipt_autoincrement()
+        assert not ensure_receipt_autoincrement()
+        ensure_indexes()
+        sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'receipt'")).scalar()
+        assert 'AUTOINCREMENT' in sql
+        assert [row.customer_name for row in Receipt.query.order_by(Receipt.id)] == ['Customer 1', 'Customer 2']
+        indexes = {row[1] for row in db.session.execute(text("PRAGMA index_list('receipt')"))}
+        assert {'ix_receipt_date_time_id', 'ix_receipt_labor_cost_id'} <= indexes
+
+        # Ids freed after the rebuild are not handed out again
+        db.session.execute(text('DELETE FROM receipt WHERE id = :id'), {'id': ids[1]})
+        db.session.commit()
+        assert reserve_receipt_ids(1) == ids[1] + 1
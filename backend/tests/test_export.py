@@ -0,0 +1,43 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import controllers
+
+@pytest.fixture
+def receipts(add_receipt):
+    today = date.today()
+    return [
+        add_receipt(today, customer='Alice', weights=(1.0, 2.0)),
+        add_receipt(today - timedelta(days=1), customer='Bob, Jr.', weights=(3.0,)),
+        add_receipt(today - timedelta(days=30), customer='Carol'),
+    ]
+
+def test_formats_hold_the_same_receipts(client, receipts, monkeypatch):
+    # Several chunks per export
+    monkeypatch.setattr(controllers, 'EXPORT_CHUNK_SIZE', 2)
+    exported = client.get('/api/export').get_json()
+    assert [row['id'] for row in exported] == receipts
+
+    response = client.get('/api/export?format=ndjson')
+    assert response.is_streamed and response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == exported
+
+    response = client.get('/api/export?format=csv')
+    assert response.is_streamed and response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    # One row per item
+    assert [row['customer_name'] for row in rows] == ['Alice', 'Alice', 'Bob, Jr.', 'Carol']
+    assert [float(row['weight_kg']) for row in rows] == [1.0, 2.0, 3.0, 10.0]
+
+def test_export_date_filter(client, receipts):
+    today = date.today()
+    rows = client.get(f'/api/export?format=ndjson&start_date={today - timedelta(days=7)}&end_date={today}')
+    assert [json.loads(line)['id'] for line in rows.get_data(as_text=True).splitlines()] == receipts[:2]
+
+@pytest.mark.parametrize('query', ['format=xml', 'start_date=yesterday'])
+def test_export_rejects_invalid_arguments(client, query):
+    assert client.get(f'/api/export?{query}').status_code == 400
@@ -0,0 +1,78 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from models import db, Receipt, ReceiptItem
+from repricing import reprice_receipts
+
+@pytest.mark.parametrize('at', [
+    '2024-05-01T09:30:00', '2024-05-01', '2024-05-01T09:30:00%2B05:30', '2024-05-01T04:00:00Z'
+])
+def test_rate_at_accepts_iso_timestamps(client, auth, at):
+    response = client.get(f'/api/labor-rate?at={at}', headers=auth)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['rate_per_kg'] == 10.0
+
+@pytest.mark.parametrize('at', ['yesterday', '2024-13-01', '2024-05-01T25:00'])
+def test_rate_at_rejects_other_input(client, auth, at):
+    response = client.get(f'/api/labor-rate?at={at}', headers=auth)
+    assert response.status_code == 400
+    assert 'ISO' in response.get_json()['error']
+
+@pytest.mark.parametrize('effective_from', ['2024-05-01T09:30:00+05:30', '2024-05-01T04:00:00Z', '2024-05-01'])
+def test_past_rate_with_offset(client, auth, effective_from):
+    client.put('/api/labor-rate', headers=auth, json={'rate_per_kg': 11})
+    response = client.put('/api/labor-rate', headers=auth, json={'rate_per_kg': 12.5, 'effective_from': effective_from})
+    assert response.status_code == 200, response.get_json()
+    stored = datetime.fromisoformat(response.get_json()['effective_from'])
+    assert stored.tzinfo is None
+    assert client.get(f'/api/labor-rate?at={stored.isoformat()}', headers=auth).get_json()['rate_per_kg'] == 12.5
+    # An entry older than the newest one does not replace the current rate
+    assert client.get('/api/labor-rate', headers=auth).get_json()['rate_per_kg'] == 11
+
+@pytest.mark.parametrize('effective_from', ['2999-01-01T00:00:00Z', '2999-01-01', 'soon', 5])
+def test_invalid_or_future_effective_from(client, auth, effective_from):
+    response = client.put('/api/labor-rate', headers=auth, json={'rate_per_kg': 12.5, 'effective_from': effective_from})
+    assert response.status_code == 400
+    assert len(client.get('/api/labor-rate/history', headers=auth).get_json()['history']) == 1
+
+def test_new_rate_is_current_and_in_history(client, auth):
+    assert client.put('/api/labor-rate', headers=auth, json={'rate_per_kg': 11}).status_code == 200
+    assert client.get('/api/labor-rate', headers=auth).get_json()['rate_per_kg'] == 11
+    history = client.get('/api/labor-rate/history', headers=auth).get_json()['history']
+    assert [entry['rate_per_kg'] for entry in history] == [11, 10.0]
+
+def test_reprice_applies_the_rate_in_effect(app, client, auth, add_receipt):
+    today = date.today()
+    before_change = add_receipt(today - timedelta(days=10), weights=(2.0, 3.0))
+    after_change = add_receipt(today - timedelta(days=5), weights=(4.0,))
+    outside_range = add_receipt(today - timedelta(days=40), weights=(1.0,))
+    change_at = datetime.combine(today - timedelta(days=7), time(0, 0))
+    client.put('/api/labor-rate', headers=auth, json={'rate_per_kg': 20, 'effective_from': change_at.isoformat()})
+    since = client.get('/api/receipts', headers=auth).get_json()['sync_seq']
+
+    with app.app_context():
+        result = reprice_receipts(today - timedelta(days=30), today, chunk_size=1)
+        assert result == {'receipts': 2, 'repriced': 1, 'days': result['days']}
+        totals = dict(db.session.query(Receipt.id, Receipt.total_labor_cost))
+        item_costs = sorted(cost for (cost,) in db.session.query(ReceiptItem.labor_cost).filter(
+            ReceiptItem.receipt_id == after_change
+        ))
+    assert totals == {before_change: 50.0, after_change: 80.0, outside_range: 10.0}
+    assert item_costs == [80.0]
+
+    changes = client.get(f'/api/receipts/changes?since={since}', headers=auth).get_json()
+    assert [row['id'] for row in changes['inserted']] == [after_change]
+    assert changes['inserted'][0]['total_labor_cost'] == 80.0
+    range_summary = client.get(
+        f'/api/range-summary?start_date={today - timedelta(days=30)}&end_date={today}'
+    ).get_json()
+    assert range_summary['total_labor_cost'] == 130.0
+
+def test_reprice_is_idempotent(app, client, auth, add_receipt):
+    day = date.today() - timedelta(days=3)
+    add_receipt(day, weights=(5.0,))
+    client.put('/api/labor-rate', headers=auth, json={'rate_per_kg': 15, 'effective_from': '2000-01-01'})
+    with app.app_context():
+        assert reprice_receipts(day, day)['repriced'] == 1
+        assert reprice_receipts(day, day)['repriced'] == 0
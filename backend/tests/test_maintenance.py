@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import time
+from datetime import date
+
+import pytest
+
+from maintenance import maintenance, MaintenanceBusy
+
+def _customers(client, auth):
+    return sorted(row['customer_name'] for row in client.get('/api/receipts', headers=auth).get_json()['receipts'])
+
+def test_backup_writes_a_verified_snapshot(app, add_receipt):
+    add_receipt(date.today(), customer='Alice')
+    with app.app_context():
+        result = maintenance.run('backup')
+        snapshot = maintenance.snapshots()[-1]
+    assert os.path.basename(snapshot) == result['snapshot']
+    assert result['snapshot_bytes'] > 0
+    assert maintenance.status()['backup']['state'] == 'done'
+
+def test_backups_beyond_retention_are_pruned(app):
+    app.config['BACKUP_RETENTION'] = 2
+    maintenance.init_app(app)
+    with app.app_context():
+        for _ in range(3):
+            maintenance.run('backup')
+            time.sleep(1.1)
+        assert len(maintenance.snapshots()) == 2
+
+def test_integrity_check(app, add_receipt):
+    add_receipt(date.today())
+    with app.app_context():
+        result = maintenance.run('integrity_check')
+    assert result['ok'] and result['problems'] == []
+    assert result['tables'] > 5
+
+def test_restore_brings_back_the_snapshot(app, client, auth, add_receipt):
+    add_receipt(date.today(), customer='Alice')
+    with app.app_context():
+        maintenance.run('backup')
+        snapshot = maintenance.snapshots()[-1]
+    client.post('/api/receipts', headers=auth, json={'customer_name': 'Bob', 'items': [{'item_name': 'Pipe', 'weight_kg': 1}]})
+    assert _customers(client, auth) == ['Alice', 'Bob']
+    with app.app_context():
+        maintenance.restore(snapshot)
+    assert _customers(client, auth) == ['Alice']
+    assert client.get('/api/summary').get_json()['total_receipts'] == 1
+
+def test_restore_resets_delta_sync_once(app, client, auth, add_receipt):
+    add_receipt(date.today(), customer='Alice')
+    with app.app_context():
+        maintenance.run('backup')
+        snapshot = maintenance.snapshots()[-1]
+    bob = client.post('/api/receipts', headers=auth, json={
+        'customer_name': 'Bob', 'items': [{'item_name': 'Pipe', 'weight_kg': 1}]
+    }).get_json()['receipt_id']
+    before = client.get('/api/receipts', headers=auth).get_json()['sync_seq']
+    with app.app_context():
+        maintenance.restore(snapshot)
+
+    # Clients synced before the restore reload once...
+    assert client.get(f'/api/receipts/changes?since={before}', headers=auth).get_json()['reset'] is True
+    reload_seq = client.get('/api/receipts', headers=auth).get_json()['sync_seq']
+    assert reload_seq > before
+    # ...and then follow later writes without another reset, with ids not handed out before
+    carol = client.post('/api/receipts', headers=auth, json={
+        'customer_name': 'Carol', 'items': [{'item_name': 'Pipe', 'weight_kg': 1}]
+    }).get_json()['receipt_id']
+    assert carol > bob
+    changes = client.get(f'/api/receipts/changes?since={reload_seq}', headers=auth).get_json()
+    assert changes['reset'] is False
+    assert [row['id'] for row in changes['inserted']] == [carol]
+
+def test_restore_rejects_a_corrupt_snapshot(app, client, auth, add_receipt, tmp_path):
+    add_receipt(date.today(), customer='Alice')
+    corrupt = tmp_path / 'corrupt.db'
+    corrupt.write_bytes(b'SQLite format 3\x00' + b'\x00' * 4096)
+    with app.app_context():
+        with pytest.raises((ValueError, sqlite3.DatabaseError)):
+            maintenance.restore(str(corrupt))
+    assert _customers(client, auth) == ['Alice']
+
+def test_maintenance_endpoints(client, auth):
+    assert client.post('/api/admin/backup').status_code == 401
+    assert client.post('/api/admin/integrity-check', headers=auth).status_code == 202
+    deadline = time.monotonic() + 10
+    while maintenance.status().get('integrity_check', {}).get('state') != 'done':
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    with maintenance._lock:
+        assert client.post('/api/admin/backup', headers=auth).status_code == 409
+    with pytest.raises(MaintenanceBusy):
+        with maintenance._lock:
+            maintenance.run('vacuum')
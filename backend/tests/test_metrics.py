@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+
+from instrumentation import registry
+
+@pytest.fixture
+def metrics(client):
+    """Metric lines of one route, read from /api/metrics"""
+    registry._routes.clear()
+    def read(route):
+        text = client.get('/api/metrics').get_data(as_text=True)
+        values = {}
+        for line in text.splitlines():
+            if f'route="{route}"' in line and not line.startswith('#'):
+                name = line.split('{')[0]
+                values[name] = values.get(name, 0) + float(line.rsplit(' ', 1)[1])
+        return values
+    return read
+
+def test_rows_returned_counts_column_tuple_selects(client, auth, add_receipt, metrics):
+    for _ in range(3):
+        add_receipt(date.today(), weights=(1.0, 2.0))
+    assert len(client.get('/api/receipts', headers=auth).get_json()['receipts']) == 3
+
+    values = metrics('/api/receipts')
+    assert values['app_request_duration_seconds_count'] == 1
+    assert values['app_sql_statements_total'] >= 2
+    # Three receipts and their six items, read as column tuples
+    assert values['app_sql_rows_returned_total'] >= 9
+    assert values['app_orm_objects_loaded_total'] == 0
+    assert values['app_sql_rows_written_total'] == 0
+
+def test_rows_written(client, auth, metrics):
+    client.post('/api/receipts', headers=auth, json={'items': [{'item_name': 'Pipe', 'weight_kg': 1}]})
+    values = metrics('/api/receipts')
+    assert values['app_sql_rows_written_total'] >= 2
+
+def test_metrics_exposition_format(client):
+    response = client.get('/api/metrics')
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE app_request_duration_seconds histogram' in text
+    assert '# TYPE app_sql_rows_returned_total counter' in text
+
+def test_metrics_hold_no_receipt_or_user_data(client, auth):
+    client.post('/api/receipts', headers=auth, json={
+        'customer_name': 'Alice', 'items': [{'item_name': 'Pipe', 'weight_kg': 1}]
+    })
+    client.post('/api/login', json={'username': 'mallory', 'password': 'wrong'})
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert 'Alice' not in text and 'mallory' not in text and 'admin' not in text.replace('/api/admin/', '')
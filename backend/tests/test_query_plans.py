@@ -0,0 +1,24 @@
+from sqlalchemy import text
+
+from models import db
+from query_plans import check_query_plans
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        reports = check_query_plans()
+    assert len(reports) == 11
+    assert [report['query'] for report in reports if report['full_scan']] == []
+
+def test_query_plans_endpoint_needs_a_token(client, auth):
+    assert client.get('/api/admin/query-plans').status_code == 401
+    response = client.get('/api/admin/query-plans', headers=auth).get_json()
+    assert response['full_scans'] == []
+    assert {report['query'] for report in response['queries']} >= {'receipts_by_date_range', 'receipt_changes_since'}
+
+def test_a_missing_index_is_reported_as_a_full_scan(app):
+    with app.app_context():
+        db.session.execute(text('DROP INDEX ix_receipt_created_at'))
+        db.session.commit()
+        reports = {report['query']: report for report in check_query_plans()}
+    assert reports['recent_receipts']['full_scan'], reports['recent_receipts']
+    assert not reports['receipts_by_date_range']['full_scan']
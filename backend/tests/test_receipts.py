@@ -0,0 +1,57 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+@pytest.mark.parametrize('item', [
+    {'item_name': {'name': 'Pipe'}, 'weight_kg': 1},
+    {'item_name': 'Pipe', 'weight_kg': 1, 'dimension': ['10']},
+    {'item_name': 'Pipe', 'weight_kg': 'heavy'},
+    {'item_name': 'Pipe', 'weight_kg': -1},
+    {'weight_kg': 1},
+])
+def test_create_receipt_rejects_invalid_items(client, auth, item):
+    response = client.post('/api/receipts', headers=auth, json={'items': [item]})
+    assert response.status_code == 400
+    assert client.get('/api/receipts', headers=auth).get_json()['receipts'] == []
+
+@pytest.fixture
+def many_receipts(add_receipt):
+    """23 receipts with repeated dates, times and labor costs, so sort keys tie"""
+    today = date.today()
+    ids = []
+    for index in range(23):
+        ids.append(add_receipt(
+            today - timedelta(days=index % 4), time(9 + index % 3, 0), f'Customer {index % 5}',
+            weights=(float(1 + index % 6),)
+        ))
+    return ids
+
+@pytest.mark.parametrize('sort_by', ['date', 'labor_cost'])
+@pytest.mark.parametrize('sort_order', ['asc', 'desc'])
+def test_keyset_pages_match_single_listing(client, auth, all_pages, many_receipts, sort_by, sort_order):
+    url = f'/api/receipts?sort_by={sort_by}&sort_order={sort_order}'
+    single = client.get(url + '&limit=500', headers=auth).get_json()
+    assert single['next_cursor'] is None
+    paged = all_pages(url + '&limit=4')
+    assert [row['id'] for row in paged] == [row['id'] for row in single['receipts']]
+    assert sorted(row['id'] for row in paged) == sorted(many_receipts)
+
+def test_keyset_pages_with_customer_filter(all_pages, many_receipts):
+    paged = all_pages('/api/receipts?customer=Customer%203&limit=2')
+    assert len(paged) == 4
+    assert {row['customer_name'] for row in paged} == {'Customer 3'}
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'eyJzIjoiZGF0ZSJ9', '%%%'])
+def test_invalid_cursor_is_rejected(client, auth, many_receipts, cursor):
+    assert client.get(f'/api/receipts?cursor={cursor}', headers=auth).status_code == 400
+
+def test_cursor_from_another_sort_order_is_rejected(client, auth, many_receipts):
+    cursor = client.get('/api/receipts?sort_by=labor_cost&limit=2', headers=auth).get_json()['next_cursor']
+    assert client.get(f'/api/receipts?sort_by=date&cursor={cursor}', headers=auth).status_code == 400
+
+def test_keyset_pages_with_date_filter(all_pages, add_receipt):
+    today = date.today()
+    ids = [add_receipt(today, time(9, minute)) for minute in range(7)]
+    add_receipt(today - timedelta(days=1))
+    paged = all_pages(f'/api/receipts?date={today}&limit=3')
+    assert [row['id'] for row in paged] == ids[::-1]
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from rendering import renderer
+
+def _create(client, auth, customer):
+    response = client.post('/api/receipts', headers=auth, json={
+        'customer_name': customer, 'items': [{'item_name': 'Pipe', 'weight_kg': 2, 'dimension': '8x8 feet'}]
+    })
+    assert response.status_code == 201
+    return response.get_json()['receipt_id']
+
+def test_render_receipt_as_html_and_pdf(client, auth):
+    receipt_id = _create(client, auth, 'Alice')
+    html = client.get(f'/api/receipts/{receipt_id}/render?format=html', headers=auth)
+    assert html.mimetype == 'text/html'
+    assert b'Alice' in html.data and b'8x8 feet' in html.data
+    pdf = client.get(f'/api/receipts/{receipt_id}/render', headers=auth)
+    assert pdf.mimetype == 'application/pdf'
+    assert pdf.data.startswith(b'%PDF')
+
+def test_render_errors(client, auth):
+    receipt_id = _create(client, auth, 'Alice')
+    assert client.get(f'/api/receipts/{receipt_id}/render?format=docx', headers=auth).status_code == 400
+    assert client.get('/api/receipts/999/render', headers=auth).status_code == 404
+    assert client.get(f'/api/receipts/{receipt_id}/render').status_code == 401
+
+def test_deleted_receipt_render_is_not_served_for_a_new_receipt(client, auth):
+    renderer._entries.clear()
+    alice = _create(client, auth, 'Alice')
+    assert b'Alice' in client.get(f'/api/receipts/{alice}/render?format=html', headers=auth).data
+    assert client.delete(f'/api/receipts/{alice}', headers=auth).status_code == 200
+    bob = _create(client, auth, 'Bob')
+    assert bob != alice
+    html = client.get(f'/api/receipts/{bob}/render?format=html', headers=auth).data
+    assert b'Bob' in html and b'Alice' not in html
+
+def test_render_range(client, auth, add_receipt):
+    today = date.today()
+    add_receipt(today - timedelta(days=1), customer='Alice')
+    add_receipt(today, customer='Bob')
+    add_receipt(today - timedelta(days=10), customer='Carol')
+    response = client.get(
+        f'/api/receipts/render?format=html&start_date={today - timedelta(days=2)}&end_date={today}', headers=auth
+    )
+    assert response.status_code == 200
+    assert b'Alice' in response.data and b'Bob' in response.data and b'Carol' not in response.data
+    assert client.get('/api/receipts/render?start_date=2024-05-01', headers=auth).status_code == 400
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+import pytest
+
+import archive
+
+MONDAY = date.today() - timedelta(days=date.today().weekday() + 14)
+
+@pytest.fixture
+def receipts(add_receipt):
+    add_receipt(MONDAY, customer='Alice', weights=(1.0, 2.0), item_name='Rod')
+    add_receipt(MONDAY + timedelta(days=1), customer='Bob', weights=(4.0,), item_name='Pipe')
+    add_receipt(MONDAY + timedelta(days=7), customer='Alice', weights=(8.0,), item_name='Rod')
+    add_receipt(MONDAY - timedelta(days=400), customer='Carol', weights=(50.0,))
+
+def _report(client, query):
+    response = client.get(f'/api/reports?start_date={MONDAY}&end_date={MONDAY + timedelta(days=13)}&{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['groups']
+
+def test_groups_by_period(client, receipts):
+    assert [(group['key'], group['receipts'], group['total_weight']) for group in _report(client, 'group_by=week')] == [
+        (MONDAY.isoformat(), 2, 7.0), ((MONDAY + timedelta(days=7)).isoformat(), 1, 8.0)
+    ]
+    assert [group['key'] for group in _report(client, 'group_by=day')] == [
+        MONDAY.isoformat(), (MONDAY + timedelta(days=1)).isoformat(), (MONDAY + timedelta(days=7)).isoformat()
+    ]
+
+def test_groups_by_customer_and_item_largest_first(client, receipts):
+    customers = _report(client, 'group_by=customer&metric=weight')
+    assert [(group['key'], group['receipts'], group['total_labor_cost']) for group in customers] == [
+        ('Alice', 2, 110.0), ('Bob', 1, 40.0)
+    ]
+    items = _report(client, 'group_by=item_name&top=1')
+    assert items == [{'key': 'Rod', 'receipts': 2, 'items': 3, 'total_weight': 11.0, 'total_labor_cost': 110.0}]
+
+def test_percentiles_are_nearest_rank(client, receipts):
+    items = _report(client, 'group_by=item_name&metric=weight&percentiles=50,90,100')
+    assert items[0]['key'] == 'Rod'
+    assert items[0]['percentiles'] == {'50': 2.0, '90': 8.0, '100': 8.0}
+
+def test_archived_months_give_the_same_report(app, client, add_receipt):
+    first = date(date.today().year - 1, 1, 1)
+    for day, weight in ((2, 1.0), (9, 2.0), (40, 3.0), (45, 5.0)):
+        add_receipt(first + timedelta(days=day), customer=f'Customer {day % 2}', weights=(weight,))
+    query = f'/api/reports?start_date={first}&end_date={first + timedelta(days=59)}&percentiles=50'
+    expected = {
+        group_by: client.get(f'{query}&group_by={group_by}').get_json()['groups'] for group_by in ('month', 'customer')
+    }
+    with app.app_context():
+        archive.archive_period(first.strftime('%Y-%m'))
+    for group_by, groups in expected.items():
+        assert client.get(f'{query}&group_by={group_by}').get_json()['groups'] == groups
+
+@pytest.mark.parametrize('query', [
+    'start_date=2024-01-01',
+    'start_date=2024-01-01&end_date=2024-01-31&group_by=year',
+    'start_date=2024-01-01&end_date=2024-01-31&metric=count',
+    'start_date=2024-01-01&end_date=2024-01-31&top=0',
+    'start_date=2024-01-01&end_date=2024-01-31&percentiles=fifty',
+    'start_date=2024-01-01&end_date=2024-01-31&percentiles=0',
+    'start_date=2024-02-01&end_date=2024-01-31',
+    'start_date=2024-01-01&end_date=January',
+])
+def test_rejects_invalid_arguments(client, query):
+    assert client.get(f'/api/reports?{query}').status_code == 400
@@ -0,0 +1,35 @@
+from datetime import date
+
+from response_cache import response_cache
+
+def test_unchanged_data_is_answered_with_304(client, auth, add_receipt):
+    add_receipt(date.today())
+    first = client.get('/api/receipts?limit=10', headers=auth)
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+    etag = first.headers['ETag']
+
+    hits = response_cache.stats()['hits']
+    cached = client.get('/api/receipts?limit=10', headers=auth)
+    assert cached.headers['ETag'] == etag and cached.get_json() == first.get_json()
+    assert response_cache.stats()['hits'] == hits + 1
+
+    revalidated = client.get('/api/receipts?limit=10', headers={**auth, 'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    # Other arguments are another response
+    assert client.get('/api/receipts?limit=5', headers={**auth, 'If-None-Match': etag}).status_code == 200
+
+def test_writes_change_the_etag(client, auth):
+    etag = client.get('/api/summary').headers['ETag']
+    client.post('/api/receipts', headers=auth, json={'items': [{'item_name': 'Pipe', 'weight_kg': 3}]})
+    response = client.get('/api/summary', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert response.get_json()['total_receipts'] == 1
+
+def test_conditional_get_still_needs_a_token(client, auth):
+    etag = client.get('/api/receipts', headers=auth).headers['ETag']
+    assert client.get('/api/receipts', headers={'If-None-Match': etag}).status_code == 401
+
+def test_cache_can_be_disabled(app, client, auth):
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    response = client.get('/api/receipts', headers=auth)
+    assert response.status_code == 200 and 'ETag' not in response.headers
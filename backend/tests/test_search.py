@@ -0,0 +1,11 @@
+def test_create_receipt_accepts_numeric_item_text(client, auth):
+    response = client.post('/api/receipts', headers=auth, json={
+        'customer_name': 'Gupta', 'items': [{'item_name': 5, 'weight_kg': 2, 'dimension': 10}]
+    })
+    assert response.status_code == 201, response.get_json()
+    receipt = client.get('/api/receipts', headers=auth).get_json()['receipts'][0]
+    assert receipt['items'][0]['item_name'] == '5'
+    assert receipt['items'][0]['dimension'] == '10'
+    assert receipt['total_labor_cost'] == 20.0
+    found = client.get('/api/receipts/search?q=Gupta', headers=auth).get_json()['receipts']
+    assert [row['id'] for row in found] == [receipt['id']]
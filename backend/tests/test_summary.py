@@ -0,0 +1,30 @@
+from datetime import date, timedelta
+
+def test_range_summary_totals_each_day(client, add_receipt):
+    today = date.today()
+    add_receipt(today - timedelta(days=2), weights=(2.0, 3.0))
+    add_receipt(today - timedelta(days=2), weights=(1.0,))
+    add_receipt(today, weights=(4.0,))
+    add_receipt(today - timedelta(days=40), weights=(9.0,))
+    summary = client.get(f'/api/range-summary?start_date={today - timedelta(days=7)}&end_date={today}').get_json()
+    assert summary['total_receipts'] == 3
+    assert summary['total_weight'] == 10.0
+    assert summary['total_labor_cost'] == 100.0
+    assert summary['daily_breakdown'] == {
+        (today - timedelta(days=2)).isoformat(): {'receipts': 2, 'weight': 6.0, 'labor_cost': 60.0},
+        today.isoformat(): {'receipts': 1, 'weight': 4.0, 'labor_cost': 40.0}
+    }
+
+def test_range_summary_rejects_bad_dates(client):
+    assert client.get('/api/range-summary?start_date=2024-05-02&end_date=2024-05-01').status_code == 400
+    assert client.get('/api/range-summary?start_date=2024-05-01&end_date=May').status_code == 400
+    assert client.get('/api/monthly-summary?month=13').status_code == 400
+
+def test_delete_updates_summary_and_missing_receipt_is_404(client, auth):
+    receipt_id = client.post('/api/receipts', headers=auth, json={
+        'items': [{'item_name': 'Pipe', 'weight_kg': 3}]
+    }).get_json()['receipt_id']
+    assert client.get('/api/summary').get_json()['total_receipts'] == 1
+    assert client.delete(f'/api/receipts/{receipt_id}', headers=auth).status_code == 200
+    assert client.get('/api/summary').get_json()['total_receipts'] == 0
+    assert client.delete(f'/api/receipts/{receipt_id}', headers=auth).status_code == 404
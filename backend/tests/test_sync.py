@@ -0,0 +1,32 @@
+from models import db, ReceiptChange
+
+def test_change_feed(client, auth):
+    since = client.get('/api/receipts', headers=auth).get_json()['sync_seq']
+    kept = client.post('/api/receipts', headers=auth, json={'items': [{'item_name': 'Pipe', 'weight_kg': 1}]})
+    removed = client.post('/api/receipts', headers=auth, json={'items': [{'item_name': 'Pipe', 'weight_kg': 2}]})
+    kept_id = kept.get_json()['receipt_id']
+    removed_id = removed.get_json()['receipt_id']
+    assert client.delete(f'/api/receipts/{removed_id}', headers=auth).status_code == 200
+
+    changes = client.get(f'/api/receipts/changes?since={since}', headers=auth).get_json()
+    assert changes['reset'] is False
+    assert [row['id'] for row in changes['inserted']] == [kept_id]
+    assert changes['deleted'] == [removed_id]
+
+    later = client.get(f"/api/receipts/changes?since={changes['next_since']}", headers=auth).get_json()
+    assert later['inserted'] == [] and later['deleted'] == []
+    ahead = client.get(f"/api/receipts/changes?since={changes['next_since'] + 100}", headers=auth).get_json()
+    assert ahead['reset'] is True
+    assert client.get('/api/receipts/changes?since=-1', headers=auth).status_code == 400
+
+def test_positions_before_a_restore_marker_are_reset(app, client, auth):
+    client.post('/api/receipts', headers=auth, json={'items': [{'item_name': 'Pipe', 'weight_kg': 1}]})
+    since = client.get('/api/receipts', headers=auth).get_json()['sync_seq']
+    with app.app_context():
+        ReceiptChange.record([0], 'restore')
+        db.session.commit()
+
+    changes = client.get(f'/api/receipts/changes?since={since}', headers=auth).get_json()
+    assert changes['reset'] is True
+    resumed = client.get(f"/api/receipts/changes?since={changes['next_since']}", headers=auth).get_json()
+    assert resumed['reset'] is False and resumed['inserted'] == []
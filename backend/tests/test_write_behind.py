@@ -0,0 +1,121 @@
+import json
+import os
+import time
+
+import pytest
+
+import controllers
+import write_behind as write_behind_module
+from app import create_app
+from models import db, Receipt
+from worker_state import locks_supported
+from write_behind import WriteBehindQueue
+
+def _record(customer, item_name='Rod'):
+    return {
+        'customer_name': customer, 'notes': '', 'date': '2024-05-01', 'time': '10:00:00',
+        'created_at': '2024-05-01T10:00:00', 'total_weight': 2.0, 'total_labor_cost': 20.0,
+        'items': [{'item_name': item_name, 'weight_kg': 2.0, 'dimension': '', 'labor_cost': 20.0}]
+    }
+
+def _customers(app):
+    with app.app_context():
+        return sorted(name for (name,) in db.session.query(Receipt.customer_name))
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.05)
+
+@pytest.fixture
+def queue(app):
+    """A write-behind queue of its own, so tests never share a writer thread"""
+    app.config['RECEIPT_WRITE_BEHIND'] = True
+    queue = WriteBehindQueue()
+    queue.init_app(app)
+    queue.max_delay = 0.2
+    yield queue
+    queue.stop()
+
+def test_poison_record_is_dead_lettered(app, queue, monkeypatch):
+    monkeypatch.setattr(write_behind_module, 'BATCH_ATTEMPTS', 1)
+    with app.app_context():
+        for index in range(3):
+            queue.enqueue(_record(f'good {index}'))
+        # Cannot be bound as a parameter, so its batch can never commit
+        poison_id = queue.enqueue(_record('poison', item_name=['Rod']))
+        for index in range(3, 6):
+            queue.enqueue(_record(f'good {index}'))
+
+    _wait_for(lambda: queue.status()['committed'] + queue.status()['dead_lettered'] == 7)
+    assert queue.status()['dead_lettered'] == 1
+    assert _customers(app) == [f'good {index}' for index in range(6)]
+    with open(queue.dead_letter_path()) as dead_letter:
+        records = [json.loads(line) for line in dead_letter]
+    assert [record['id'] for record in records] == [poison_id]
+    assert records[0]['error']
+
+    # The queue keeps flowing afterwards
+    with app.app_context():
+        queue.enqueue(_record('after'))
+    _wait_for(lambda: 'after' in _customers(app))
+
+def _write_journal(queue, pid, records, tail=''):
+    path = os.path.join(queue.journal_dir, f'write_behind.{pid}.journal')
+    with open(path, 'w') as journal:
+        journal.write(''.join(json.dumps(record) + '\n' for record in records) + tail)
+    return path
+
+def test_recover_replays_journal_of_dead_process(app, queue):
+    committed = dict(_record('already committed'), id=500)
+    queue._commit_batch([committed])
+    path = _write_journal(queue, 1, [
+        dict(_record('lost 1'), id=501), committed, dict(_record('lost 2'), id=502)
+    ], tail='{"torn')
+
+    queue.recover()
+    assert not os.path.exists(path)
+    assert queue.status()['recovered'] == 2
+    assert _customers(app) == ['already committed', 'lost 1', 'lost 2']
+
+def test_recover_keeps_a_journal_it_cannot_replay(app, queue):
+    path = _write_journal(queue, 1, [dict(_record('poison', item_name={'name': 'Rod'}), id=600)])
+    queue.recover()
+    assert not os.path.exists(path)
+    assert os.path.exists(path + '.failed')
+    assert queue.status()['errors'] == 1
+
+def test_app_starts_with_a_journal_it_cannot_replay(app, queue):
+    path = _write_journal(queue, 1, [dict(_record('poison', item_name={'name': 'Rod'}), id=600)])
+    started = create_app(dict(app.config))
+    assert os.path.exists(path + '.failed')
+    with started.app_context():
+        db.engine.dispose()
+
+@pytest.mark.skipif(not locks_supported(), reason='journals of live workers need flock')
+def test_writer_start_replays_journals_of_dead_workers(app, queue):
+    path = _write_journal(queue, 1, [dict(_record('from dead worker'), id=700)])
+    with app.app_context():
+        queue.enqueue(_record('new'))
+    assert not os.path.exists(path)
+    _wait_for(lambda: _customers(app) == ['from dead worker', 'new'])
+
+def test_create_receipt_is_queued(client, auth, app, queue, monkeypatch):
+    monkeypatch.setattr(controllers, 'write_behind', queue)
+    response = client.post('/api/receipts', headers=auth, json={
+        'customer_name': 'queued', 'items': [{'item_name': 'Pipe', 'weight_kg': 1, 'dimension': 10}]
+    })
+    assert response.status_code == 202
+    receipt_id = response.get_json()['receipt_id']
+    _wait_for(lambda: queue.status()['committed'] == 1)
+    receipt = client.get('/api/receipts', headers=auth).get_json()['receipts'][0]
+    assert receipt['id'] == receipt_id
+    assert receipt['items'][0]['dimension'] == '10'
+    assert queue.status()['errors'] == 0
+
+def test_status_endpoint_needs_a_token(client, auth, queue, monkeypatch):
+    monkeypatch.setattr(controllers, 'write_behind', queue)
+    assert client.get('/api/admin/write-behind').status_code == 401
+    status = client.get('/api/admin/write-behind', headers=auth).get_json()
+    assert status['enabled'] is True and status['dead_lettered'] == 0
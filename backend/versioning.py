@@ -0,0 +1,41 @@
+import os
+import time
+import uuid
+from flask import current_app
+
+class VersionFile:
+    """A version token shared by every worker through a small file in the instance folder.
+
+    Reading the token is a single small file read, so it can be checked on
+    every request without a database query. bump() replaces the file
+    atomically with a fresh unique token.
+    """
+
+    def __init__(self, config_key):
+        self.config_key = config_key
+
+    def path(self):
+        return current_app.config[self.config_key]
+
+    def read(self):
+        """Current token, or None if the version has never been bumped"""
+        try:
+            with open(self.path()) as version_file:
+                return version_file.read()
+        except OSError:
+            return None
+
+    def bump(self):
+        """Publish a new token to every worker and return it"""
+        path = self.path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        token = f'{time.time_ns():x}-{uuid.uuid4().hex[:8]}'
+        # Unique per call so concurrent bumps from several threads never share a temp file
+        temp_path = f'{path}.{token}.tmp'
+        with open(temp_path, 'w') as version_file:
+            version_file.write(token)
+        os.replace(temp_path, path)
+        return token
+
+# Bumped after every committed change to receipts or the labor rate
+data_version = VersionFile('DATA_VERSION_FILE')
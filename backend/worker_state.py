@@ -0,0 +1,32 @@
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Helpers for state that belongs to one gunicorn worker process.
+#
+# With --preload the app is built once in the master and the workers are
+# forked from it. Threads do not survive a fork, and thread or process pools
+# inherited from the master are dead in the child, so background threads,
+# executors and per-process files are created on first use and created again
+# whenever os.getpid() differs from the pid recorded when they were made.
+#
+# Workers coordinate through flock() on files in the instance folder. fcntl
+# does not exist on Windows, where the app only runs for development: there
+# try_lock() always succeeds, so maintenance jobs are only exclusive within a
+# process and journals of live write-behind workers cannot be told apart from
+# those of dead ones.
+
+def locks_supported():
+    """Whether try_lock() actually excludes other processes"""
+    return fcntl is not None
+
+def try_lock(file):
+    """Take an exclusive lock on an open file without waiting; False if another process holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,294 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, time as time_cls
+from sqlalchemy import insert
+from models import db, Receipt, ReceiptItem, DailyAggregate, ReceiptChange, reserve_receipt_ids
+import search
+from versioning import data_version
+from worker_state import locks_supported, try_lock
+
+# Receipt ids reserved from the database per round-trip
+ID_BLOCK_SIZE = 100
+
+# Commit attempts for a batch before it is split to isolate records that can never commit
+BATCH_ATTEMPTS = 3
+
+class WriteBehindQueue:
+    """Persists receipts on a background thread in group-committed batches.
+
+    enqueue() validates nothing itself: the caller passes a fully computed
+    receipt. It is given an id from a reserved block, appended (and fsynced)
+    to a per-process journal in the instance directory and queued. The writer
+    thread commits queued receipts in batches and truncates the journal once
+    the queue drains. A batch that keeps failing is split until the records
+    that cannot be committed are found; those go to a dead-letter file
+    instead of holding up the rest of the queue. Journals left by crashed
+    processes are replayed on start-up; replay skips ids that already reached
+    the database, and again whenever a worker starts its writer.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._journal = None
+        self._next_id = None
+        self._block_end = None
+        self._stopping = False
+        self._stats = {
+            'enqueued': 0,
+            'committed': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'total_commit_ms': 0.0,
+            'max_queue_wait_ms': 0.0,
+            'recovered': 0,
+            'dead_lettered': 0,
+            'errors': 0,
+            'last_error': None
+        }
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('RECEIPT_WRITE_BEHIND', False)
+        self.batch_size = app.config.get('WRITE_BEHIND_BATCH_SIZE', 200)
+        self.max_delay = app.config.get('WRITE_BEHIND_MAX_DELAY_MS', 50) / 1000
+        self.fsync = app.config.get('WRITE_BEHIND_FSYNC', True)
+        self.journal_dir = app.config.get('WRITE_BEHIND_JOURNAL_DIR', app.instance_path)
+        if self.enabled:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self.recover()
+
+    def _journal_path(self, pid):
+        return os.path.join(self.journal_dir, f'write_behind.{pid}.journal')
+
+    def dead_letter_path(self):
+        return os.path.join(self.journal_dir, 'write_behind.dead_letter')
+
+    def _ensure_started(self):
+        """Open this process's journal and start the writer, once per worker process"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._next_id = None
+        self._block_end = None
+        self._journal = open(self._journal_path(self._pid), 'a')
+        # Held for the life of the process so recover() in other workers skips this journal
+        try_lock(self._journal)
+        self._thread = threading.Thread(target=self._run, name='receipt-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        # Under gunicorn --preload, init_app's recovery only ran in the master; pick up journals of workers that died since
+        if locks_supported():
+            self.recover()
+
+    def _allocate_id(self):
+        if self._next_id is None or self._next_id >= self._block_end:
+            self._next_id = reserve_receipt_ids(ID_BLOCK_SIZE)
+            self._block_end = self._next_id + ID_BLOCK_SIZE
+        receipt_id = self._next_id
+        self._next_id += 1
+        return receipt_id
+
+    def enqueue(self, record):
+        """Journal and queue a receipt record, returning the id assigned to it"""
+        with self._lock:
+            self._ensure_started()
+            record['id'] = self._allocate_id()
+            record['queued_at'] = time.time()
+            self._journal.write(json.dumps(record) + '\n')
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._queue.put(record)
+            self._stats['enqueued'] += 1
+        return record['id']
+
+    def _run(self):
+        while not self._stopping or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Retry the batch a few times (its records are safe in the journal meanwhile), then split it
+            for attempt in range(BATCH_ATTEMPTS):
+                if self._try_commit(batch):
+                    break
+                if attempt + 1 < BATCH_ATTEMPTS:
+                    time.sleep(1)
+            else:
+                self._split_commit(batch)
+            
+            with self._lock:
+                if self._queue.empty():
+                    self._journal.seek(0)
+                    self._journal.truncate()
+
+    def _try_commit(self, batch):
+        try:
+            self._commit_batch(batch)
+            return True
+        except Exception as e:
+            self._stats['errors'] += 1
+            self._stats['last_error'] = str(e)
+            return False
+
+    def _split_commit(self, batch):
+        """Commit the halves of a failing batch separately, dead-lettering single records that fail"""
+        if len(batch) == 1:
+            self._dead_letter(batch[0], self._stats['last_error'])
+            return
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            if not self._try_commit(half):
+                self._split_commit(half)
+
+    def _dead_letter(self, record, error):
+        with open(self.dead_letter_path(), 'a') as dead_letter:
+            dead_letter.write(json.dumps(dict(record, error=error)) + '\n')
+            dead_letter.flush()
+            os.fsync(dead_letter.fileno())
+        self._stats['dead_lettered'] += 1
+        self.app.logger.error('Receipt %s moved to %s: %s', record['id'], self.dead_letter_path(), error)
+
+    def _commit_batch(self, batch, skip_existing=False):
+        started = time.monotonic()
+        with self.app.app_context():
+            try:
+                if skip_existing:
+                    ids = [record['id'] for record in batch]
+                    existing = {row[0] for row in db.session.query(Receipt.id).filter(Receipt.id.in_(ids))}
+                    batch = [record for record in batch if record['id'] not in existing]
+                    if not batch:
+                        return 0
+                
+                db.session.execute(insert(Receipt), [{
+                    'id': record['id'],
+                    'customer_name': record['customer_name'],
+                    'notes': record['notes'],
+                    'date': date.fromisoformat(record['date']),
+                    'time': time_cls.fromisoformat(record['time']),
+                    'total_weight': record['total_weight'],
+                    'total_labor_cost': record['total_labor_cost'],
+                    'created_at': datetime.fromisoformat(record['created_at'])
+                } for record in batch])
+                db.session.execute(insert(ReceiptItem), [
+                    dict(item, receipt_id=record['id']) for record in batch for item in record['items']
+                ])
+                
+                totals = {}
+                for record in batch:
+                    day = totals.setdefault(record['date'], [0, 0.0, 0.0])
+                    day[0] += 1
+                    day[1] += record['total_weight']
+                    day[2] += record['total_labor_cost']
+                for day, (count, weight, labor_cost) in totals.items():
+                    DailyAggregate.apply(date.fromisoformat(day), count, weight, labor_cost)
+                
+                ReceiptChange.record([record['id'] for record in batch], 'insert')
+                search.index_receipts([
+                    (record['id'], record['customer_name'], record['notes'], record['items']) for record in batch
+                ])
+                db.session.commit()
+                data_version.bump()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+        
+        commit_ms = (time.monotonic() - started) * 1000
+        now = time.time()
+        self._stats['committed'] += len(batch)
+        self._stats['batches'] += 1
+        self._stats['last_batch_size'] = len(batch)
+        self._stats['last_commit_ms'] = round(commit_ms, 2)
+        self._stats['max_commit_ms'] = round(max(self._stats['max_commit_ms'], commit_ms), 2)
+        self._stats['total_commit_ms'] += commit_ms
+        self._stats['max_queue_wait_ms'] = round(max(
+            self._stats['max_queue_wait_ms'],
+            max((now - record.get('queued_at', now)) * 1000 for record in batch)
+        ), 2)
+        return len(batch)
+
+    def recover(self):
+        """Replay journals left behind by processes that exited before their writer drained"""
+        for path in glob.glob(os.path.join(self.journal_dir, 'write_behind.*.journal')):
+            if self._pid == os.getpid() and path == self._journal_path(self._pid):
+                continue
+            error = None
+            try:
+                journal = open(path, 'r+')
+            except FileNotFoundError:
+                continue  # replayed by another worker meanwhile
+            with journal:
+                if not try_lock(journal):
+                    continue  # journal of a live process
+                records = []
+                for line in journal:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break  # torn final write from the crash
+                try:
+                    for start in range(0, len(records), self.batch_size):
+                        self._stats['recovered'] += self._commit_batch(
+                            records[start:start + self.batch_size], skip_existing=True
+                        )
+                except Exception as e:
+                    error = e
+                    self._stats['errors'] += 1
+                    self._stats['last_error'] = str(e)
+            if error is None:
+                os.remove(path)
+            else:
+                # Kept for inspection; replay skips ids that did commit, so the file can be replayed again
+                os.rename(path, path + '.failed')
+                self.app.logger.error('Could not replay %s, renamed to %s.failed: %s', path, path, error)
+
+    def stop(self):
+        """Drain the queue and stop the writer thread"""
+        self._stopping = True
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=30)
+
+    def status(self):
+        batches = self._stats['batches']
+        journal_bytes = 0
+        if self._journal is not None and self._pid == os.getpid():
+            journal_bytes = os.path.getsize(self._journal_path(self._pid))
+        return dict(
+            self._stats,
+            enabled=self.enabled,
+            pid=os.getpid(),
+            queue_depth=self._queue.qsize(),
+            journal_bytes=journal_bytes,
+            total_commit_ms=round(self._stats['total_commit_ms'], 2),
+            avg_commit_ms=round(self._stats['total_commit_ms'] / batches, 2) if batches else 0.0
+        )
+
+write_behind = WriteBehindQueue()
@@ -5,6 +5,9 @@ let currentUser = null;
 let currentToken = null;
 let currentLaborRate = 0;
 let receiptsToDelete = null;
+let loadedReceipts = new Map();  // receipt id -> receipt, for the view modal
+let historyState = { endpoint: null, receipts: [], nextCursor: null, filters: {} };
+let dashboardState = { date: null, receipts: [], syncSeq: null };  // syncSeq: change feed position of the list
 
 // API Base URL
 const API_BASE_URL = 'https://iron-steel-business.onrender.com/api';
@@ -166,15 +169,60 @@ function showMainApp() {
 async function loadDashboard() {
     try {
         const summary = await apiCall('/summary');
-        const receipts = await apiCall('/receipts?date=' + new Date().toISOString().split('T')[0]);
+        const today = new Date().toISOString().split('T')[0];
+        
+        if (dashboardState.date === today && dashboardState.syncSeq !== null) {
+            await syncDashboard();
+        } else {
+            await reloadDashboardReceipts(today);
+        }
         
         updateDashboardSummary(summary);
-        updateDashboardTable(receipts);
+        updateDashboardTable(dashboardState.receipts);
     } catch (error) {
         console.error('Failed to load dashboard:', error);
     }
 }
 
+async function reloadDashboardReceipts(today) {
+    const endpoint = '/receipts?limit=500&date=' + today;
+    let page = await apiCall(endpoint);
+    const receipts = page.receipts;
+    // Changes after the first page's position are applied by the next sync
+    const syncSeq = page.sync_seq;
+    while (page.next_cursor) {
+        page = await apiCall(`${endpoint}&cursor=${encodeURIComponent(page.next_cursor)}`);
+        receipts.push(...page.receipts);
+    }
+    dashboardState = { date: today, receipts: receipts, syncSeq: syncSeq };
+    rememberReceipts(receipts);
+}
+
+// Apply only the receipts inserted and deleted since the last sync
+async function syncDashboard() {
+    let hasMore = true;
+    while (hasMore) {
+        const changes = await apiCall(`/receipts/changes?since=${dashboardState.syncSeq}`);
+        if (changes.reset) {
+            await reloadDashboardReceipts(dashboardState.date);
+            return;
+        }
+        
+        const deleted = new Set(changes.deleted);
+        const inserted = changes.inserted.filter(receipt => receipt.date === dashboardState.date);
+        const insertedIds = new Set(inserted.map(receipt => receipt.id));
+        
+        dashboardState.receipts = inserted
+            .concat(dashboardState.receipts.filter(receipt => !deleted.has(receipt.id) && !insertedIds.has(receipt.id)))
+            .sort((a, b) => b.time.localeCompare(a.time) || b.id - a.id);
+        dashboardState.syncSeq = changes.next_since;
+        
+        rememberReceipts(inserted);
+        changes.deleted.forEach(receiptId => loadedReceipts.delete(receiptId));
+        hasMore = changes.has_more;
+    }
+}
+
 function updateDashboardSummary(summary) {
     document.getElementById('totalReceipts').textContent = summary.total_receipts;
     document.getElementById('totalWeightToday').textContent = summary.total_weight.toFixed(2);
@@ -435,15 +483,42 @@ async function loadHistory() {
     endpoint += params.join('&');
     
     try {
-        const receipts = await apiCall(endpoint);
-        displayHistory(receipts, startDate, endDate, customer);
+        const page = await apiCall(endpoint);
+        historyState = {
+            endpoint: endpoint,
+            receipts: page.receipts,
+            nextCursor: page.next_cursor,
+            filters: { startDate, endDate, customer }
+        };
+        rememberReceipts(page.receipts);
+        displayHistory();
     } catch (error) {
         console.error('Failed to load history:', error);
     }
 }
 
-function displayHistory(receipts, startDate, endDate, customer) {
+async function loadMoreHistory() {
+    if (!historyState.nextCursor) return;
+    
+    try {
+        const page = await apiCall(`${historyState.endpoint}&cursor=${encodeURIComponent(historyState.nextCursor)}`);
+        historyState.receipts = historyState.receipts.concat(page.receipts);
+        historyState.nextCursor = page.next_cursor;
+        rememberReceipts(page.receipts);
+        displayHistory();
+    } catch (error) {
+        console.error('Failed to load more history:', error);
+    }
+}
+
+function rememberReceipts(receipts) {
+    receipts.forEach(receipt => loadedReceipts.set(receipt.id, receipt));
+}
+
+function displayHistory() {
     const container = document.getElementById('historyContent');
+    const receipts = historyState.receipts;
+    const { startDate, endDate, customer } = historyState.filters;
     
     if (receipts.length === 0) {
         container.innerHTML = '<div class="alert alert-info">No receipts found for the selected criteria.</div>';
@@ -462,7 +537,7 @@ function displayHistory(receipts, startDate, endDate, customer) {
     let html = `
         <div class="card">
             <div class="card-header">
-                <h6>Receipts ${dateRangeText} ${customer ? `- Customer: ${customer}` : ''} (${receipts.length} found)</h6>
+                <h6>Receipts ${dateRangeText} ${customer ? `- Customer: ${customer}` : ''} (${receipts.length}${historyState.nextCursor ? '+' : ''} found)</h6>
             </div>
             <div class="card-body">
                 <div class="table-responsive">
@@ -514,6 +589,12 @@ function displayHistory(receipts, startDate, endDate, customer) {
                         </tbody>
                     </table>
                 </div>
+                ${historyState.nextCursor ? `
+                <div class="text-center">
+                    <button class="btn btn-outline-primary" onclick="loadMoreHistory()">
+                        <i class="fas fa-angle-down me-2"></i>Load More
+                    </button>
+                </div>` : ''}
             </div>
         </div>
     `;
@@ -522,20 +603,15 @@ function displayHistory(receipts, startDate, endDate, customer) {
 }
 
 // Receipt Actions
-async function viewReceipt(receiptId) {
-    try {
-        const receipts = await apiCall('/receipts');
-        const receipt = receipts.find(r => r.id === receiptId);
-        
-        if (!receipt) {
-            showAlert('Receipt not found', 'danger');
-            return;
-        }
-        
-        displayReceiptModal(receipt);
-    } catch (error) {
-        console.error('Failed to load receipt:', error);
+function viewReceipt(receiptId) {
+    const receipt = loadedReceipts.get(receiptId);
+    
+    if (!receipt) {
+        showAlert('Receipt not found', 'danger');
+        return;
     }
+    
+    displayReceiptModal(receipt);
 }
 
 function displayReceiptModal(receipt) {
@@ -600,7 +676,11 @@ async function confirmDelete() {
         
         showAlert('Receipt deleted successfully!', 'success');
         loadDashboard();
-        loadHistory();
+        if (historyState.endpoint) {
+            const deletedId = receiptsToDelete;
+            historyState.receipts = historyState.receipts.filter(receipt => receipt.id !== deletedId);
+            displayHistory();
+        }
         
         const modal = bootstrap.Modal.getInstance(document.getElementById('deleteModal'));
         modal.hide();
@@ -617,7 +697,7 @@ async function exportFilteredData() {
     const sortBy = document.getElementById('sortBy').value;
     const sortOrder = document.getElementById('sortOrder').value;
     
-    let endpoint = '/export?';
+    let endpoint = '/export?format=csv&';
     const params = [];
     
     if (startDate && endDate) {
@@ -631,9 +711,8 @@ async function exportFilteredData() {
     endpoint += params.join('&');
     
     try {
-        const data = await apiCall(endpoint);
-        downloadCSV(data.content, data.filename);
-        showAlert(`Filtered data exported successfully! (${data.total_records} records)`, 'success');
+        await downloadExport(endpoint, 'receipts_filtered.csv');
+        showAlert('Filtered data exported successfully!', 'success');
     } catch (error) {
         console.error('Failed to export filtered data:', error);
     }
@@ -641,16 +720,29 @@ async function exportFilteredData() {
 
 async function exportAllData() {
     try {
-        const data = await apiCall('/export');
-        downloadCSV(data.content, data.filename);
-        showAlert(`All data exported successfully! (${data.total_records} records)`, 'success');
+        await downloadExport('/export?format=csv', 'receipts_all.csv');
+        showAlert('All data exported successfully!', 'success');
     } catch (error) {
         console.error('Failed to export all data:', error);
     }
 }
 
+// The export endpoint streams CSV, so fetch it as a blob rather than through apiCall
+async function downloadExport(endpoint, filename) {
+    const headers = currentToken ? { 'Authorization': `Bearer ${currentToken}` } : {};
+    const response = await fetch(`${API_BASE_URL}${endpoint}`, { headers });
+    
+    if (!response.ok) {
+        const message = 'Export failed';
+        showAlert(message, 'danger');
+        throw new Error(message);
+    }
+    
+    downloadCSV(await response.blob(), filename);
+}
+
 function downloadCSV(content, filename) {
-    const blob = new Blob([content], { type: 'text/csv' });
+    const blob = content instanceof Blob ? content : new Blob([content], { type: 'text/csv' });
     const url = window.URL.createObjectURL(blob);
     const a = document.createElement('a');
     a.href = url;